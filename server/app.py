@@ -1,41 +1,132 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
+from collections import Counter
 from datetime import datetime
+import json
 import logging
+import math
 import os
+import time
+from typing import Dict
+from services.admission_control import AdmissionController, AdmissionRejected, CostExceedsBurst
+from services.batch_processor import BatchError, BatchProcessor
 from services.bedrock_service import BedrockService
 from services.conversation_manager import ConversationManager
+from services.service_metrics import register_service_metrics
+from services.summarizer import ConversationSummarizer
+from utils import json_codec
 from utils.error_handler import handle_error
-from utils.validators import validate_message_request
+from utils.metrics import CONTENT_TYPE, HTTP_LATENCY, HTTP_REQUESTS, registry
+from utils.logging_config import configure_logging, preview
+from utils.tracing import tracer
+from utils.validators import (
+    decode_json_body, parse_chat_request, parse_history_query, parse_sessions_query, validate_batch_payload
+)
 from config import Config
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('logs/app.log'),
-        logging.StreamHandler()
-    ]
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-def create_app():
+def _sse_event(event: str, data: dict) -> str:
+    """Format a Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _client_key() -> str:
+    """Rate-limit key for the caller: its API key if it is a configured one, else its address
+    
+    Unknown keys are ignored, so a client cannot get a fresh bucket by
+    sending a new X-API-Key with each request.
+    """
+    api_key = request.headers.get('X-API-Key')
+    if api_key and api_key in Config.API_KEYS:
+        return f'key:{api_key}'
+    return request.remote_addr or 'unknown'
+
+def _too_many_requests(error: AdmissionRejected):
+    """429 response telling the client when to retry"""
+    retry_after = max(1, math.ceil(error.retry_after))
+    response = jsonify({'error': 'Too many requests. Please retry later.', 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def _history_etag(version: str, query: Dict[str, int]) -> str:
+    """ETag of one history response: the session version plus the page it asked for"""
+    return ';'.join([version] + [f"{name}={query[name]}" for name in sorted(query)])
+
+def _not_modified(etag: str):
+    """304 response for a client whose cached copy is current"""
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def create_app(bedrock_service: BedrockService = None, conversation_manager: ConversationManager = None,
+               admission: AdmissionController = None):
     app = Flask(__name__)
     app.config.from_object(Config)
+    json_codec.install(app)
     
     # Enable CORS
     CORS(app, resources={
         r"/api/*": {
             "origins": ["http://localhost:5173", "http://localhost:3000"],
             "methods": ["GET", "POST", "PUT", "DELETE"],
-            "allow_headers": ["Content-Type", "Authorization"]
+            "allow_headers": ["Content-Type", "Authorization", "X-API-Key", "traceparent", "If-None-Match"],
+            "expose_headers": ["X-Trace-Id", "traceparent", "Retry-After", "ETag"]
         }
     })
     
     # Initialize services
-    bedrock_service = BedrockService()
-    conversation_manager = ConversationManager()
+    bedrock_service = bedrock_service or BedrockService()
+    if Config.BEDROCK_WARMUP:
+        bedrock_service.warm_up()
+    if conversation_manager is None:
+        summarizer = ConversationSummarizer(bedrock_service.summarize) if Config.SUMMARIZATION_ENABLED else None
+        conversation_manager = ConversationManager(summarizer=summarizer)
+    conversation_manager.start_sweeper()
+    admission = admission or AdmissionController()
+    batch_processor = BatchProcessor(bedrock_service, conversation_manager, admission=admission)
+    app.extensions['conversation_manager'] = conversation_manager
+    app.extensions['batch_processor'] = batch_processor
+    register_service_metrics(bedrock_service, conversation_manager, admission=admission)
+    
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        g.trace = tracer.start_trace(
+            f"{request.method} {route}", request.headers.get('traceparent'),
+            {'http.method': request.method, 'http.route': route}
+        )
+    
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get('request_started')
+        if started is not None:
+            # Label by URL rule, not path, so session ids don't create new series
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            HTTP_LATENCY.observe(time.perf_counter() - started, (request.method, route))
+            HTTP_REQUESTS.inc((request.method, route, str(response.status_code)))
+        trace = g.get('trace')
+        if trace is not None:
+            trace.set('http.status_code', response.status_code)
+            response.headers['X-Trace-Id'] = trace.trace_id
+            response.headers['traceparent'] = trace.traceparent()
+        return response
+    
+    @app.teardown_request
+    def finish_request_trace(error=None):
+        # stream_with_context defers teardown, so a stream's trace covers the whole stream
+        trace = g.get('trace')
+        if trace is not None:
+            tracer.finish_trace(trace)
+    
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Prometheus metrics"""
+        return Response(registry.render(), content_type=CONTENT_TYPE)
     
     @app.route('/api/health', methods=['GET'])
     def health_check():
@@ -50,54 +141,211 @@ def create_app():
     def chat():
         """Main chat endpoint"""
         try:
-            # Validate request
-            validation_error = validate_message_request(request)
+            # Decode and validate the body in one pass
+            with tracer.span('validate'):
+                chat_request, validation_error = parse_chat_request(request)
             if validation_error:
                 return jsonify({'error': validation_error}), 400
             
-            data = request.get_json()
-            user_message = data.get('message', '').strip()
-            session_id = data.get('session_id', 'default')
+            user_message = chat_request.message
+            session_id = chat_request.session_id
+            priority = chat_request.priority
+            
+            logger.info("Received message for session %s: %s", session_id, preview(user_message))
             
-            if not user_message:
-                return jsonify({'error': 'Message cannot be empty'}), 400
+            # Turns on the same session are committed one at a time
+            with admission.admit(_client_key(), session_id), conversation_manager.turn(session_id):
+                # Add user message to conversation history
+                with tracer.span('session.add_message', role='user'):
+                    conversation_manager.add_message(session_id, 'user', user_message)
+                
+                # Get conversation context (includes the new user message)
+                with tracer.span('context.build') as span:
+                    context = conversation_manager.build_context(session_id)
+                    span.set('context.tokens', context.tokens)
+                
+                # Generate response using Bedrock
+                bot_response = bedrock_service.generate_from_messages(
+                    context.messages, context.system, priority=priority, prompt_tokens=context.tokens
+                )
+                
+                # Add bot response to conversation history
+                with tracer.span('session.add_message', role='assistant'):
+                    conversation_manager.add_message(session_id, 'assistant', bot_response)
             
-            logger.info(f"Received message for session {session_id}: {user_message[:100]}...")
+            logger.info("Generated response for session %s from %d context tokens: %s", session_id, context.tokens, preview(bot_response))
             
-            # Add user message to conversation history
-            conversation_manager.add_message(session_id, 'user', user_message)
+            with tracer.span('response.encode'):
+                return jsonify({
+                    'message': bot_response,
+                    'session_id': session_id,
+                    'context_tokens': context.tokens,
+                    'timestamp': datetime.utcnow().isoformat()
+                })
+                
+        except AdmissionRejected as e:
+            return _too_many_requests(e)
+        except Exception as e:
+            logger.error(f"Error in chat endpoint: {str(e)}")
+            return handle_error(e)
+    
+    @app.route('/api/chat/stream', methods=['POST'])
+    def chat_stream():
+        """Streaming chat endpoint (Server-Sent Events)"""
+        try:
+            # Decode and validate the body in one pass
+            with tracer.span('validate'):
+                chat_request, validation_error = parse_chat_request(request)
+            if validation_error:
+                return jsonify({'error': validation_error}), 400
             
-            # Get conversation context
-            context = conversation_manager.get_context(session_id)
+            user_message = chat_request.message
+            session_id = chat_request.session_id
+            priority = chat_request.priority
             
-            # Generate response using Bedrock
-            bot_response = bedrock_service.generate_response(user_message, context)
+            logger.info("Received streaming message for session %s: %s", session_id, preview(user_message))
             
-            # Add bot response to conversation history
-            conversation_manager.add_message(session_id, 'assistant', bot_response)
+            # The slot is held until the stream is closed
+            admission.check_rate(_client_key(), session_id)
+            admission.acquire_slot()
             
-            logger.info(f"Generated response for session {session_id}: {bot_response[:100]}...")
+        except AdmissionRejected as e:
+            return _too_many_requests(e)
+        except Exception as e:
+            logger.error(f"Error in chat stream endpoint: {str(e)}")
+            return handle_error(e)
+        
+        def generate():
+            parts = []
+            try:
+                # Hold the session's turn for the whole stream so turns never interleave
+                with conversation_manager.turn(session_id):
+                    # Add user message to conversation history
+                    with tracer.span('session.add_message', role='user'):
+                        conversation_manager.add_message(session_id, 'user', user_message)
+                    
+                    # Get conversation context (includes the new user message)
+                    with tracer.span('context.build') as span:
+                        context = conversation_manager.build_context(session_id)
+                        span.set('context.tokens', context.tokens)
+                    
+                    deltas = bedrock_service.stream_from_messages(
+                        context.messages, context.system, priority=priority, prompt_tokens=context.tokens
+                    )
+                    for delta in deltas:
+                        parts.append(delta)
+                        yield _sse_event('delta', {'delta': delta})
+                    
+                    bot_response = ''.join(parts).strip()
+                    
+                    # Only commit the reply once the stream has completed
+                    with tracer.span('session.add_message', role='assistant'):
+                        conversation_manager.add_message(session_id, 'assistant', bot_response)
+                
+                logger.info("Streamed response for session %s from %d context tokens: %s", session_id, context.tokens, preview(bot_response))
+                
+                yield _sse_event('done', {
+                    'message': bot_response,
+                    'session_id': session_id,
+                    'context_tokens': context.tokens,
+                    'timestamp': datetime.utcnow().isoformat()
+                })
+            except Exception as e:
+                logger.error(f"Error while streaming response: {str(e)}")
+                yield _sse_event('error', {
+                    'error': 'AI service is temporarily unavailable. Please try again later.',
+                    'session_id': session_id
+                })
+        
+        response = Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        response.call_on_close(admission.release_slot)
+        return response
+    
+    @app.route('/api/chat/batch', methods=['POST'])
+    def chat_batch():
+        """Run many sessions' chat turns in one request"""
+        try:
+            data, validation_error = decode_json_body(request)
+            if validation_error:
+                return jsonify({'error': validation_error}), 400
+            
+            validation_error = validate_batch_payload(data)
+            if validation_error:
+                return jsonify({'error': validation_error}), 400
+            
+            # Each item counts against the client's and its session's rates like a chat turn
+            items = data['items']
+            parsed = batch_processor.parse(items)
+            admission.check_rates(
+                _client_key(), len(items),
+                Counter(chat_request.session_id for chat_request, _ in parsed if chat_request)
+            )
+            
+            if data.get('mode', 'online') == 'offline':
+                return jsonify(batch_processor.export(items, parsed)), 202
+            
+            # Each item's Bedrock call takes its own concurrency slot
+            results = batch_processor.run(items, parsed)
+            succeeded = sum(1 for result in results if result['status'] == 200)
             
             return jsonify({
-                'message': bot_response,
-                'session_id': session_id,
+                'results': results,
+                'succeeded': succeeded,
+                'failed': len(results) - succeeded,
                 'timestamp': datetime.utcnow().isoformat()
             })
             
+        except CostExceedsBurst as e:
+            return jsonify({'error': f"Batch too large for the {e.reason} rate limit. "
+                                     f"At most {int(e.burst)} items are allowed"}), 413
+        except AdmissionRejected as e:
+            return _too_many_requests(e)
         except Exception as e:
-            logger.error(f"Error in chat endpoint: {str(e)}")
+            logger.error(f"Error in chat batch endpoint: {str(e)}")
+            return handle_error(e)
+    
+    @app.route('/api/chat/batch/<batch_id>/ingest', methods=['POST'])
+    def ingest_batch(batch_id):
+        """Add the replies of a finished Bedrock batch inference job to the conversations"""
+        try:
+            return jsonify(batch_processor.ingest(batch_id))
+        except BatchError as e:
+            return jsonify({'error': str(e)}), e.status_code
+        except Exception as e:
+            logger.error(f"Error ingesting batch {batch_id}: {str(e)}")
             return handle_error(e)
     
     @app.route('/api/conversation/<session_id>', methods=['GET'])
     def get_conversation(session_id):
-        """Get conversation history for a session"""
+        """Get a page of conversation history, or only what changed since a seq"""
         try:
-            history = conversation_manager.get_conversation_history(session_id)
-            return jsonify({
+            query, validation_error = parse_history_query(request.args)
+            if validation_error:
+                return jsonify({'error': validation_error}), 400
+            
+            # Unchanged sessions are answered from the version alone
+            etag = _history_etag(conversation_manager.get_history_version(session_id), query)
+            if request.if_none_match.contains_weak(etag):
+                return _not_modified(etag)
+            
+            page = conversation_manager.get_history_page(session_id, **query)
+            response = jsonify({
                 'session_id': session_id,
-                'messages': history,
-                'message_count': len(history)
+                'messages': page.messages,
+                'message_count': page.message_count,
+                'first_seq': page.first_seq,
+                'last_seq': page.last_seq,
+                'has_more': page.has_more,
+                'next_cursor': page.next_cursor,
+                'reset': page.reset
             })
+            response.set_etag(_history_etag(page.version, query))
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
         except Exception as e:
             logger.error(f"Error getting conversation: {str(e)}")
             return handle_error(e)
@@ -117,17 +365,65 @@ def create_app():
     
     @app.route('/api/sessions', methods=['GET'])
     def get_sessions():
-        """Get all active session IDs"""
+        """Get a page of active sessions, most recently active first"""
         try:
-            sessions = conversation_manager.get_active_sessions()
+            query, validation_error = parse_sessions_query(request.args)
+            if validation_error:
+                return jsonify({'error': validation_error}), 400
+            
+            sessions, next_cursor = conversation_manager.list_sessions(**query)
+            details = request.args.get('details', 'false').lower() == 'true'
             return jsonify({
-                'sessions': sessions,
-                'count': len(sessions)
+                'sessions': [info.to_dict() if details else info.session_id for info in sessions],
+                'count': len(conversation_manager.catalog),
+                'next_cursor': next_cursor
             })
         except Exception as e:
             logger.error(f"Error getting sessions: {str(e)}")
             return handle_error(e)
     
+    @app.route('/api/sessions/<session_id>', methods=['GET'])
+    def get_session(session_id):
+        """Get the metadata of one active session"""
+        info = conversation_manager.catalog.get(session_id)
+        if info is None:
+            return jsonify({'error': 'Session not found'}), 404
+        return jsonify(info.to_dict())
+    
+    @app.route('/api/cache/stats', methods=['GET'])
+    def get_cache_stats():
+        """Get response cache counters"""
+        cache = bedrock_service.response_cache
+        if cache is None:
+            return jsonify({'enabled': False})
+        return jsonify({'enabled': True, **cache.stats()})
+    
+    @app.route('/api/bedrock/status', methods=['GET'])
+    def get_bedrock_status():
+        """Get circuit breaker state and routing counters per model"""
+        return jsonify({
+            'model_id': bedrock_service.model_id,
+            'fallback_model_id': bedrock_service.resilience.fallback_model_id or None,
+            'circuits': bedrock_service.resilience.status(),
+            'routing': bedrock_service.router.stats(),
+            'single_flight': bedrock_service.single_flight.stats() if bedrock_service.single_flight else {'enabled': False}
+        })
+    
+    @app.route('/api/admission/stats', methods=['GET'])
+    def get_admission_stats():
+        """Get in-flight and queued chat turns and tracked rate-limit keys"""
+        return jsonify(admission.stats())
+    
+    @app.route('/api/context/stats', methods=['GET'])
+    def get_context_stats():
+        """Get tokens-per-turn counters for the context window"""
+        return jsonify(conversation_manager.context_builder.stats())
+    
+    @app.route('/api/memory/stats', methods=['GET'])
+    def get_memory_stats():
+        """Get bytes held by in-memory sessions against the budget, and eviction counts"""
+        return jsonify(conversation_manager.memory_stats())
+    
     @app.errorhandler(404)
     def not_found(error):
         return jsonify({'error': 'Endpoint not found'}), 404
@@ -139,9 +435,17 @@ def create_app():
     
     return app
 
+def shutdown_app(app: Flask):
+    """Stop background work and flush the session store of an app from create_app"""
+    app.extensions['batch_processor'].shutdown()
+    app.extensions['conversation_manager'].close()
+
 if __name__ == '__main__':
     # Create logs directory if it doesn't exist
     os.makedirs('logs', exist_ok=True)
     
     app = create_app()
-    app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
+    try:
+        app.run(debug=True, host='0.0.0.0', port=5001)
+    finally:
+        shutdown_app(app)
\ No newline at end of file
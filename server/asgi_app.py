@@ -0,0 +1,329 @@
+"""ASGI variant of the chat API.
+
+It serves a subset of the Flask app: health, chat, conversation history
+and delete, the session listing and /metrics. It has no admission control
+(only a cap on in-flight turns), answers history requests without an ETag
+or 304, and has no stream, batch or stats routes; use the Flask app for
+those.
+
+Run with any ASGI server, e.g.:
+    uvicorn asgi_app:create_asgi_app --factory --port 5001
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict
+from urllib.parse import parse_qsl
+from services.async_bedrock_service import AsyncBedrockService
+from services.conversation_manager import ConversationManager
+from services.service_metrics import register_service_metrics
+from services.summarizer import ConversationSummarizer
+from utils import json_codec
+from utils.error_handler import error_payload
+from utils.logging_config import configure_logging
+from utils.metrics import CONTENT_TYPE, HTTP_LATENCY, HTTP_REQUESTS, registry
+from utils.tracing import current_span, tracer
+from utils.validators import CHAT_REQUEST, parse_history_query, parse_sessions_query
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CONVERSATION_ROUTE = re.compile(r'^/api/conversation/(?P<session_id>[^/]+)$')
+
+ALLOWED_ORIGINS = {"http://localhost:5173", "http://localhost:3000"}
+
+class AsyncChatApp:
+    """Minimal ASGI application serving the core routes of the Flask app"""
+    
+    def __init__(self, bedrock_service: AsyncBedrockService = None,
+                 conversation_manager: ConversationManager = None,
+                 max_concurrency: int = None, request_timeout: float = None):
+        self.bedrock_service = bedrock_service or AsyncBedrockService()
+        if conversation_manager is None:
+            summarizer = None
+            if Config.SUMMARIZATION_ENABLED:
+                summarizer = ConversationSummarizer(self.bedrock_service.bedrock_service.summarize)
+            conversation_manager = ConversationManager(summarizer=summarizer)
+        self.conversation_manager = conversation_manager
+        # Stand-in services (e.g. in tests) may not wrap a BedrockService
+        wrapped = getattr(self.bedrock_service, 'bedrock_service', None)
+        if wrapped is not None:
+            register_service_metrics(wrapped, conversation_manager)
+        self.max_concurrency = max_concurrency or Config.ASYNC_MAX_CONCURRENCY
+        self.request_timeout = request_timeout or Config.ASYNC_REQUEST_TIMEOUT
+        self._limiter = None
+        self._turn_locks: Dict[str, list] = {}
+    
+    @property
+    def limiter(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the server's running event loop
+        if self._limiter is None:
+            self._limiter = asyncio.Semaphore(self.max_concurrency)
+        return self._limiter
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        
+        started = time.perf_counter()
+        method = scope['method']
+        route = self._route_label(scope['path'])
+        traceparent = dict(scope.get('headers') or []).get(b'traceparent', b'').decode('latin-1')
+        trace = tracer.start_trace(f"{method} {route}", traceparent, {'http.method': method, 'http.route': route})
+        try:
+            if scope['path'] == '/metrics' and method == 'GET':
+                status = 200
+                await self._send(scope, send, status, registry.render().encode('utf-8'), CONTENT_TYPE.encode('latin-1'))
+            else:
+                status, payload = await self._dispatch(scope, receive)
+                await self._send_json(scope, send, status, payload)
+            trace.set('http.status_code', status)
+        finally:
+            tracer.finish_trace(trace)
+        
+        HTTP_LATENCY.observe(time.perf_counter() - started, (method, route))
+        HTTP_REQUESTS.inc((method, route, str(status)))
+    
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.conversation_manager.start_sweeper()
+                if Config.BEDROCK_WARMUP:
+                    await self.bedrock_service.warm_up()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # Stops the sweeper and summarizer and flushes the session store
+                await self._run_sync(self.conversation_manager.close)
+                self.bedrock_service.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    
+    async def _dispatch(self, scope, receive):
+        method = scope['method']
+        path = scope['path']
+        
+        try:
+            if method == 'OPTIONS':
+                return 204, None
+            if path == '/api/health' and method == 'GET':
+                return 200, self.health_check()
+            if path == '/api/chat' and method == 'POST':
+                return await self.chat(scope, receive)
+            if path == '/api/sessions' and method == 'GET':
+                return await self._run_sync(self.get_sessions, scope)
+            
+            match = CONVERSATION_ROUTE.match(path)
+            if match and method == 'GET':
+                return await self._run_sync(self.get_conversation, match.group('session_id'), scope)
+            if match and method == 'DELETE':
+                return 200, await self._run_sync(self.clear_conversation, match.group('session_id'))
+            
+            return 404, {'error': 'Endpoint not found'}
+            
+        except Exception as e:
+            logger.error(f"Error handling {method} {path}: {str(e)}")
+            payload, status = error_payload(e)
+            return status, payload
+    
+    def health_check(self):
+        """Health check endpoint"""
+        return {
+            'status': 'healthy',
+            'timestamp': datetime.utcnow().isoformat(),
+            'version': '1.0.0'
+        }
+    
+    async def chat(self, scope, receive):
+        """Main chat endpoint"""
+        headers = dict(scope.get('headers') or [])
+        if b'application/json' not in headers.get(b'content-type', b''):
+            return 400, {'error': 'Request must be JSON'}
+        
+        try:
+            data = json_codec.loads(await self._read_body(receive) or b'null')
+        except ValueError:
+            return 400, {'error': 'Request body must be valid JSON'}
+        
+        with tracer.span('validate'):
+            chat_request, validation_error = CHAT_REQUEST.parse(data)
+        if validation_error:
+            return 400, {'error': validation_error}
+        
+        user_message = chat_request.message
+        session_id = chat_request.session_id
+        priority = chat_request.priority
+        
+        # Shielded so a timeout only stops the wait: the Bedrock call cannot be
+        # cancelled on its executor thread, so the turn keeps its concurrency
+        # slot and session lock until the call returns, then records the reply
+        turn = asyncio.ensure_future(self._run_turn(session_id, user_message, priority))
+        try:
+            bot_response = await asyncio.wait_for(asyncio.shield(turn), timeout=self.request_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Chat request timed out for session {session_id}")
+            turn.add_done_callback(functools.partial(self._finish_late_turn, session_id))
+            return 504, {
+                'error': 'AI service timed out. The reply will be added to the conversation when it arrives.',
+                'session_id': session_id
+            }
+        
+        return 200, {
+            'message': bot_response,
+            'session_id': session_id,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+    
+    @asynccontextmanager
+    async def _turn(self, session_id: str):
+        """Serialize turns per session without blocking the event loop
+        
+        The session is pinned in the manager for the turn, so memory-budget
+        eviction cannot drop it while its Bedrock call runs.
+        """
+        entry = self._turn_locks.get(session_id)
+        if entry is None:
+            entry = self._turn_locks[session_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                with self.conversation_manager.pinned(session_id):
+                    yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._turn_locks[session_id]
+    
+    async def _run_turn(self, session_id: str, user_message: str, priority: str = None) -> str:
+        # Global limiter bounds the number of in-flight Bedrock calls
+        async with self._turn(session_id), self.limiter:
+            context = await self._run_sync(self._start_turn, session_id, user_message)
+            bot_response = await self.bedrock_service.generate_from_messages(
+                context.messages, context.system, priority=priority, prompt_tokens=context.tokens
+            )
+            await self._run_sync(self._finish_turn, session_id, bot_response)
+            return bot_response
+    
+    def _start_turn(self, session_id: str, user_message: str):
+        with tracer.span('session.add_message', role='user'):
+            self.conversation_manager.add_message(session_id, 'user', user_message)
+        with tracer.span('context.build') as span:
+            context = self.conversation_manager.build_context(session_id)
+            span.set('context.tokens', context.tokens)
+        return context
+    
+    def _finish_turn(self, session_id: str, bot_response: str):
+        with tracer.span('session.add_message', role='assistant'):
+            self.conversation_manager.add_message(session_id, 'assistant', bot_response)
+    
+    def _finish_late_turn(self, session_id: str, turn: asyncio.Future):
+        if turn.cancelled():
+            return
+        error = turn.exception()
+        if error is not None:
+            logger.error(f"Timed out chat turn for session {session_id} failed: {str(error)}")
+        else:
+            logger.info("Timed out chat turn for session %s completed", session_id)
+    
+    async def _run_sync(self, func: Callable[..., Any], *args) -> Any:
+        """Run blocking session work (locks, SQLite reads) off the event loop, in the request's context"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, contextvars.copy_context().run, func, *args)
+    
+    def get_conversation(self, session_id: str, scope):
+        """Get a page of conversation history, or only what changed since a seq"""
+        args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        query, validation_error = parse_history_query(args)
+        if validation_error:
+            return 400, {'error': validation_error}
+        
+        page = self.conversation_manager.get_history_page(session_id, **query)
+        return 200, {
+            'session_id': session_id,
+            'messages': page.messages,
+            'message_count': page.message_count,
+            'first_seq': page.first_seq,
+            'last_seq': page.last_seq,
+            'has_more': page.has_more,
+            'next_cursor': page.next_cursor,
+            'reset': page.reset
+        }
+    
+    def clear_conversation(self, session_id: str):
+        """Clear conversation history for a session"""
+        self.conversation_manager.clear_conversation(session_id)
+        return {
+            'message': f'Conversation {session_id} cleared successfully',
+            'session_id': session_id
+        }
+    
+    def get_sessions(self, scope):
+        """Get a page of active sessions, most recently active first"""
+        args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        query, validation_error = parse_sessions_query(args)
+        if validation_error:
+            return 400, {'error': validation_error}
+        
+        sessions, next_cursor = self.conversation_manager.list_sessions(**query)
+        details = args.get('details', 'false').lower() == 'true'
+        return 200, {
+            'sessions': [info.to_dict() if details else info.session_id for info in sessions],
+            'count': len(self.conversation_manager.catalog),
+            'next_cursor': next_cursor
+        }
+    
+    async def _read_body(self, receive) -> bytes:
+        body = b''
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get('body', b'')
+            more_body = message.get('more_body', False)
+        return body
+    
+    def _route_label(self, path: str) -> str:
+        # Label by route template so session ids don't create new series
+        if CONVERSATION_ROUTE.match(path):
+            return '/api/conversation/<session_id>'
+        if path in ('/api/health', '/api/chat', '/api/sessions', '/metrics'):
+            return path
+        return 'unmatched'
+    
+    async def _send_json(self, scope, send, status: int, payload):
+        body = json_codec.dumps_bytes(payload) if payload is not None else b''
+        await self._send(scope, send, status, body, b'application/json')
+    
+    async def _send(self, scope, send, status: int, body: bytes, content_type: bytes):
+        headers = [(b'content-type', content_type)]
+        
+        trace = current_span()
+        if trace is not None:
+            headers.extend([
+                (b'x-trace-id', trace.trace_id.encode('latin-1')),
+                (b'traceparent', trace.traceparent().encode('latin-1')),
+            ])
+        
+        origin = dict(scope.get('headers') or []).get(b'origin', b'').decode('latin-1')
+        if origin in ALLOWED_ORIGINS:
+            headers.extend([
+                (b'access-control-allow-origin', origin.encode('latin-1')),
+                (b'access-control-allow-methods', b'GET, POST, PUT, DELETE'),
+                (b'access-control-allow-headers', b'Content-Type, Authorization, traceparent'),
+                (b'access-control-expose-headers', b'X-Trace-Id, traceparent'),
+            ])
+        
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+def create_asgi_app(**kwargs) -> AsyncChatApp:
+    """Create the ASGI chat application"""
+    configure_logging()
+    return AsyncChatApp(**kwargs)
@@ -0,0 +1,79 @@
+"""Compare the sync Flask path with the ASGI path against a fake Bedrock.
+
+Usage (from the server directory):
+    python -m benchmarks.bench_async_vs_sync --requests 400 --latency 0.2 --workers 8
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Log to the console only, not to the server's logs/app.log
+os.environ.setdefault('LOG_FILE', '')
+
+from app import create_app
+from asgi_app import create_asgi_app
+from services.async_bedrock_service import AsyncBedrockService
+from benchmarks.fakes import fake_bedrock_service, unlimited_admission
+
+def run_sync(total: int, latency: float, workers: int) -> float:
+    """Drive the Flask app from a fixed-size worker pool, like gunicorn threads"""
+    app = create_app(bedrock_service=fake_bedrock_service(latency), admission=unlimited_admission())
+    
+    def one(i):
+        client = app.test_client()
+        response = client.post('/api/chat', json={'message': 'Hello', 'session_id': f'sync-{i}'})
+        assert response.status_code == 200, response.data
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(one, range(total)))
+    return time.perf_counter() - start
+
+async def _run_async(total: int, latency: float, concurrency: int) -> float:
+    service = AsyncBedrockService(fake_bedrock_service(latency), max_workers=concurrency)
+    app = create_asgi_app(bedrock_service=service, max_concurrency=concurrency)
+    
+    async def one(i):
+        body = json.dumps({'message': 'Hello', 'session_id': f'async-{i}'}).encode('utf-8')
+        scope = {'type': 'http', 'method': 'POST', 'path': '/api/chat',
+                 'headers': [(b'content-type', b'application/json')]}
+        sent = []
+        
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        
+        async def send(message):
+            sent.append(message)
+        
+        await app(scope, receive, send)
+        assert sent[0]['status'] == 200, sent
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    service.shutdown()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--latency', type=float, default=0.2, help='fake Bedrock latency in seconds')
+    parser.add_argument('--workers', type=int, default=8, help='sync worker threads')
+    parser.add_argument('--concurrency', type=int, default=256, help='async concurrency limit')
+    args = parser.parse_args()
+    
+    logging.disable(logging.INFO)
+    
+    sync_elapsed = run_sync(args.requests, args.latency, args.workers)
+    async_elapsed = asyncio.run(_run_async(args.requests, args.latency, args.concurrency))
+    
+    print(f"{'path':<8}{'requests':>10}{'seconds':>10}{'req/s':>10}")
+    print(f"{'sync':<8}{args.requests:>10}{sync_elapsed:>10.2f}{args.requests / sync_elapsed:>10.1f}")
+    print(f"{'async':<8}{args.requests:>10}{async_elapsed:>10.2f}{args.requests / async_elapsed:>10.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Measure cold and warm first-request latency and pool behaviour of the Bedrock client.
+
+Runs against the local fake bedrock-runtime endpoint (fake_bedrock_server.py)
+with the real boto3 client.
+
+First request: each trial is a fresh process, so botocore's service model
+loading, endpoint resolution, credential lookup and connection setup are all
+paid again. "cold" sends the first chat turn straight after building the
+client. "warm" calls warm_up() first, as BEDROCK_WARMUP does at app start,
+then sends it. The fake endpoint is plain HTTP, so a real TLS handshake would
+add to the cold figure.
+
+Burst: --concurrency turns at once, twice, with botocore's default pool of 10
+connections and with the pool sized by BEDROCK_MAX_POOL_CONNECTIONS' auto
+rule. With the small pool, calls beyond 10 open connections that urllib3
+then discards ("Connection pool is full"), so every burst reconnects.
+
+Usage (from the server directory):
+    python -m benchmarks.bench_bedrock_warmup --trials 5 --concurrency 64 --latency 0.2
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from benchmarks.fake_bedrock_server import FakeBedrockProfile, FakeBedrockServer
+from benchmarks.load_test import percentile
+from config import Config
+
+class CountingServer(FakeBedrockServer):
+    """Fake endpoint that also counts the TCP connections it accepts"""
+    
+    connections = 0
+    
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+    
+    def handle_error(self, request, client_address):
+        # Trial processes exit without closing their pooled connections
+        pass
+
+def turn(service, text: str) -> float:
+    from services.bedrock_service import encode_message
+    start = time.perf_counter()
+    service.generate_from_messages([encode_message('user', text)])
+    return time.perf_counter() - start
+
+def run_trial(mode: str) -> Dict[str, float]:
+    """One fresh-process measurement; runs in the child"""
+    start = time.perf_counter()
+    from services.bedrock_service import BedrockService
+    service = BedrockService()
+    result = {'client_s': time.perf_counter() - start}
+    if mode == 'warm':
+        result['warm_up_s'] = service.warm_up()
+    result['first_s'] = turn(service, 'first')
+    result['second_s'] = turn(service, 'second')
+    return result
+
+def first_request(trials: int) -> Dict[str, Dict[str, float]]:
+    """Median of each timing over fresh processes, per mode"""
+    results = {}
+    for mode in ('cold', 'warm'):
+        runs = []
+        for _ in range(trials):
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_bedrock_warmup', '--trial', mode],
+                                    capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        results[mode] = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+    return results
+
+class PoolFullCounter(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.count = 0
+    
+    def emit(self, record):
+        if 'Connection pool is full' in record.getMessage():
+            self.count += 1
+
+def burst(server: CountingServer, pool_size: int, concurrency: int) -> List[Dict[str, Any]]:
+    """Two bursts of concurrent turns through one client with the given pool size"""
+    from services.bedrock_service import BedrockService
+    service = BedrockService(max_pool_connections=pool_size)
+    counter = PoolFullCounter()
+    logging.getLogger('urllib3.connectionpool').addHandler(counter)
+    rounds = []
+    try:
+        for round_index in range(2):
+            before, counter.count = server.connections, 0
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                latencies = sorted(pool.map(lambda index: turn(service, f'burst {round_index} {index}'), range(concurrency)))
+            rounds.append({
+                'wall_s': time.perf_counter() - start,
+                'p50_s': percentile(latencies, 50),
+                'p99_s': percentile(latencies, 99),
+                'new_connections': server.connections - before,
+                'pool_full_warnings': counter.count
+            })
+    finally:
+        logging.getLogger('urllib3.connectionpool').removeHandler(counter)
+    return rounds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trials', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--latency', type=float, default=0.2, help='fake time to first token in seconds')
+    parser.add_argument('--trial', choices=('cold', 'warm'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.trial:
+        print(json.dumps(run_trial(args.trial)))
+        return
+    
+    # Inherited by the trial processes
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'fake')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'fake')
+    os.environ['SINGLE_FLIGHT_ENABLED'] = 'false'
+    os.environ['LOG_LEVEL'] = 'WARNING'
+    server = CountingServer(profile=FakeBedrockProfile(latency=args.latency)).start()
+    os.environ['BEDROCK_ENDPOINT_URL'] = Config.BEDROCK_ENDPOINT_URL = server.url
+    Config.SINGLE_FLIGHT_ENABLED = False
+    logging.getLogger().setLevel(logging.WARNING)
+    
+    print(f"First request, median of {args.trials} fresh processes (fake latency {args.latency * 1e3:.0f} ms):")
+    print(f"{'':<8}{'client ms':>11}{'warm-up ms':>12}{'first ms':>10}{'second ms':>11}{'first overhead ms':>19}")
+    for mode, timing in first_request(args.trials).items():
+        warm_up = f"{timing['warm_up_s'] * 1e3:.1f}" if 'warm_up_s' in timing else '-'
+        print(f"{mode:<8}{timing['client_s'] * 1e3:>11.1f}{warm_up:>12}{timing['first_s'] * 1e3:>10.1f}"
+              f"{timing['second_s'] * 1e3:>11.1f}{(timing['first_s'] - timing['second_s']) * 1e3:>19.1f}")
+    
+    from services.bedrock_service import default_pool_size
+    print(f"\nBursts of {args.concurrency} concurrent turns:")
+    print(f"{'pool':<14}{'round':>6}{'wall ms':>10}{'p50 ms':>9}{'p99 ms':>9}{'new conns':>11}{'pool full':>11}")
+    for label, size in (('10 (botocore)', 10), (f'{default_pool_size()} (auto)', default_pool_size())):
+        for index, result in enumerate(burst(server, size, args.concurrency), 1):
+            print(f"{label:<14}{index:>6}{result['wall_s'] * 1e3:>10.1f}{result['p50_s'] * 1e3:>9.1f}"
+                  f"{result['p99_s'] * 1e3:>9.1f}{result['new_connections']:>11}{result['pool_full_warnings']:>11}")
+
+if __name__ == '__main__':
+    main()
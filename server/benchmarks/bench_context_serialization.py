@@ -0,0 +1,56 @@
+"""Measure per-turn request serialization cost as history grows.
+
+Compares rebuilding and re-encoding the whole context every turn with the
+cached per-message Bedrock fragments.
+
+Usage (from the server directory):
+    python -m benchmarks.bench_context_serialization --turns 2000
+"""
+import argparse
+import json
+import logging
+import time
+
+from config import Config
+from services.conversation_manager import ConversationManager
+from benchmarks.fakes import fake_bedrock_service
+
+CONTENT = 'A reasonably sized chat message that a user might send to the assistant. ' * 4
+
+def legacy_turn(manager, service, session_id, window):
+    context = manager.get_context(session_id)
+    messages = [{"role": m["role"], "content": [{"text": m["content"]}]} for m in context[-window:]]
+    return json.dumps({"messages": messages, "inferenceConfig": service.inference_config})
+
+def cached_turn(manager, service, session_id, window):
+    return service.build_request_body(manager.get_bedrock_messages(session_id, limit=window))
+
+def measure(turn, history: int, turns: int) -> float:
+    Config.MAX_CONVERSATION_HISTORY = history
+    Config.CONTEXT_TOKEN_BUDGET = 10 ** 9
+    manager = ConversationManager()
+    service = fake_bedrock_service(latency=0)
+    
+    elapsed = 0.0
+    for i in range(turns):
+        manager.add_message('bench', 'user' if i % 2 == 0 else 'assistant', f'{i} {CONTENT}')
+        start = time.perf_counter()
+        turn(manager, service, 'bench', history)
+        elapsed += time.perf_counter() - start
+    return elapsed / turns
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=2000)
+    args = parser.parse_args()
+    
+    logging.disable(logging.INFO)
+    
+    print(f"{'history':>8}{'rebuild us/turn':>18}{'cached us/turn':>18}")
+    for history in (10, 20, 50, 100, 200):
+        legacy = measure(legacy_turn, history, args.turns)
+        cached = measure(cached_turn, history, args.turns)
+        print(f"{history:>8}{legacy * 1e6:>18.1f}{cached * 1e6:>18.1f}")
+
+if __name__ == '__main__':
+    main()
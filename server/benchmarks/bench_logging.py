@@ -0,0 +1,85 @@
+"""Measure per-request logging overhead on the request thread.
+
+Replays the INFO lines of one chat turn. The "before" setup writes them with
+eager f-strings through synchronous file and console handlers. The "after"
+setups use the queued JSON pipeline with lazy arguments, with and without
+INFO sampling. Console output goes to os.devnull and files to a temp dir.
+
+Usage (from the server directory):
+    python -m benchmarks.bench_logging --requests 20000
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from utils.logging_config import TEXT_FORMAT, configure_logging, preview, shutdown_logging
+from utils.tracing import TraceIdFilter
+
+USER_MESSAGE = 'Can you help me plan a three day trip to Lisbon with a focus on food and museums? ' * 3
+BOT_RESPONSE = 'Of course! Day one: start in Alfama with a pastel de nata, then the Tile Museum. ' * 10
+
+def turn_eager(logger: logging.Logger, session_id: str):
+    """The log lines of one turn as they were written before"""
+    logger.info(f"Received message for session {session_id}: {USER_MESSAGE[:100]}...")
+    logger.info(f"Added user message to session {session_id}")
+    logger.info(f"Sending request to Bedrock with {3} messages")
+    logger.info(f"Successfully generated response: {BOT_RESPONSE[:100]}...")
+    logger.info(f"Added assistant message to session {session_id}")
+    logger.info(f"Generated response for session {session_id} from {412} context tokens: {BOT_RESPONSE[:100]}...")
+
+def turn_lazy(logger: logging.Logger, session_id: str):
+    """The same lines with lazy arguments"""
+    logger.info("Received message for session %s: %s", session_id, preview(USER_MESSAGE))
+    logger.info("Added %s message to session %s", 'user', session_id)
+    logger.info("Sending request to Bedrock with %d messages", 3)
+    logger.info("Successfully generated response: %s", preview(BOT_RESPONSE))
+    logger.info("Added %s message to session %s", 'assistant', session_id)
+    logger.info("Generated response for session %s from %d context tokens: %s", session_id, 412, preview(BOT_RESPONSE))
+
+def configure_sync(log_file: str, devnull):
+    """The previous setup: synchronous file and console handlers"""
+    handlers = [logging.FileHandler(log_file), logging.StreamHandler(devnull)]
+    for handler in handlers:
+        handler.addFilter(TraceIdFilter())
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    for handler in handlers:
+        root.addHandler(handler)
+    return handlers
+
+def run(turn, requests: int) -> float:
+    """Request-thread microseconds per turn"""
+    logger = logging.getLogger('bench')
+    start = time.perf_counter()
+    for index in range(requests):
+        turn(logger, f'session-{index % 100}')
+    return (time.perf_counter() - start) / requests * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, 'w') as devnull:
+        handlers = configure_sync(os.path.join(tmp, 'before.log'), devnull)
+        before = run(turn_eager, args.requests)
+        for handler in handlers:
+            logging.getLogger().removeHandler(handler)
+            handler.close()
+        print(f"{'sync handlers, eager f-strings':<40}{before:>10.1f} us/request")
+        
+        for label, sample_rate in (('queued JSON, lazy args', 1.0), ('queued JSON, lazy args, 10% INFO', 0.1)):
+            # Queue large enough that the benchmark measures enqueueing, not shedding
+            configure_logging(log_file=os.path.join(tmp, 'after.log'), stream=devnull, json_output=True,
+                              sample_rate=sample_rate, queue_size=args.requests * 6 + 1)
+            after = run(turn_lazy, args.requests)
+            start = time.perf_counter()
+            shutdown_logging()
+            drain = time.perf_counter() - start
+            print(f"{label:<40}{after:>10.1f} us/request  (listener drained in {drain * 1e3:.0f} ms)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Compare per-append cost and memory of Message records in a deque with list-of-dicts.
+
+Both sides are the storage step alone, with no locking, persistence or
+bookkeeping around it. "list-of-dicts" is a standalone copy of the original
+ConversationManager storage: a dict per message with an ISO timestamp, and
+the history list resliced once it passes max_history. "ring buffer" is what
+the manager stores now: a slotted Message record with an epoch timestamp in
+a deque(maxlen=max_history) that drops the oldest message on overflow.
+
+Usage (from the server directory):
+    python -m benchmarks.bench_message_storage --sessions 2000 --messages 100
+"""
+import argparse
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime
+from typing import Dict
+
+from config import Config
+from services.message import Message
+
+class ListOfDictsStore:
+    """The original storage: a list of message dicts per session"""
+    
+    def __init__(self, max_history: int):
+        self.max_history = max_history
+        self.conversations: Dict[str, list] = {}
+    
+    def append(self, session_id: str, role: str, content: str):
+        if session_id not in self.conversations:
+            self.conversations[session_id] = []
+        self.conversations[session_id].append({
+            "role": role,
+            "content": content,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+        if len(self.conversations[session_id]) > self.max_history:
+            self.conversations[session_id] = self.conversations[session_id][-self.max_history:]
+
+class RingBufferStore:
+    """The current storage: Message records in a bounded deque per session"""
+    
+    def __init__(self, max_history: int):
+        self.max_history = max_history
+        self.conversations: Dict[str, deque] = {}
+    
+    def append(self, session_id: str, role: str, content: str):
+        messages = self.conversations.get(session_id)
+        if messages is None:
+            messages = self.conversations[session_id] = deque(maxlen=self.max_history)
+        seq = messages[-1].seq + 1 if messages else 1
+        messages.append(Message(role, content, time.time(), seq))
+
+def fill(store, sessions: int, messages: int):
+    content = 'Hello there, this is a message.'
+    for _ in range(messages):
+        for s in range(sessions):
+            store.append(f'session-{s}', 'user', content)
+
+def measure(store_class, sessions: int, messages: int, max_history: int):
+    store = store_class(max_history)
+    start = time.perf_counter()
+    fill(store, sessions, messages)
+    per_append = (time.perf_counter() - start) / (sessions * messages)
+    
+    tracemalloc.start()
+    store = store_class(max_history)
+    fill(store, sessions, messages)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per_append, current / sessions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=2000)
+    parser.add_argument('--messages', type=int, default=100)
+    parser.add_argument('--max-history', type=int, default=Config.MAX_CONVERSATION_HISTORY)
+    args = parser.parse_args()
+    
+    results = {
+        'list-of-dicts': measure(ListOfDictsStore, args.sessions, args.messages, args.max_history),
+        'ring buffer': measure(RingBufferStore, args.sessions, args.messages, args.max_history),
+    }
+    
+    print(f"{'store':<16}{'us/append':>12}{'bytes/session':>16}")
+    for name, (per_append, per_session) in results.items():
+        print(f"{name:<16}{per_append * 1e6:>12.2f}{per_session:>16.0f}")
+
+if __name__ == '__main__':
+    main()
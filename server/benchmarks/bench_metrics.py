@@ -0,0 +1,71 @@
+"""Measure the hot-path cost of metrics instrumentation.
+
+Compares the per-thread sharded counter and histogram against a counter
+guarded by a shared lock, single-threaded and with several threads.
+
+Usage (from the server directory):
+    python -m benchmarks.bench_metrics --ops 200000 --threads 8
+"""
+import argparse
+import threading
+import time
+
+from utils.metrics import MetricsRegistry
+
+class LockedCounter:
+    """Baseline: one shared dict behind a lock"""
+    
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, labels: tuple = (), amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+def run(fn, ops: int, threads: int) -> float:
+    """Nanoseconds per operation with ops split across threads"""
+    per_thread = ops // threads
+    
+    def work():
+        for _ in range(per_thread):
+            fn()
+    
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (per_thread * threads) * 1e9
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ops', type=int, default=200000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+    
+    registry = MetricsRegistry()
+    sharded = registry.counter('bench_total', 'Bench', ('route',))
+    histogram = registry.histogram('bench_seconds', 'Bench', ('route',))
+    locked = LockedCounter()
+    labels = ('/api/chat',)
+    
+    cases = [
+        ('locked counter', lambda: locked.inc(labels)),
+        ('sharded counter', lambda: sharded.inc(labels)),
+        ('sharded histogram', lambda: histogram.observe(0.042, labels)),
+    ]
+    
+    print(f"{'case':<20}{'1 thread ns/op':>16}{f'{args.threads} threads ns/op':>20}")
+    for name, fn in cases:
+        single = run(fn, args.ops, 1)
+        multi = run(fn, args.ops, args.threads)
+        print(f"{name:<20}{single:>16.0f}{multi:>20.0f}")
+    
+    start = time.perf_counter()
+    registry.render()
+    print(f"render: {(time.perf_counter() - start) * 1e3:.2f} ms")
+
+if __name__ == '__main__':
+    main()
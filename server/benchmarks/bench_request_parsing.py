@@ -0,0 +1,116 @@
+"""Measure CPU per chat request spent decoding, validating and encoding JSON.
+
+The "before" path is how the chat view handled a request before the compiled
+schema: validate_message_request decoded the body with get_json and checked
+it, then the view read the dict again and stripped the message, and the
+reply went through Flask's stdlib JSON provider. The "after" path decodes
+the raw body once, validates it in one pass into a ChatRequest, and encodes
+with the fast backend when orjson is installed. Each iteration builds a
+fresh Request from the same WSGI environ, as a server would.
+
+Usage (from the server directory):
+    python -m benchmarks.bench_request_parsing --requests 50000
+"""
+import argparse
+import io
+import time
+from datetime import datetime
+
+from flask import Flask, Request, jsonify
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.test import EnvironBuilder
+
+from config import Config, PRIORITIES
+from utils import json_codec
+from utils.validators import parse_chat_request
+
+BODY = (
+    b'{"message": "Can you help me plan a three day trip to Lisbon with a focus on food and museums?", '
+    b'"session_id": "3f2a9c4e-1b7d-4e8a-9c61-2d5f0e8b7a13", "priority": "normal"}'
+)
+REPLY = {
+    'message': 'Of course! Day one: start in Alfama with a pastel de nata, then the Tile Museum. ' * 10,
+    'session_id': '3f2a9c4e-1b7d-4e8a-9c61-2d5f0e8b7a13',
+    'context_tokens': 412,
+    'timestamp': datetime.utcnow().isoformat()
+}
+
+def validate_before(request: Request) -> str:
+    """The previous validator, which decoded the body with get_json"""
+    if not request.is_json:
+        return "Request must be JSON"
+    data = request.get_json()
+    if not data:
+        return "Request body cannot be empty"
+    message = data.get('message', '').strip()
+    if not message:
+        return "Message cannot be empty"
+    if len(message) > Config.MAX_MESSAGE_LENGTH:
+        return f"Message too long. Maximum length is {Config.MAX_MESSAGE_LENGTH} characters"
+    session_id = data.get('session_id', '')
+    if session_id and len(session_id) > 100:
+        return "Session ID too long"
+    priority = data.get('priority')
+    if priority is not None and priority not in PRIORITIES:
+        return f"Priority must be one of: {', '.join(PRIORITIES)}"
+    return None
+
+def handle_before(request: Request):
+    error = validate_before(request)
+    assert error is None
+    data = request.get_json()
+    message = data.get('message', '').strip()
+    session_id = data.get('session_id', 'default')
+    priority = data.get('priority')
+    return message, session_id, priority
+
+def handle_after(request: Request):
+    chat_request, error = parse_chat_request(request)
+    assert error is None
+    return chat_request.message, chat_request.session_id, chat_request.priority
+
+def run(app: Flask, handle, environ: dict, requests: int) -> dict:
+    """Microseconds per request for decode+validate, encode, and both"""
+    decode = encode = 0.0
+    with app.app_context():
+        for _ in range(requests):
+            request = Request({**environ, 'wsgi.input': io.BytesIO(BODY)})
+            start = time.perf_counter()
+            handle(request)
+            middle = time.perf_counter()
+            jsonify(REPLY).get_data()
+            end = time.perf_counter()
+            decode += middle - start
+            encode += end - middle
+    return {
+        'decode': decode / requests * 1e6,
+        'encode': encode / requests * 1e6,
+        'total': (decode + encode) / requests * 1e6
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=50000)
+    args = parser.parse_args()
+    
+    environ = EnvironBuilder(method='POST', path='/api/chat', data=BODY, content_type='application/json').get_environ()
+    
+    before_app = Flask('before')
+    before_app.json = DefaultJSONProvider(before_app)
+    after_app = Flask('after')
+    json_codec.install(after_app)
+    
+    print(f"JSON backend: {json_codec.BACKEND}")
+    print(f"{'':<28}{'decode+validate':>16}{'encode':>10}{'total':>10}  (us/request)")
+    results = {}
+    for label, app, handle in (('before (get_json x2, stdlib)', before_app, handle_before),
+                               ('after (compiled schema)', after_app, handle_after)):
+        run(app, handle, environ, min(args.requests, 1000))  # Warm up
+        results[label] = timing = run(app, handle, environ, args.requests)
+        print(f"{label:<28}{timing['decode']:>16.2f}{timing['encode']:>10.2f}{timing['total']:>10.2f}")
+    
+    before, after = results.values()
+    print(f"Speedup: {before['total'] / after['total']:.2f}x per request")
+
+if __name__ == '__main__':
+    main()
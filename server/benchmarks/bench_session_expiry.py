@@ -0,0 +1,50 @@
+"""Measure per-message cost of ConversationManager.add_message as sessions grow.
+
+Usage (from the server directory):
+    python -m benchmarks.bench_session_expiry --max-sessions 1000000
+"""
+import argparse
+import logging
+import random
+import time
+
+from services.conversation_manager import ConversationManager
+
+def populate(manager: ConversationManager, count: int):
+    for i in range(count):
+        manager.add_message(f'session-{i}', 'user', 'Hello')
+
+def per_message_cost(manager: ConversationManager, count: int, samples: int) -> float:
+    session_ids = [f'session-{random.randrange(count)}' for _ in range(samples)]
+    start = time.perf_counter()
+    for session_id in session_ids:
+        manager.add_message(session_id, 'user', 'Hello again')
+    return (time.perf_counter() - start) / samples
+
+def full_scan_cost(manager: ConversationManager) -> float:
+    """Cost of the previous O(N) expiry walk, for reference"""
+    start = time.perf_counter()
+    now = manager.session_timestamps[next(iter(manager.session_timestamps))]
+    sum(1 for timestamp in manager.session_timestamps.values() if now - timestamp > manager.timeout)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--max-sessions', type=int, default=1000000)
+    parser.add_argument('--samples', type=int, default=20000)
+    args = parser.parse_args()
+    
+    logging.disable(logging.INFO)
+    
+    print(f"{'sessions':>10}{'us/message':>14}{'full scan us':>16}")
+    count = 1000
+    while count <= args.max_sessions:
+        manager = ConversationManager()
+        populate(manager, count)
+        cost = per_message_cost(manager, count, args.samples)
+        scan = full_scan_cost(manager)
+        print(f"{count:>10}{cost * 1e6:>14.2f}{scan * 1e6:>16.1f}")
+        count *= 10
+
+if __name__ == '__main__':
+    main()
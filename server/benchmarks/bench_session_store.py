@@ -0,0 +1,62 @@
+"""Measure append throughput and get_context latency for each session store.
+
+Usage (from the server directory):
+    python -m benchmarks.bench_session_store --sessions 5000 --appends 50000
+
+Pass a --cache-size below --sessions to exercise the cache-miss (disk read) path.
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+
+from config import Config
+from services.conversation_manager import ConversationManager
+from services.session_store import MemorySessionStore, SQLiteSessionStore
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def run(name, store, sessions: int, appends: int, reads: int, cache_size: int):
+    manager = ConversationManager(store=store)
+    manager.cache_size = cache_size
+    
+    start = time.perf_counter()
+    for i in range(appends):
+        manager.add_message(f'session-{i % sessions}', 'user', 'Hello there, this is a message.')
+    append_elapsed = time.perf_counter() - start
+    store.flush()
+    durable_elapsed = time.perf_counter() - start
+    
+    latencies = []
+    for _ in range(reads):
+        session_id = f'session-{random.randrange(sessions)}'
+        start = time.perf_counter()
+        manager.get_context(session_id)
+        latencies.append(time.perf_counter() - start)
+    
+    manager.close()
+    print(f"{name:<10}{appends / append_elapsed:>14.0f}{appends / durable_elapsed:>14.0f}"
+          f"{percentile(latencies, 50) * 1e6:>12.1f}{percentile(latencies, 99) * 1e6:>12.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=5000)
+    parser.add_argument('--appends', type=int, default=50000)
+    parser.add_argument('--reads', type=int, default=20000)
+    parser.add_argument('--cache-size', type=int, default=Config.SESSION_CACHE_SIZE)
+    args = parser.parse_args()
+    
+    logging.disable(logging.INFO)
+    
+    print(f"{'store':<10}{'appends/s':>14}{'durable/s':>14}{'p50 us':>12}{'p99 us':>12}")
+    run('memory', MemorySessionStore(), args.sessions, args.appends, args.reads, args.cache_size)
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteSessionStore(path=os.path.join(directory, 'sessions.db'))
+        run('sqlite', store, args.sessions, args.appends, args.reads, args.cache_size)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Measure chat throughput as the number of cluster workers grows.
+
+For each worker count, cluster.py is started as its own process with that
+many workers, each using an in-process fake Bedrock client with a fixed
+latency, so a worker's throughput is bound by its own CPU. Load comes from
+--drivers separate processes so the client does not share a core budget
+with one Python interpreter. Every session plays --turns chat turns and
+reads its history every other turn, as in load_test.py.
+
+With one worker the router is pure overhead, so the single-worker baseline
+is also measured without it ("direct"). Scaling is only near-linear while
+the machine has a free core for each worker plus the router and drivers;
+the CPU count is printed alongside the results.
+
+Usage (from the server directory):
+    python -m benchmarks.bench_worker_scaling --workers 1,2,4 --sessions 400 --concurrency 64
+"""
+import argparse
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.load_test import HttpClient, Recorder, play_session, summarize
+
+FACTORY = 'benchmarks.bench_worker_scaling:create_benchmark_app'
+
+def create_benchmark_app():
+    """App factory for the workers: the real app with a fake Bedrock client"""
+    from app import create_app
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    from benchmarks.fakes import fake_bedrock_service
+    return create_app(bedrock_service=fake_bedrock_service(float(os.environ.get('BENCH_BEDROCK_LATENCY', 0.02))))
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for_port(port: int, timeout: float = 60) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+def drive(url: str, indexes: List[int], args: argparse.Namespace) -> Dict[str, Any]:
+    """Play a share of the sessions from one driver process; returns its raw latencies"""
+    client = HttpClient(url, 60)
+    recorder = Recorder()
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency // args.drivers)) as pool:
+        list(pool.map(lambda index: play_session(client, recorder, index, args), indexes))
+    return {'latencies': dict(recorder.latencies), 'statuses': dict(recorder.statuses)}
+
+def run_load(url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Warm up, then drive all sessions and summarize throughput and latency"""
+    warmup = argparse.Namespace(**{**vars(args), 'turns': 1})
+    drive(url, list(range(-args.concurrency, 0)), warmup)
+    
+    shares = [list(range(args.sessions))[driver::args.drivers] for driver in range(args.drivers)]
+    recorder = Recorder()
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.drivers) as pool:
+        for part in pool.map(drive, [url] * args.drivers, shares, [args] * args.drivers):
+            for endpoint, latencies in part['latencies'].items():
+                recorder.latencies[endpoint].extend(latencies)
+                recorder.statuses[endpoint].update(part['statuses'][endpoint])
+    return summarize(recorder, time.perf_counter() - start)
+
+def start_server(workers: int, direct: bool) -> Tuple[subprocess.Popen, str]:
+    """Start cluster.py, or a single worker without the router; returns the process and its URL"""
+    port = free_port()
+    if direct:
+        command = [sys.executable, '-c',
+                   f"from cluster import serve_worker; serve_worker(0, {port}, '{FACTORY}')"]
+    else:
+        command = [sys.executable, 'cluster.py', '--workers', str(workers), '--host', '127.0.0.1',
+                   '--port', str(port), '--base-port', str(free_port()), '--app', FACTORY]
+    process = subprocess.Popen(command)
+    if not wait_for_port(port):
+        process.terminate()
+        raise RuntimeError(f"Server with {workers} workers did not start")
+    return process, f'http://127.0.0.1:{port}'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated worker counts')
+    parser.add_argument('--sessions', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--turns', type=int, default=4)
+    parser.add_argument('--drivers', type=int, default=2, help='load-generating processes')
+    parser.add_argument('--latency', type=float, default=0.02, help='fake Bedrock latency in seconds')
+    args = parser.parse_args()
+    args.history_every = 2
+    args.sessions_every = 0
+    
+    # Inherited by the server processes: no rate limits, quiet console-only logs, the fake latency
+    os.environ.update({
+        'BENCH_BEDROCK_LATENCY': str(args.latency),
+        'RATE_LIMIT_CLIENT_RPS': '0',
+        'RATE_LIMIT_SESSION_RPS': '0',
+        'ADMISSION_MAX_IN_FLIGHT': '0',
+        'LOG_LEVEL': 'WARNING',
+        'LOG_FILE': '',
+        'AWS_ACCESS_KEY_ID': os.environ.get('AWS_ACCESS_KEY_ID', 'fake'),
+        'AWS_SECRET_ACCESS_KEY': os.environ.get('AWS_SECRET_ACCESS_KEY', 'fake')
+    })
+    
+    counts = [int(count) for count in args.workers.split(',')]
+    print(f"CPUs: {os.cpu_count()}, drivers: {args.drivers}, sessions: {args.sessions} x {args.turns} turns, "
+          f"concurrency: {args.concurrency}, Bedrock latency: {args.latency * 1e3:.0f} ms")
+    if os.cpu_count() < max(counts) + args.drivers + 1:
+        print("Warning: fewer CPUs than workers + router + drivers; scaling will flatten early")
+    print(f"{'workers':<12}{'req/s':>10}{'speedup':>10}{'efficiency':>12}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}")
+    
+    baseline = None
+    runs = [(1, True)] + [(count, False) for count in counts]
+    for workers, direct in runs:
+        process, url = start_server(workers, direct)
+        try:
+            result = run_load(url, args)
+        finally:
+            process.terminate()
+            process.wait()
+        
+        throughput = result['totals']['throughput_rps']
+        if baseline is None:
+            baseline = throughput
+        chat = result['endpoints'].get('POST /api/chat', {})
+        label = '1 (direct)' if direct else str(workers)
+        print(f"{label:<12}{throughput:>10.1f}{throughput / baseline:>9.2f}x{throughput / baseline / workers:>11.0%}"
+              f"{chat.get('p50_ms', 0):>9.1f}{chat.get('p99_ms', 0):>9.1f}{result['totals']['errors']:>8}")
+
+if __name__ == '__main__':
+    main()
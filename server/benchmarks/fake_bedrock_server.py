@@ -0,0 +1,224 @@
+"""Local HTTP stand-in for the bedrock-runtime API.
+
+Serves InvokeModel and InvokeModelWithResponseStream (AWS event stream
+framing) for the messages API, so the real boto3 client can be pointed at it
+with BEDROCK_ENDPOINT_URL. Time to first token follows a configurable
+distribution, output is produced at a configurable token rate, and
+throttling, service errors and a concurrency limit can be injected.
+Request signatures are not checked; any credentials will do.
+
+Usage (from the server directory):
+    python -m benchmarks.fake_bedrock_server --port 8089 --latency-dist lognormal --latency 0.3 \\
+        --tokens-per-second 200 --output-tokens 120 --throttle-rate 0.01
+    BEDROCK_ENDPOINT_URL=http://127.0.0.1:8089 AWS_ACCESS_KEY_ID=x AWS_SECRET_ACCESS_KEY=x python app.py
+"""
+import argparse
+import base64
+import json
+import math
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROUTE = re.compile(r'^/model/(?P<model_id>[^/]+)/(?P<operation>invoke|invoke-with-response-stream)$')
+
+WORDS = ('the', 'model', 'reply', 'is', 'a', 'short', 'canned', 'answer', 'with', 'enough', 'words', 'to', 'stream')
+
+@dataclass
+class FakeBedrockProfile:
+    """Latency, output size and fault settings of the fake endpoint"""
+    
+    latency_dist: str = 'fixed'        # fixed, uniform, exponential or lognormal
+    latency: float = 0.2               # Mean (median for lognormal) time to first token, seconds
+    latency_spread: float = 0.5        # Half-width for uniform, sigma for lognormal
+    tokens_per_second: float = 0       # Output rate after the first token; 0 returns all at once
+    output_tokens: int = 60
+    throttle_rate: float = 0.0
+    error_rate: float = 0.0
+    max_concurrency: int = 0           # Throttle beyond this many in-flight calls; 0 for no limit
+    
+    def first_token_delay(self) -> float:
+        if self.latency_dist == 'uniform':
+            spread = self.latency * self.latency_spread
+            return random.uniform(self.latency - spread, self.latency + spread)
+        if self.latency_dist == 'exponential':
+            return random.expovariate(1 / self.latency) if self.latency > 0 else 0
+        if self.latency_dist == 'lognormal':
+            return random.lognormvariate(math.log(self.latency), self.latency_spread) if self.latency > 0 else 0
+        return self.latency
+    
+    def token_delay(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+
+def reply_tokens(count: int) -> list:
+    """Output "tokens", one word each, with leading spaces as a model would emit them"""
+    return [(' ' if index else '') + WORDS[index % len(WORDS)] for index in range(count)]
+
+def event_message(payload: dict, event_type: str = 'chunk', message_type: str = 'event') -> bytes:
+    """Frame one AWS event stream message"""
+    headers = b''
+    for name, value in ((':event-type', event_type), (':content-type', 'application/json'), (':message-type', message_type)):
+        name_bytes, value_bytes = name.encode('utf-8'), value.encode('utf-8')
+        # Header value type 7 is a string with a two-byte length
+        headers += struct.pack('>B', len(name_bytes)) + name_bytes + struct.pack('>BH', 7, len(value_bytes)) + value_bytes
+    body = json.dumps(payload).encode('utf-8')
+    prelude = struct.pack('>II', 16 + len(headers) + len(body), len(headers))
+    message = prelude + struct.pack('>I', zlib.crc32(prelude)) + headers + body
+    return message + struct.pack('>I', zlib.crc32(message))
+
+def chunk_event(payload: dict) -> bytes:
+    return event_message({'bytes': base64.b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')})
+
+class FakeBedrockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without TCP_NODELAY a reused
+    # connection adds a delayed-ACK stall that the real endpoint does not have
+    disable_nagle_algorithm = True
+    server: 'FakeBedrockServer'
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        match = ROUTE.match(self.path.split('?')[0])
+        if match is None:
+            return self._send_error(404, 'ResourceNotFoundException', 'Unknown operation')
+        
+        stats = self.server.stats
+        with self.server.lock:
+            self.server.in_flight += 1
+            in_flight = self.server.in_flight
+            stats['requests'] += 1
+        try:
+            profile = self.server.profile
+            roll = random.random()
+            if roll < profile.throttle_rate or 0 < profile.max_concurrency < in_flight:
+                with self.server.lock:
+                    stats['throttled'] += 1
+                return self._send_error(429, 'ThrottlingException', 'Too many requests, please wait before trying again.')
+            if roll < profile.throttle_rate + profile.error_rate:
+                with self.server.lock:
+                    stats['errors'] += 1
+                return self._send_error(503, 'ServiceUnavailableException', 'Service unavailable')
+            
+            input_tokens = len(body) // 4
+            tokens = reply_tokens(max(1, int(random.gauss(profile.output_tokens, profile.output_tokens / 4))))
+            time.sleep(max(0.0, profile.first_token_delay()))
+            if match.group('operation') == 'invoke':
+                self._invoke(profile, tokens, input_tokens)
+            else:
+                self._stream(profile, tokens, input_tokens)
+        finally:
+            with self.server.lock:
+                self.server.in_flight -= 1
+    
+    def _invoke(self, profile: FakeBedrockProfile, tokens: list, input_tokens: int):
+        time.sleep(profile.token_delay() * (len(tokens) - 1))
+        self._send_json(200, {
+            'output': {'message': {'role': 'assistant', 'content': [{'text': ''.join(tokens)}]}},
+            'stopReason': 'end_turn',
+            'usage': {'inputTokens': input_tokens, 'outputTokens': len(tokens), 'totalTokens': input_tokens + len(tokens)}
+        })
+    
+    def _stream(self, profile: FakeBedrockProfile, tokens: list, input_tokens: int):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/vnd.amazon.eventstream')
+        self.send_header('X-Amzn-Bedrock-Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        
+        self._write_chunk(chunk_event({'messageStart': {'role': 'assistant'}}))
+        for index, token in enumerate(tokens):
+            if index:
+                time.sleep(profile.token_delay())
+            self._write_chunk(chunk_event({'contentBlockDelta': {'delta': {'text': token}, 'contentBlockIndex': 0}}))
+        self._write_chunk(chunk_event({'contentBlockStop': {'contentBlockIndex': 0}}))
+        self._write_chunk(chunk_event({'messageStop': {'stopReason': 'end_turn'}}))
+        self._write_chunk(chunk_event({'metadata': {'usage': {'inputTokens': input_tokens, 'outputTokens': len(tokens)}}}))
+        self.wfile.write(b'0\r\n\r\n')
+    
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+    
+    def _send_error(self, status: int, code: str, message: str):
+        self._send_json(status, {'message': message}, {'x-amzn-ErrorType': f'{code}:http://internal.amazon.com/coral/com.amazon.bedrock/'})
+    
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+class FakeBedrockServer(ThreadingHTTPServer):
+    """Threaded fake endpoint; profile and counters are shared by all request threads"""
+    
+    daemon_threads = True
+    request_queue_size = 1024
+    
+    def __init__(self, address=('127.0.0.1', 0), profile: FakeBedrockProfile = None):
+        super().__init__(address, FakeBedrockHandler)
+        self.profile = profile or FakeBedrockProfile()
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.stats = {'requests': 0, 'throttled': 0, 'errors': 0}
+    
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+    
+    def start(self) -> 'FakeBedrockServer':
+        """Serve from a daemon thread"""
+        threading.Thread(target=self.serve_forever, name='fake-bedrock', daemon=True).start()
+        return self
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    defaults = FakeBedrockProfile()
+    parser.add_argument('--latency-dist', choices=('fixed', 'uniform', 'exponential', 'lognormal'), default=defaults.latency_dist)
+    parser.add_argument('--latency', type=float, default=defaults.latency, help='mean (median for lognormal) time to first token')
+    parser.add_argument('--latency-spread', type=float, default=defaults.latency_spread, help='uniform half-width ratio or lognormal sigma')
+    parser.add_argument('--tokens-per-second', type=float, default=defaults.tokens_per_second)
+    parser.add_argument('--output-tokens', type=int, default=defaults.output_tokens)
+    parser.add_argument('--throttle-rate', type=float, default=defaults.throttle_rate)
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate)
+    parser.add_argument('--max-concurrency', type=int, default=defaults.max_concurrency)
+
+def profile_from_args(args: argparse.Namespace) -> FakeBedrockProfile:
+    return FakeBedrockProfile(
+        latency_dist=args.latency_dist,
+        latency=args.latency,
+        latency_spread=args.latency_spread,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        max_concurrency=args.max_concurrency
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    
+    server = FakeBedrockServer((args.host, args.port), profile_from_args(args))
+    print(f"Fake bedrock-runtime listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
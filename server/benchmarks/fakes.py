@@ -0,0 +1,78 @@
+"""In-process stand-ins for the bedrock-runtime client used by the benchmarks"""
+import io
+import json
+import random
+import time
+from botocore.exceptions import ClientError
+
+class FakeBedrockClient:
+    """Mimics the parts of the boto3 bedrock-runtime client we call.
+    
+    Each call sleeps for a fixed latency to simulate model generation time.
+    throttle_rate and error_rate inject ThrottlingException and
+    ServiceUnavailableException failures with the given probabilities.
+    """
+    
+    def __init__(self, latency: float = 0.05, reply: str = "This is a canned reply.", stream_chunks: int = 5,
+                 throttle_rate: float = 0.0, error_rate: float = 0.0):
+        self.latency = latency
+        self.reply = reply
+        self.stream_chunks = stream_chunks
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.calls = 0
+    
+    def invoke_model(self, modelId, body, accept=None, contentType=None):
+        self.calls += 1
+        self._maybe_fail('InvokeModel')
+        time.sleep(self.latency)
+        payload = {
+            'output': {'message': {'role': 'assistant', 'content': [{'text': self.reply}]}},
+            'stopReason': 'end_turn',
+            'usage': {'inputTokens': len(body) // 4, 'outputTokens': len(self.reply) // 4}
+        }
+        return {'body': io.BytesIO(json.dumps(payload).encode('utf-8'))}
+    
+    def invoke_model_with_response_stream(self, modelId, body, accept=None, contentType=None):
+        self.calls += 1
+        self._maybe_fail('InvokeModelWithResponseStream')
+        return {'body': self._events()}
+    
+    def _maybe_fail(self, operation):
+        roll = random.random()
+        if roll < self.throttle_rate:
+            raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Too many requests'}}, operation)
+        if roll < self.throttle_rate + self.error_rate:
+            raise ClientError({'Error': {'Code': 'ServiceUnavailableException', 'Message': 'Service unavailable'}}, operation)
+    
+    def _events(self):
+        step = max(1, len(self.reply) // self.stream_chunks)
+        yield self._chunk({'messageStart': {'role': 'assistant'}})
+        for start in range(0, len(self.reply), step):
+            time.sleep(self.latency / self.stream_chunks)
+            yield self._chunk({'contentBlockDelta': {'delta': {'text': self.reply[start:start + step]}, 'contentBlockIndex': 0}})
+        yield self._chunk({'messageStop': {'stopReason': 'end_turn'}})
+    
+    def _chunk(self, payload):
+        return {'chunk': {'bytes': json.dumps(payload).encode('utf-8')}}
+
+def fake_bedrock_service(latency: float = 0.05, **kwargs):
+    """Build a BedrockService whose client is a FakeBedrockClient"""
+    from services.bedrock_service import BedrockService
+    service = BedrockService()
+    service.client = FakeBedrockClient(latency=latency, **kwargs)
+    return service
+
+def unlimited_admission():
+    """An AdmissionController with no rate or concurrency limits
+    
+    The harnesses drive the app far harder than one real client would, so
+    the default per-client and per-session buckets would shed most of the
+    load with 429s and the results would measure the limiter.
+    """
+    from services.admission_control import AdmissionController, ConcurrencyLimiter, TokenBucketLimiter
+    return AdmissionController(
+        client_limiter=TokenBucketLimiter(0, 0, 1),
+        session_limiter=TokenBucketLimiter(0, 0, 1),
+        concurrency=ConcurrencyLimiter(0, 0, 0)
+    )
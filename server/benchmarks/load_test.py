@@ -0,0 +1,309 @@
+"""Load-test the chat API and report throughput and latency percentiles.
+
+By default a fake bedrock-runtime server (benchmarks/fake_bedrock_server.py)
+and the Flask app are started in-process, with the real boto3 client
+pointed at the fake, with rate limiting and the concurrency cap turned off.
+Pass --url to drive a server that is already running; start it with
+RATE_LIMIT_CLIENT_RPS=0, RATE_LIMIT_SESSION_RPS=0 and ADMISSION_MAX_IN_FLIGHT=0
+or most requests will be shed with 429.
+
+Each session is played by one virtual user, --concurrency at a time. A user
+sends --turns chat messages. It reads its history every --history-every
+turns and lists all sessions every --sessions-every turns. Memory is
+sampled from /metrics while the test runs. Results are written as JSON, and
+--compare prints the change against an earlier result.
+
+Usage (from the server directory):
+    python -m benchmarks.load_test --sessions 500 --concurrency 32 --turns 4 --output benchmarks/results/base.json
+    python -m benchmarks.load_test --sessions 500 --concurrency 32 --turns 4 --compare benchmarks/results/base.json
+"""
+import argparse
+import http.client
+import json
+import logging
+import math
+import os
+import platform
+import subprocess
+import threading
+import time
+import urllib.parse
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.fake_bedrock_server import FakeBedrockServer, add_profile_arguments, profile_from_args
+from config import Config
+
+CHAT = 'POST /api/chat'
+HISTORY = 'GET /api/conversation/<session_id>'
+SESSIONS = 'GET /api/sessions'
+
+MEMORY_METRICS = ('process_resident_memory_bytes', 'chat_session_memory_bytes', 'chat_cached_sessions', 'chat_active_sessions')
+
+class HttpClient:
+    """Keep-alive HTTP/1.1 client with one connection per thread"""
+    
+    def __init__(self, base_url: str, timeout: float):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+    
+    def request(self, method: str, path: str, payload: Any = None) -> Tuple[int, bytes]:
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        for attempt in range(2):
+            connection = getattr(self._local, 'connection', None)
+            if connection is None:
+                connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                # The server may close idle keep-alive connections; retry once on a new one
+                connection.close()
+                self._local.connection = None
+                if attempt:
+                    raise
+
+class Recorder:
+    """Latencies and status codes per endpoint"""
+    
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self._lock = threading.Lock()
+    
+    def call(self, client: HttpClient, endpoint: str, method: str, path: str, payload: Any = None) -> int:
+        start = time.perf_counter()
+        try:
+            status, _ = client.request(method, path, payload)
+        except OSError:
+            status = 0
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies[endpoint].append(elapsed)
+            self.statuses[endpoint][status] += 1
+        return status
+
+def percentile(ordered: List[float], p: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+def play_session(client: HttpClient, recorder: Recorder, index: int, args: argparse.Namespace):
+    session_id = f'load-{index}'
+    for turn in range(1, args.turns + 1):
+        message = f'Turn {turn}: tell me something interesting about the number {index}.'
+        recorder.call(client, CHAT, 'POST', '/api/chat', {'message': message, 'session_id': session_id})
+        if args.history_every and turn % args.history_every == 0:
+            recorder.call(client, HISTORY, 'GET', f'/api/conversation/{session_id}')
+        if args.sessions_every and (index * args.turns + turn) % args.sessions_every == 0:
+            recorder.call(client, SESSIONS, 'GET', '/api/sessions')
+
+def scrape_memory(client: HttpClient) -> Dict[str, float]:
+    status, body = client.request('GET', '/metrics')
+    values = {}
+    if status != 200:
+        return values
+    for line in body.decode('utf-8').splitlines():
+        name, _, value = line.partition(' ')
+        if name in MEMORY_METRICS:
+            values[name] = float(value)
+    return values
+
+class MemorySampler(threading.Thread):
+    """Scrapes the memory gauges from /metrics at a fixed interval"""
+    
+    def __init__(self, client: HttpClient, interval: float, progress):
+        super().__init__(name='memory-sampler', daemon=True)
+        self.client = client
+        self.interval = interval
+        self.progress = progress
+        self.samples: List[Dict[str, float]] = []
+        self.started = time.perf_counter()
+        self._stopped = threading.Event()
+    
+    def sample(self):
+        try:
+            values = scrape_memory(self.client)
+        except OSError:
+            return
+        self.samples.append({'elapsed_s': round(time.perf_counter() - self.started, 3), 'sessions_done': self.progress(), **values})
+    
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.sample()
+    
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        self.sample()
+
+def summarize(recorder: Recorder, duration: float) -> Dict[str, Any]:
+    endpoints = {}
+    for endpoint, latencies in sorted(recorder.latencies.items()):
+        ordered = sorted(latencies)
+        statuses = recorder.statuses[endpoint]
+        endpoints[endpoint] = {
+            'count': len(ordered),
+            'errors': sum(count for status, count in statuses.items() if not 200 <= status < 300),
+            'throughput_rps': round(len(ordered) / duration, 2),
+            'mean_ms': round(sum(ordered) / len(ordered) * 1e3, 2),
+            'p50_ms': round(percentile(ordered, 50) * 1e3, 2),
+            'p95_ms': round(percentile(ordered, 95) * 1e3, 2),
+            'p99_ms': round(percentile(ordered, 99) * 1e3, 2),
+            'max_ms': round(ordered[-1] * 1e3, 2),
+            'statuses': {str(status): count for status, count in sorted(statuses.items())}
+        }
+    requests = sum(stats['count'] for stats in endpoints.values())
+    return {
+        'totals': {
+            'requests': requests,
+            'errors': sum(stats['errors'] for stats in endpoints.values()),
+            'duration_s': round(duration, 3),
+            'throughput_rps': round(requests / duration, 2)
+        },
+        'endpoints': endpoints
+    }
+
+def summarize_memory(samples: List[Dict[str, float]], sessions: int) -> Dict[str, Any]:
+    rss = [sample['process_resident_memory_bytes'] for sample in samples if 'process_resident_memory_bytes' in sample]
+    if not rss:
+        return {'samples': samples}
+    growth = rss[-1] - rss[0]
+    return {
+        'rss_start_bytes': rss[0],
+        'rss_end_bytes': rss[-1],
+        'rss_peak_bytes': max(rss),
+        'rss_growth_bytes': growth,
+        'rss_growth_per_session_bytes': round(growth / sessions, 1) if sessions else 0,
+        'session_memory_end_bytes': samples[-1].get('chat_session_memory_bytes'),
+        'samples': samples
+    }
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def start_local_stack(args: argparse.Namespace) -> Tuple[str, FakeBedrockServer]:
+    """Start the fake Bedrock endpoint and the Flask app on ephemeral ports"""
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'fake')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'fake')
+    fake = FakeBedrockServer(profile=profile_from_args(args)).start()
+    Config.BEDROCK_ENDPOINT_URL = fake.url
+    
+    # Log to the console only, not to the server's logs/app.log
+    Config.LOG_FILE = ''
+    from werkzeug.serving import make_server
+    from app import create_app
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    
+    from benchmarks.fakes import unlimited_admission
+    server = make_server('127.0.0.1', 0, create_app(admission=unlimited_admission()), threaded=True)
+    threading.Thread(target=server.serve_forever, name='app-server', daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', fake
+
+def print_report(result: Dict[str, Any]):
+    totals = result['totals']
+    print(f"{totals['requests']} requests in {totals['duration_s']}s: {totals['throughput_rps']} req/s, {totals['errors']} errors")
+    print(f"{'endpoint':<38}{'count':>8}{'err':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for endpoint, stats in result['endpoints'].items():
+        print(f"{endpoint:<38}{stats['count']:>8}{stats['errors']:>6}{stats['throughput_rps']:>9}"
+              f"{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}")
+    memory = result['memory']
+    if 'rss_growth_bytes' in memory:
+        print(f"RSS {memory['rss_start_bytes'] / 2**20:.1f} -> {memory['rss_end_bytes'] / 2**20:.1f} MiB "
+              f"({memory['rss_growth_per_session_bytes']:.0f} bytes per session)")
+
+def print_comparison(result: Dict[str, Any], baseline: Dict[str, Any]):
+    print(f"\nChange against {baseline['meta'].get('commit') or 'baseline'} ({baseline['meta']['timestamp']}):")
+    
+    def change(new: float, old: float) -> str:
+        return f"{(new - old) / old * 100:+.1f}%" if old else 'n/a'
+    
+    for endpoint, stats in result['endpoints'].items():
+        old = baseline['endpoints'].get(endpoint)
+        if old is None:
+            continue
+        deltas = ', '.join(f"{key} {change(stats[key], old[key])}" for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms'))
+        print(f"  {endpoint}: {deltas}")
+    old_memory, new_memory = baseline.get('memory', {}), result['memory']
+    if 'rss_growth_per_session_bytes' in old_memory and 'rss_growth_per_session_bytes' in new_memory:
+        print(f"  RSS growth per session: {change(new_memory['rss_growth_per_session_bytes'], old_memory['rss_growth_per_session_bytes'])}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='drive an already running server instead of starting one')
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--turns', type=int, default=4)
+    parser.add_argument('--history-every', type=int, default=2, help='read history every N turns, 0 to disable')
+    parser.add_argument('--sessions-every', type=int, default=50, help='list sessions every N turns overall, 0 to disable')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--memory-interval', type=float, default=1.0)
+    parser.add_argument('--output', help='write the JSON result here (default: benchmarks/results/<timestamp>-<commit>.json)')
+    parser.add_argument('--compare', help='earlier JSON result to compare against')
+    parser.add_argument('--verbose', action='store_true', help='keep INFO logging of the in-process app')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    
+    fake = None
+    base_url = args.url
+    if base_url is None:
+        base_url, fake = start_local_stack(args)
+    
+    client = HttpClient(base_url, args.timeout)
+    recorder = Recorder()
+    done = [0]
+    done_lock = threading.Lock()
+    
+    def run_session(index: int):
+        play_session(client, recorder, index, args)
+        with done_lock:
+            done[0] += 1
+    
+    sampler = MemorySampler(HttpClient(base_url, args.timeout), args.memory_interval, lambda: done[0])
+    sampler.sample()
+    sampler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(run_session, range(args.sessions)))
+    duration = time.perf_counter() - start
+    sampler.stop()
+    
+    result = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'target': args.url or 'in-process',
+            'args': vars(args),
+            'fake_bedrock': dict(fake.stats) if fake else None
+        },
+        **summarize(recorder, duration),
+        'memory': summarize_memory(sampler.samples, args.sessions)
+    }
+    print_report(result)
+    
+    output = args.output or os.path.join('benchmarks', 'results', f"{datetime.now():%Y%m%d-%H%M%S}-{result['meta']['commit'] or 'local'}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"Saved {output}")
+    
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(result, json.load(f))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,635 @@
+"""Serve the chat API from several worker processes behind a session-affinity router.
+
+Each worker is a separate process running the Flask app with its own
+ConversationManager, so the API can use more than one CPU core. The router
+sends every request for a session to the worker that owns the session on a
+consistent hash ring. A conversation's history, turn ordering and session
+rate limit therefore stay in one process without any shared state, and
+adding a worker moves only about 1/n of the sessions.
+
+Requests that are not about one session are split or fanned out:
+- POST /api/chat/batch runs each worker's share of the items there and
+  returns the results in input order.
+- GET /api/sessions asks every worker for the same page and merges the
+  pages. Cursors are positions in a global order, so they work unchanged.
+- Other routes (health, stats, /metrics) go to the workers in turn. Every
+  response names its worker in X-Cluster-Worker; scrape /metrics from each
+  worker port to see them all.
+
+Offline batches are not accepted by the router, because ingesting one would
+write replies into whichever worker ran the ingest.
+
+Usage (from the server directory):
+    python cluster.py --workers 4 --port 5001
+"""
+import argparse
+import asyncio
+import importlib
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import re
+import signal
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlencode
+from config import Config
+from services.admission_control import TokenBucketLimiter
+from services.session_catalog import EPOCH
+from utils import json_codec
+from utils.hash_ring import HashRing
+from utils.validators import parse_sessions_query, validate_batch_payload
+
+logger = logging.getLogger(__name__)
+
+SESSION_ROUTE = re.compile(r'^/api/(?:conversation|sessions)/(?P<session_id>[^/]+)$')
+CHAT_ROUTES = ('/api/chat', '/api/chat/stream')
+INGEST_ROUTE = re.compile(r'^/api/chat/batch/[^/]+/ingest$')
+
+# Headers that describe one connection and are not forwarded
+HOP_BY_HOP = frozenset((
+    b'connection', b'keep-alive', b'proxy-connection', b'te', b'trailer', b'transfer-encoding', b'upgrade'
+))
+
+REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large', 429: 'Too Many Requests',
+    501: 'Not Implemented', 502: 'Bad Gateway'
+}
+
+Headers = List[Tuple[bytes, bytes]]
+
+class WorkerError(Exception):
+    """A worker could not be reached or sent a malformed response"""
+
+class Response:
+    """A buffered HTTP response"""
+    
+    __slots__ = ('status', 'headers', 'body')
+    
+    def __init__(self, status: int, headers: Headers, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+    
+    def json(self) -> Any:
+        return json_codec.loads(self.body)
+
+async def read_head(reader: asyncio.StreamReader) -> Tuple[bytes, Headers]:
+    """Start line and headers of a request or response"""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head[:-4].split(b'\r\n')
+    headers = []
+    for line in lines[1:]:
+        name, _, value = line.partition(b':')
+        headers.append((name.strip(), value.strip()))
+    return lines[0], headers
+
+def get_header(headers: Headers, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+async def read_body(reader: asyncio.StreamReader, headers: Headers) -> bytes:
+    """Body framed by Content-Length or chunked encoding; empty if neither"""
+    length = get_header(headers, b'content-length')
+    if length is not None:
+        return await reader.readexactly(int(length))
+    if (get_header(headers, b'transfer-encoding') or b'').lower() == b'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await reader.readline()
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+    return b''
+
+def has_body(method: bytes, status: int) -> bool:
+    return method != b'HEAD' and status >= 200 and status not in (204, 304)
+
+class WorkerClient:
+    """Keep-alive HTTP/1.1 connections to one worker, reused across requests
+    
+    Idle connections are pooled up to pool_size; a request that finds the
+    pool empty opens a new connection rather than waiting.
+    """
+    
+    def __init__(self, name: str, host: str, port: int, pool_size: int = None, timeout: float = None):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.pool_size = pool_size or Config.CLUSTER_POOL_SIZE
+        self.timeout = timeout or Config.CLUSTER_TIMEOUT
+        self.requests = 0
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+    
+    async def send(self, method: bytes, target: bytes, headers: Headers, body: bytes):
+        """Send a request and read the response head; returns (connection, status line, headers)
+        
+        A pooled connection may have been closed by the worker while idle, so a
+        request that gets nothing back on one is retried once on a new connection.
+        """
+        self.requests += 1
+        lines = [method + b' ' + target + b' HTTP/1.1', b'Host: ' + self.host.encode('ascii')]
+        lines.extend(name + b': ' + value for name, value in headers)
+        lines.append(b'Content-Length: ' + str(len(body)).encode('ascii'))
+        request = b'\r\n'.join(lines) + b'\r\n\r\n' + body
+        
+        while True:
+            reused = bool(self._idle)
+            connection = self._idle.pop() if reused else await self._connect()
+            try:
+                connection[1].write(request)
+                status_line, response_headers = await asyncio.wait_for(read_head(connection[0]), self.timeout)
+                return connection, status_line, response_headers
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                connection[1].close()
+                if not reused:
+                    raise WorkerError(f"Worker {self.name} closed the connection") from e
+            except asyncio.TimeoutError as e:
+                connection[1].close()
+                raise WorkerError(f"Worker {self.name} timed out") from e
+    
+    async def request(self, method: bytes, target: bytes, headers: Headers = (), body: bytes = b'') -> Response:
+        """Send a request and buffer the whole response"""
+        connection, status_line, response_headers = await self.send(method, target, list(headers), body)
+        status = int(status_line.split(b' ', 2)[1])
+        try:
+            data = await read_body(connection[0], response_headers) if has_body(method, status) else b''
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            connection[1].close()
+            raise WorkerError(f"Worker {self.name} closed the connection") from e
+        self.release(connection, response_headers)
+        return Response(status, response_headers, data)
+    
+    def release(self, connection, response_headers: Headers):
+        """Return a connection to the pool, unless it is closing or the pool is full"""
+        closing = (get_header(response_headers, b'connection') or b'').lower() == b'close'
+        if closing or len(self._idle) >= self.pool_size:
+            connection[1].close()
+        else:
+            self._idle.append(connection)
+    
+    async def close(self):
+        while self._idle:
+            self._idle.pop()[1].close()
+    
+    async def _connect(self):
+        try:
+            return await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            raise WorkerError(f"Worker {self.name} is unreachable") from e
+
+class ClusterRouter:
+    """HTTP front end that routes requests to the worker owning their session
+    
+    The per-client rate limit is enforced here, once for the whole cluster,
+    since a client's sessions are spread over all the workers. Session rate
+    limits stay with the workers, which each own their sessions outright.
+    """
+    
+    def __init__(self, workers: List[WorkerClient], virtual_nodes: int = None,
+                 client_limiter: TokenBucketLimiter = None):
+        self.workers = {worker.name: worker for worker in workers}
+        self.ring = HashRing(self.workers, virtual_nodes or Config.CLUSTER_VIRTUAL_NODES)
+        self._next = itertools.cycle(workers)
+        if client_limiter is None:
+            client_limiter = TokenBucketLimiter(
+                Config.RATE_LIMIT_CLIENT_RPS, Config.RATE_LIMIT_CLIENT_BURST, Config.RATE_LIMIT_MAX_KEYS
+            )
+        self.client_limiter = client_limiter
+        self.server: Optional[asyncio.AbstractServer] = None
+    
+    def owner(self, session_id: str) -> WorkerClient:
+        return self.workers[self.ring.node_for(session_id)]
+    
+    async def start(self, host: str, port: int) -> asyncio.AbstractServer:
+        self.server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+        return self.server
+    
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for worker in self.workers.values():
+            await worker.close()
+    
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info('peername')
+        client_address = peer[0].encode('ascii') if peer else b''
+        try:
+            while True:
+                try:
+                    request_line, headers = await read_head(reader)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                method, target, version = request_line.split(b' ', 2)
+                body = await read_body(reader, headers)
+                connection = (get_header(headers, b'connection') or b'').lower()
+                keep_alive = connection != b'close' if version == b'HTTP/1.1' else connection == b'keep-alive'
+                
+                forwarded = [(name, value) for name, value in headers
+                             if name.lower() not in HOP_BY_HOP and name.lower() not in (b'content-length', b'host')]
+                forwarded.append((b'X-Forwarded-For', client_address))
+                client_key = self._client_key(headers, client_address)
+                try:
+                    await self.dispatch(writer, method, target, forwarded, body, keep_alive, client_key)
+                except WorkerError as e:
+                    logger.error(f"Cluster routing error: {str(e)}")
+                    self.write_json(writer, 502, {'error': 'Worker unavailable'}, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            return
+        finally:
+            writer.close()
+    
+    async def dispatch(self, writer: asyncio.StreamWriter, method: bytes, target: bytes, headers: Headers,
+                       body: bytes, keep_alive: bool, client_key: str = 'unknown'):
+        path, _, query = target.decode('latin-1').partition('?')
+        
+        match = SESSION_ROUTE.match(path)
+        if match:
+            return await self.relay(writer, self.owner(unquote(match.group('session_id'))),
+                                    method, target, headers, body, keep_alive)
+        
+        if method == b'POST' and path in CHAT_ROUTES:
+            if not self.charge_client(writer, client_key, 1, keep_alive):
+                return
+            session_id = self._body_session_id(body)
+            worker = self.owner(session_id) if session_id is not None else next(self._next)
+            status = await self.relay(writer, worker, method, target, headers, body, keep_alive)
+            if status == 429:
+                # Refused by the session's limit on the worker; the client's tokens are given back
+                self.client_limiter.refund(client_key, 1)
+            return
+        
+        if method == b'POST' and path == '/api/chat/batch':
+            return await self.batch(writer, target, headers, body, keep_alive, client_key)
+        
+        if INGEST_ROUTE.match(path):
+            return self.write_json(writer, 501, {'error': 'Offline batches are not supported in cluster mode'}, keep_alive)
+        
+        if method == b'GET' and path == '/api/sessions':
+            return await self.sessions(writer, query, headers, keep_alive)
+        
+        if method == b'GET' and path == '/api/cluster/status':
+            return self.write_json(writer, 200, self.status(), keep_alive)
+        
+        return await self.relay(writer, next(self._next), method, target, headers, body, keep_alive)
+    
+    async def relay(self, writer: asyncio.StreamWriter, worker: WorkerClient, method: bytes, target: bytes,
+                    headers: Headers, body: bytes, keep_alive: bool) -> int:
+        """Forward a request and stream the response back as it arrives, so SSE is not buffered; returns its status"""
+        connection, status_line, response_headers = await worker.send(method, target, headers, body)
+        reader = connection[0]
+        status = int(status_line.split(b' ', 2)[1])
+        
+        length = get_header(response_headers, b'content-length')
+        chunked = (get_header(response_headers, b'transfer-encoding') or b'').lower() == b'chunked'
+        until_close = has_body(method, status) and length is None and not chunked
+        
+        lines = [b'HTTP/1.1' + status_line[status_line.index(b' '):]]
+        lines.extend(name + b': ' + value for name, value in response_headers
+                     if name.lower() not in (b'connection', b'keep-alive'))
+        lines.append(b'X-Cluster-Worker: ' + worker.name.encode('ascii'))
+        if until_close:
+            # Unframed body: re-frame it with chunked encoding for the client
+            lines.append(b'Transfer-Encoding: chunked')
+        lines.append(b'Connection: keep-alive' if keep_alive else b'Connection: close')
+        writer.write(b'\r\n'.join(lines) + b'\r\n\r\n')
+        
+        try:
+            if not has_body(method, status):
+                pass
+            elif length is not None:
+                writer.write(await reader.readexactly(int(length)))
+            elif chunked:
+                while True:
+                    size_line = await reader.readline()
+                    size = int(size_line.split(b';')[0], 16)
+                    writer.write(size_line)
+                    writer.write(await reader.readexactly(size + 2))
+                    await writer.drain()
+                    if size == 0:
+                        break
+            else:
+                while True:
+                    data = await reader.read(65536)
+                    if not data:
+                        break
+                    writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+                    await writer.drain()
+                writer.write(b'0\r\n\r\n')
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            connection[1].close()
+            raise ConnectionError(f"Worker {worker.name} closed the connection mid-response") from e
+        
+        if until_close:
+            connection[1].close()
+        else:
+            worker.release(connection, response_headers)
+        return status
+    
+    async def batch(self, writer: asyncio.StreamWriter, target: bytes, headers: Headers, body: bytes, keep_alive: bool,
+                    client_key: str = 'unknown'):
+        """Run each worker's share of a batch there and merge the results in input order"""
+        try:
+            data = json_codec.loads(body)
+        except ValueError:
+            data = None
+        if data is None or validate_batch_payload(data):
+            # Let a worker produce the usual validation error
+            return await self.relay(writer, next(self._next), b'POST', target, headers, body, keep_alive)
+        if data.get('mode', 'online') == 'offline':
+            return self.write_json(writer, 501, {'error': 'Offline batches are not supported in cluster mode'}, keep_alive)
+        if not self.charge_client(writer, client_key, len(data['items']), keep_alive):
+            return
+        
+        shares: Dict[str, List[int]] = {}
+        for index, item in enumerate(data['items']):
+            session_id = item.get('session_id', 'default') if isinstance(item, dict) else None
+            worker = self.owner(session_id) if isinstance(session_id, str) else next(self._next)
+            shares.setdefault(worker.name, []).append(index)
+        
+        names = list(shares)
+        responses = await asyncio.gather(*(
+            self.workers[name].request(b'POST', target, headers, json_codec.dumps_bytes(
+                {**data, 'items': [data['items'][index] for index in shares[name]]}
+            ))
+            for name in names
+        ), return_exceptions=True)
+        
+        results: List[Optional[Dict[str, Any]]] = [None] * len(data['items'])
+        for name, response in zip(names, responses):
+            indexes = shares[name]
+            if isinstance(response, Response) and response.status == 200:
+                for result in response.json()['results']:
+                    result['index'] = indexes[result['index']]
+                    results[result['index']] = result
+                continue
+            # A share that failed as a whole, e.g. rate limited, fails each of its items
+            if isinstance(response, Response):
+                status, error = response.status, response.json().get('error', 'Worker error')
+                if status == 429:
+                    self.client_limiter.refund(client_key, len(indexes))
+            else:
+                status, error = 502, 'Worker unavailable'
+            for index in indexes:
+                item = data['items'][index]
+                session_id = item.get('session_id', 'default') if isinstance(item, dict) else None
+                results[index] = {'index': index, 'session_id': session_id, 'status': status, 'error': error}
+        
+        succeeded = sum(1 for result in results if result['status'] == 200)
+        self.write_json(writer, 200, {
+            'results': results,
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'timestamp': datetime.utcnow().isoformat()
+        }, keep_alive)
+    
+    async def sessions(self, writer: asyncio.StreamWriter, query: str, headers: Headers, keep_alive: bool):
+        """Merge the same page of sessions from every worker"""
+        args = dict(parse_qsl(query))
+        params, validation_error = parse_sessions_query(args)
+        if validation_error:
+            return self.write_json(writer, 400, {'error': validation_error}, keep_alive)
+        
+        worker_query = {key: value for key, value in params.items() if value not in (None, '')}
+        target = ('/api/sessions?' + urlencode({**worker_query, 'details': 'true'})).encode('latin-1')
+        responses = await asyncio.gather(*(
+            worker.request(b'GET', target, headers) for worker in self.workers.values()
+        ))
+        for response in responses:
+            if response.status != 200:
+                return self.write_json(writer, response.status, response.json(), keep_alive)
+        pages = [response.json() for response in responses]
+        
+        sessions = [session for page in pages for session in page['sessions']]
+        more = any(page['next_cursor'] is not None for page in pages)
+        if params['order'] == 'id':
+            sessions.sort(key=lambda session: session['session_id'])
+        else:
+            sessions.sort(key=self._activity_key, reverse=True)
+        
+        limit = params['limit']
+        next_cursor = None
+        if len(sessions) > limit or (more and sessions):
+            sessions = sessions[:limit]
+            last = sessions[-1]
+            if params['order'] == 'id':
+                next_cursor = last['session_id']
+            else:
+                next_cursor = '{}:{}'.format(*self._activity_key(last))
+        
+        details = args.get('details', 'false').lower() == 'true'
+        self.write_json(writer, 200, {
+            'sessions': sessions if details else [session['session_id'] for session in sessions],
+            'count': sum(page['count'] for page in pages),
+            'next_cursor': next_cursor
+        }, keep_alive)
+    
+    def charge_client(self, writer: asyncio.StreamWriter, client_key: str, cost: int, keep_alive: bool) -> bool:
+        """Take cost tokens from the client's bucket, or answer 429 (413 if it could never hold them)"""
+        wait = self.client_limiter.acquire(client_key, cost)
+        if not wait:
+            return True
+        if math.isinf(wait):
+            self.write_json(writer, 413, {
+                'error': f"Batch too large for the client rate limit. At most {int(self.client_limiter.burst)} items are allowed"
+            }, keep_alive)
+            return False
+        retry_after = max(1, math.ceil(wait))
+        self.write_json(writer, 429, {'error': 'Too many requests. Please retry later.', 'retry_after': retry_after},
+                        keep_alive, [(b'Retry-After', str(retry_after).encode('ascii'))])
+        return False
+    
+    def status(self) -> Dict[str, Any]:
+        return {
+            'workers': [
+                {'name': worker.name, 'url': f'http://{worker.host}:{worker.port}', 'requests': worker.requests}
+                for worker in self.workers.values()
+            ],
+            'virtual_nodes': self.ring.virtual_nodes
+        }
+    
+    def write_json(self, writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool,
+                   headers: Headers = ()):
+        body = json_codec.dumps_bytes(payload)
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        ).encode('latin-1')
+        head += b''.join(name + b': ' + value + b'\r\n' for name, value in headers)
+        writer.write(head + b'\r\n' + body)
+    
+    @staticmethod
+    def _activity_key(session: Dict[str, Any]) -> Tuple[int, str]:
+        # last_activity is rendered from the catalog's integer microseconds, so this is exact
+        last_activity = datetime.fromisoformat(session['last_activity'])
+        return (last_activity - EPOCH) // timedelta(microseconds=1), session['session_id']
+    
+    @staticmethod
+    def _client_key(headers: Headers, client_address: bytes) -> str:
+        # As in the app: a configured API key, else the client's address
+        api_key = (get_header(headers, b'x-api-key') or b'').decode('latin-1')
+        if api_key and api_key in Config.API_KEYS:
+            return f'key:{api_key}'
+        return client_address.decode('ascii') or 'unknown'
+    
+    @staticmethod
+    def _body_session_id(body: bytes) -> Optional[str]:
+        """Session id of a chat request, or None if the body is invalid (any worker rejects it)"""
+        try:
+            data = json_codec.loads(body)
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        session_id = data.get('session_id')
+        if session_id is None:
+            return 'default'
+        return session_id if isinstance(session_id, str) else None
+
+def load_factory(path: str):
+    """Import an app factory given as 'module:callable'"""
+    module, _, name = path.partition(':')
+    return getattr(importlib.import_module(module), name or 'create_app')
+
+def serve_worker(index: int, port: int, factory: str):
+    """Worker process entry point: serve the Flask app on a local port"""
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    from werkzeug.serving import make_server
+    
+    # The router enforces the client rate limit for the whole cluster
+    Config.RATE_LIMIT_CLIENT_RPS = 0
+    # Spill files are recreated on start, so workers cannot share one
+    if Config.MEMORY_SPILL_PATH:
+        Config.MEMORY_SPILL_PATH = f'{Config.MEMORY_SPILL_PATH}.{index}'
+    
+    # Exit with the router rather than lingering if it is killed without cleanup
+    threading.Thread(target=_exit_with_parent, args=(os.getppid(),), name='parent-watch', daemon=True).start()
+    
+    app = load_factory(factory)()
+    # Rate limits key on the client address, which the router passes on
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    logger.info(f"Cluster worker {index} serving on port {port}")
+    server.serve_forever()
+
+def _exit_with_parent(parent_pid: int):
+    while os.getppid() == parent_pid:
+        time.sleep(1.0)
+    os._exit(0)
+
+def wait_for_port(port: int, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+class Cluster:
+    """Starts the worker processes and the router, and restarts workers that exit
+    
+    A restarted worker keeps its port and so its place on the ring. Its
+    in-memory sessions are lost unless a persistent SESSION_STORE is used;
+    workers may share one SQLite file since each session has one writer.
+    """
+    
+    def __init__(self, workers: int = None, base_port: int = None, factory: str = 'app:create_app'):
+        self.size = workers or Config.CLUSTER_WORKERS or os.cpu_count() or 1
+        self.base_port = base_port or Config.CLUSTER_WORKER_BASE_PORT
+        self.factory = factory
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * self.size
+        self._context = multiprocessing.get_context('spawn')
+        self._stopping = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+    
+    def start_workers(self, timeout: float = 30):
+        for index in range(self.size):
+            self._spawn(index)
+        for index in range(self.size):
+            if not wait_for_port(self.base_port + index, timeout):
+                self.stop()
+                raise RuntimeError(f"Cluster worker {index} did not start on port {self.base_port + index}")
+        self._monitor = threading.Thread(target=self._watch, name='cluster-monitor', daemon=True)
+        self._monitor.start()
+        logger.info(f"Started {self.size} cluster workers on ports {self.base_port}-{self.base_port + self.size - 1}")
+    
+    def router(self) -> ClusterRouter:
+        return ClusterRouter([
+            WorkerClient(f'worker-{index}', '127.0.0.1', self.base_port + index) for index in range(self.size)
+        ])
+    
+    def stop(self):
+        self._stopping.set()
+        for process in self.processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            if process is not None:
+                process.join(timeout=5)
+    
+    def _spawn(self, index: int):
+        process = self._context.Process(
+            target=serve_worker, args=(index, self.base_port + index, self.factory),
+            name=f'cluster-worker-{index}', daemon=True
+        )
+        process.start()
+        self.processes[index] = process
+    
+    def _watch(self):
+        while not self._stopping.wait(1.0):
+            for index, process in enumerate(self.processes):
+                if process is not None and not process.is_alive() and not self._stopping.is_set():
+                    logger.error(f"Cluster worker {index} exited with code {process.exitcode}; restarting")
+                    self._spawn(index)
+
+async def serve(cluster: Cluster, host: str, port: int):
+    router = cluster.router()
+    server = await router.start(host, port)
+    logger.info(f"Cluster router listening on {host}:{port}")
+    try:
+        await server.serve_forever()
+    finally:
+        await router.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CLUSTER_WORKERS or one per CPU)')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=Config.CLUSTER_PORT)
+    parser.add_argument('--base-port', type=int, default=None, help='port of the first worker; the rest follow')
+    parser.add_argument('--app', default='app:create_app', help='app factory as module:callable')
+    args = parser.parse_args()
+    
+    from utils.logging_config import configure_logging
+    configure_logging()
+    
+    # Stop the workers on SIGTERM as on Ctrl-C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    cluster = Cluster(args.workers, args.base_port, args.app)
+    cluster.start_workers()
+    try:
+        asyncio.run(serve(cluster, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cluster.stop()
+
+if __name__ == '__main__':
+    main()
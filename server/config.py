@@ -3,10 +3,127 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Request priorities, lowest first, and the orders the session listing supports
+PRIORITIES = ('low', 'normal', 'high')
+SESSION_ORDERS = ('activity', 'id')
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     AWS_REGION = os.environ.get('AWS_REGION') or 'us-east-1'
     BEDROCK_MODEL_ID = os.environ.get('BEDROCK_MODEL_ID') or 'amazon.nova-micro-v1:0'
+    # Override the bedrock-runtime endpoint, e.g. to point at benchmarks/fake_bedrock_server.py
+    BEDROCK_ENDPOINT_URL = os.environ.get('BEDROCK_ENDPOINT_URL') or None
+    # bedrock-runtime connections: pool size (0 sizes it to the concurrent calls
+    # the app can make), timeouts in seconds, and an optional warm-up at start
+    BEDROCK_MAX_POOL_CONNECTIONS = int(os.environ.get('BEDROCK_MAX_POOL_CONNECTIONS', 0))
+    BEDROCK_CONNECT_TIMEOUT = float(os.environ.get('BEDROCK_CONNECT_TIMEOUT', 3))
+    BEDROCK_READ_TIMEOUT = float(os.environ.get('BEDROCK_READ_TIMEOUT', 60))
+    BEDROCK_TCP_KEEPALIVE = os.environ.get('BEDROCK_TCP_KEEPALIVE', 'true').lower() == 'true'
+    BEDROCK_WARMUP = os.environ.get('BEDROCK_WARMUP', 'false').lower() == 'true'
+    BEDROCK_WARMUP_CONNECTIONS = int(os.environ.get('BEDROCK_WARMUP_CONNECTIONS', 4))
+    BEDROCK_CONTEXT_MESSAGES = int(os.environ.get('BEDROCK_CONTEXT_MESSAGES', 20))
+    CONTEXT_TOKEN_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', 2000))
+    
+    # Rolling summarization of turns evicted from history (opt-in)
+    SUMMARIZATION_ENABLED = os.environ.get('SUMMARIZATION_ENABLED', 'false').lower() == 'true'
+    SUMMARY_BATCH_MESSAGES = int(os.environ.get('SUMMARY_BATCH_MESSAGES', 4))
+    SUMMARY_MAX_WORDS = int(os.environ.get('SUMMARY_MAX_WORDS', 150))
+    SUMMARY_WORKERS = int(os.environ.get('SUMMARY_WORKERS', 2))
+    
+    # Model routing: comma-separated model ids, smallest first, and the max
+    # estimated prompt tokens routed to each tier but the last
+    BEDROCK_MODEL_TIERS = os.environ.get('BEDROCK_MODEL_TIERS', '')
+    ROUTING_TIER_MAX_TOKENS = os.environ.get('ROUTING_TIER_MAX_TOKENS', '500,2000')
+    ROUTING_MAX_ERROR_RATE = float(os.environ.get('ROUTING_MAX_ERROR_RATE', 0.5))
+    ROUTING_MAX_LATENCY = float(os.environ.get('ROUTING_MAX_LATENCY', 0))
+    ROUTING_STATS_HALF_LIFE = float(os.environ.get('ROUTING_STATS_HALF_LIFE', 60))
+    
+    # Resilience: retries, circuit breaker, fallback model and hedging
+    BEDROCK_FALLBACK_MODEL_ID = os.environ.get('BEDROCK_FALLBACK_MODEL_ID') or ''
+    BEDROCK_MAX_RETRIES = int(os.environ.get('BEDROCK_MAX_RETRIES', 3))
+    BEDROCK_RETRY_BASE_DELAY = float(os.environ.get('BEDROCK_RETRY_BASE_DELAY', 0.2))
+    BEDROCK_RETRY_MAX_DELAY = float(os.environ.get('BEDROCK_RETRY_MAX_DELAY', 5))
+    BEDROCK_HEDGE_AFTER = float(os.environ.get('BEDROCK_HEDGE_AFTER', 0))
+    BEDROCK_HEDGE_WORKERS = int(os.environ.get('BEDROCK_HEDGE_WORKERS', 32))
+    CIRCUIT_BREAKER_FAILURES = int(os.environ.get('CIRCUIT_BREAKER_FAILURES', 5))
+    CIRCUIT_BREAKER_RESET = float(os.environ.get('CIRCUIT_BREAKER_RESET', 30))
+    
+    # Share one Bedrock call among concurrent identical requests (opt-in: with
+    # sampling, separate calls would give separate replies)
+    SINGLE_FLIGHT_ENABLED = os.environ.get('SINGLE_FLIGHT_ENABLED', 'false').lower() == 'true'
+    
+    # Response cache (opt-in)
+    RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'false').lower() == 'true'
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+    RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 300))
+    RESPONSE_CACHE_NEAR_DUPLICATES = os.environ.get('RESPONSE_CACHE_NEAR_DUPLICATES', 'false').lower() == 'true'
+    RESPONSE_CACHE_SIMILARITY = float(os.environ.get('RESPONSE_CACHE_SIMILARITY', 0.9))
     MAX_CONVERSATION_HISTORY = int(os.environ.get('MAX_CONVERSATION_HISTORY', 20))
     MAX_MESSAGE_LENGTH = int(os.environ.get('MAX_MESSAGE_LENGTH', 4000))
-    CONVERSATION_TIMEOUT = int(os.environ.get('CONVERSATION_TIMEOUT', 3600))
\ No newline at end of file
+    CONVERSATION_TIMEOUT = int(os.environ.get('CONVERSATION_TIMEOUT', 3600))
+    CONVERSATION_SWEEP_INTERVAL = float(os.environ.get('CONVERSATION_SWEEP_INTERVAL', 0))
+    SESSION_LOCK_STRIPES = int(os.environ.get('SESSION_LOCK_STRIPES', 64))
+    # Memory budget for in-memory session histories, 0 (the default) for no
+    # limit. Least recently active sessions beyond it are evicted: a persistent
+    # store reloads them on demand; with the memory store they are spilled to
+    # MEMORY_SPILL_PATH if set, otherwise dropped
+    MEMORY_BUDGET_MB = float(os.environ.get('MEMORY_BUDGET_MB', 0))
+    MEMORY_SPILL_PATH = os.environ.get('MEMORY_SPILL_PATH', '')
+    SESSIONS_PAGE_SIZE = int(os.environ.get('SESSIONS_PAGE_SIZE', 100))
+    SESSIONS_MAX_PAGE_SIZE = int(os.environ.get('SESSIONS_MAX_PAGE_SIZE', 1000))
+    
+    # JSON backend: 'auto' uses orjson when installed, 'stdlib' forces the json module
+    JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto').lower()
+    
+    # Session persistence ('memory' or 'sqlite')
+    SESSION_STORE = os.environ.get('SESSION_STORE') or 'memory'
+    SESSION_STORE_PATH = os.environ.get('SESSION_STORE_PATH') or 'data/sessions.db'
+    SESSION_STORE_BATCH_SIZE = int(os.environ.get('SESSION_STORE_BATCH_SIZE', 256))
+    SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', 10000))
+    
+    # Admission control: token buckets per client (known API key or IP) and per
+    # session, 0 rps to disable, and a global cap on in-flight chat turns
+    RATE_LIMIT_CLIENT_RPS = float(os.environ.get('RATE_LIMIT_CLIENT_RPS', 10))
+    RATE_LIMIT_CLIENT_BURST = float(os.environ.get('RATE_LIMIT_CLIENT_BURST', 50))
+    RATE_LIMIT_SESSION_RPS = float(os.environ.get('RATE_LIMIT_SESSION_RPS', 2))
+    RATE_LIMIT_SESSION_BURST = float(os.environ.get('RATE_LIMIT_SESSION_BURST', 10))
+    RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))
+    # X-API-Key values that get their own client bucket; other callers are keyed by address
+    API_KEYS = frozenset(key.strip() for key in os.environ.get('API_KEYS', '').split(',') if key.strip())
+    ADMISSION_MAX_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 64))
+    ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 128))
+    ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 5))
+    ADMISSION_RETRY_AFTER = float(os.environ.get('ADMISSION_RETRY_AFTER', 1))
+    
+    # Batch chat
+    BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 100))
+    BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 8))
+    BATCH_DIR = os.environ.get('BATCH_DIR', 'data/batches')
+    
+    # Logging: records are queued and written by a background thread
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    # Empty to log to the console only
+    LOG_FILE = os.environ.get('LOG_FILE', 'logs/app.log')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json').lower()
+    LOG_INFO_SAMPLE_RATE = float(os.environ.get('LOG_INFO_SAMPLE_RATE', 1.0))
+    LOG_REDACT_PII = os.environ.get('LOG_REDACT_PII', 'true').lower() == 'true'
+    LOG_REDACT_CONTENT = os.environ.get('LOG_REDACT_CONTENT', 'false').lower() == 'true'
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    
+    # Request tracing: share of requests whose spans are recorded and exported
+    TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 0))
+    TRACE_EXPORT_PATH = os.environ.get('TRACE_EXPORT_PATH', 'logs/traces.jsonl')
+    TRACE_OTLP_ENDPOINT = os.environ.get('TRACE_OTLP_ENDPOINT', '')
+    
+    # Async (ASGI) serving
+    ASYNC_MAX_CONCURRENCY = int(os.environ.get('ASYNC_MAX_CONCURRENCY', 256))
+    ASYNC_REQUEST_TIMEOUT = float(os.environ.get('ASYNC_REQUEST_TIMEOUT', 60))
+    ASYNC_BEDROCK_WORKERS = int(os.environ.get('ASYNC_BEDROCK_WORKERS', 256))
+    
+    # Multi-process serving (cluster.py): workers behind a session-affinity router
+    CLUSTER_WORKERS = int(os.environ.get('CLUSTER_WORKERS', 0))
+    CLUSTER_PORT = int(os.environ.get('CLUSTER_PORT', 5001))
+    CLUSTER_WORKER_BASE_PORT = int(os.environ.get('CLUSTER_WORKER_BASE_PORT', 5101))
+    CLUSTER_VIRTUAL_NODES = int(os.environ.get('CLUSTER_VIRTUAL_NODES', 160))
+    CLUSTER_POOL_SIZE = int(os.environ.get('CLUSTER_POOL_SIZE', 64))
+    CLUSTER_TIMEOUT = float(os.environ.get('CLUSTER_TIMEOUT', 120))
@@ -0,0 +1,204 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Mapping, Optional
+from config import Config
+from utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_REJECTIONS = registry.counter(
+    'admission_rejections_total',
+    'Requests shed with 429 by the admission controller',
+    ('reason',)
+)
+
+class AdmissionRejected(Exception):
+    """A request was refused by a rate or capacity limit"""
+    
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Request rejected by the {reason} limit, retry after {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+class CostExceedsBurst(AdmissionRejected):
+    """A request costs more tokens than its bucket can ever hold, so retrying cannot help"""
+    
+    def __init__(self, reason: str, cost: float, burst: float):
+        Exception.__init__(self, f"Request costs {cost:g} tokens but the {reason} limit allows at most {burst:g}")
+        self.reason = reason
+        self.retry_after = math.inf
+        self.cost = cost
+        self.burst = burst
+
+class TokenBucketLimiter:
+    """Token bucket per key, held in a bounded LRU map
+    
+    Each check is a dict lookup and move-to-end. When max_keys is reached
+    the least recently seen key is dropped; its bucket had the longest time
+    to refill, so forgetting it at most grants an idle client a fresh burst.
+    """
+    
+    def __init__(self, rate: float, burst: float, max_keys: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: 'OrderedDict[str, list]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def acquire(self, key: str, cost: float = 1.0) -> float:
+        """Take cost tokens from key's bucket
+        
+        Returns 0 if the request is admitted, otherwise the seconds until
+        the bucket will hold enough tokens; infinite for a cost above the burst.
+        """
+        if self.rate <= 0:
+            return 0.0
+        if cost > self.burst:
+            return math.inf
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._buckets.popitem(last=False)
+                bucket = self._buckets[key] = [self.burst, now]
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0.0
+            return (cost - bucket[0]) / self.rate
+    
+    def refund(self, key: str, cost: float = 1.0):
+        """Give back tokens taken by acquire for a request that was not admitted after all"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(self.burst, bucket[0] + cost)
+    
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+class ConcurrencyLimiter:
+    """Caps in-flight requests and bounds how many may wait for a slot"""
+    
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queued = 0
+        self._condition = threading.Condition()
+    
+    def acquire(self) -> bool:
+        """Take a slot, waiting in the bounded queue if needed; False if the request should be shed"""
+        with self._condition:
+            if self.max_in_flight <= 0 or self.in_flight < self.max_in_flight:
+                self.in_flight += 1
+                return True
+            if self.queued >= self.max_queue:
+                return False
+            
+            self.queued += 1
+            try:
+                admitted = self._condition.wait_for(lambda: self.in_flight < self.max_in_flight, self.queue_timeout)
+            finally:
+                self.queued -= 1
+            if admitted:
+                self.in_flight += 1
+            return admitted
+    
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+class AdmissionController:
+    """Token buckets per client and per session plus a global concurrency cap"""
+    
+    def __init__(self, client_limiter: TokenBucketLimiter = None, session_limiter: TokenBucketLimiter = None,
+                 concurrency: ConcurrencyLimiter = None, retry_after: float = None):
+        # Limiters define __len__, so an empty one is falsy; compare with None
+        if client_limiter is None:
+            client_limiter = TokenBucketLimiter(
+                Config.RATE_LIMIT_CLIENT_RPS, Config.RATE_LIMIT_CLIENT_BURST, Config.RATE_LIMIT_MAX_KEYS
+            )
+        if session_limiter is None:
+            session_limiter = TokenBucketLimiter(
+                Config.RATE_LIMIT_SESSION_RPS, Config.RATE_LIMIT_SESSION_BURST, Config.RATE_LIMIT_MAX_KEYS
+            )
+        self.client_limiter = client_limiter
+        self.session_limiter = session_limiter
+        self.concurrency = concurrency or ConcurrencyLimiter(
+            Config.ADMISSION_MAX_IN_FLIGHT, Config.ADMISSION_MAX_QUEUE, Config.ADMISSION_QUEUE_TIMEOUT
+        )
+        self.retry_after = Config.ADMISSION_RETRY_AFTER if retry_after is None else retry_after
+    
+    def check_rate(self, client_key: str, session_id: Optional[str] = None, cost: float = 1.0):
+        """Charge the client's and session's buckets, raising AdmissionRejected when either is empty"""
+        self.check_rates(client_key, cost, {} if session_id is None else {session_id: cost})
+    
+    def check_rates(self, client_key: str, cost: float, session_costs: Mapping[str, float]):
+        """Charge the client cost tokens and each session its own cost, all or nothing
+        
+        Raises CostExceedsBurst, before charging anything, when a cost could
+        never be met, and AdmissionRejected when a bucket is short. Tokens
+        already taken from the other buckets are then given back, so a
+        request refused by its session does not also spend its client's rate.
+        """
+        charges = [('client', self.client_limiter, client_key, cost)]
+        charges.extend(('session', self.session_limiter, session_id, session_cost)
+                       for session_id, session_cost in session_costs.items())
+        for reason, limiter, _, charge in charges:
+            if limiter.rate > 0 and charge > limiter.burst:
+                ADMISSION_REJECTIONS.inc((reason,))
+                raise CostExceedsBurst(reason, charge, limiter.burst)
+        
+        for position, (reason, limiter, key, charge) in enumerate(charges):
+            wait = limiter.acquire(key, charge)
+            if wait:
+                for _, taken_limiter, taken_key, taken in charges[:position]:
+                    taken_limiter.refund(taken_key, taken)
+                self._reject(reason, wait)
+    
+    def acquire_slot(self):
+        """Take a concurrency slot, raising AdmissionRejected when the queue is saturated"""
+        if not self.concurrency.acquire():
+            self._reject('capacity', self.retry_after)
+    
+    def release_slot(self):
+        self.concurrency.release()
+    
+    @contextmanager
+    def admit(self, client_key: str, session_id: Optional[str] = None):
+        """Check the rate limits and hold a concurrency slot for the block"""
+        self.check_rate(client_key, session_id)
+        self.acquire_slot()
+        try:
+            yield
+        finally:
+            self.release_slot()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'in_flight': self.concurrency.in_flight,
+            'queued': self.concurrency.queued,
+            'max_in_flight': self.concurrency.max_in_flight,
+            'tracked_clients': len(self.client_limiter),
+            'tracked_sessions': len(self.session_limiter)
+        }
+    
+    def _reject(self, reason: str, retry_after: float):
+        ADMISSION_REJECTIONS.inc((reason,))
+        logger.info("Shedding request: %s limit, retry after %.1fs", reason, retry_after)
+        raise AdmissionRejected(reason, retry_after)
@@ -0,0 +1,60 @@
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any
+from config import Config
+from services.bedrock_service import BedrockService
+
+logger = logging.getLogger(__name__)
+
+class AsyncBedrockService:
+    """Awaitable facade over BedrockService for the asyncio serving path.
+    
+    boto3 has no native asyncio support, so blocking calls run on a dedicated
+    executor sized independently from the event loop's default pool. The event
+    loop itself never blocks on Bedrock I/O. Calls run in a copy of the
+    caller's context so trace spans recorded on the worker thread join the
+    request's trace.
+    """
+    
+    def __init__(self, bedrock_service: BedrockService = None, max_workers: int = None):
+        max_workers = max_workers or Config.ASYNC_BEDROCK_WORKERS
+        # One pooled connection per executor thread, so calls never wait for one
+        self.bedrock_service = bedrock_service or BedrockService(max_pool_connections=max_workers)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bedrock')
+        logger.info(f"Async Bedrock service initialized with {self.executor._max_workers} workers")
+    
+    async def generate_response(self, user_message: str, context: List[Dict[str, Any]] = None) -> str:
+        """Generate a response without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            contextvars.copy_context().run,
+            self.bedrock_service.generate_response,
+            user_message,
+            context
+        )
+    
+    async def generate_from_messages(self, messages: List[str], system: str = None,
+                                     priority: str = None, prompt_tokens: int = None) -> str:
+        """Generate a response for an encoded message window without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            contextvars.copy_context().run,
+            self.bedrock_service.generate_from_messages,
+            messages,
+            system,
+            priority,
+            prompt_tokens
+        )
+    
+    async def warm_up(self) -> float:
+        """Open pooled Bedrock connections without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.bedrock_service.warm_up)
+    
+    def shutdown(self):
+        """Release executor threads"""
+        self.executor.shutdown(wait=False)
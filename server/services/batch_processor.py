@@ -0,0 +1,254 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from config import Config
+from services.admission_control import AdmissionController, AdmissionRejected
+from services.bedrock_service import BedrockService, encode_message, extract_text
+from services.context_builder import ContextWindow
+from services.conversation_manager import ConversationManager
+from utils.error_handler import classify_error
+from utils.validators import CHAT_REQUEST, ChatRequest
+
+logger = logging.getLogger(__name__)
+
+_BATCH_ID = re.compile(r'[0-9a-f]{32}')
+
+class BatchError(Exception):
+    """Batch request that cannot be processed, with the HTTP status to report"""
+    
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+class BatchProcessor:
+    """Runs many sessions' chat turns from a single request.
+    
+    Online batches fan out across a bounded thread pool, one task per
+    session. Each task runs its session's items in order, so turns on the
+    same session keep their order while different sessions run concurrently.
+    Every Bedrock call takes its own admission slot, so a batch counts
+    against the in-flight cap once per call running, not once overall.
+    
+    Offline batches are written as a Bedrock batch inference JSONL input
+    file with a manifest that maps record ids back to sessions. Once the
+    job has run, its output file is ingested into the conversation history.
+    """
+    
+    def __init__(self, bedrock_service: BedrockService, conversation_manager: ConversationManager,
+                 max_workers: int = None, batch_dir: str = None, admission: AdmissionController = None):
+        self.bedrock_service = bedrock_service
+        self.conversation_manager = conversation_manager
+        self.admission = admission
+        self.batch_dir = batch_dir or Config.BATCH_DIR
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or Config.BATCH_WORKERS,
+            thread_name_prefix='batch'
+        )
+        self._ingest_lock = threading.Lock()
+        self._ingesting = set()
+    
+    def parse(self, items: List[Any]) -> List[Tuple[Optional[ChatRequest], Optional[str]]]:
+        """Validate each item; returns (request, None) or (None, error) per item"""
+        return [self._parse_item(item) for item in items]
+    
+    def run(self, items: List[Dict[str, Any]], parsed: List[Tuple[Optional[ChatRequest], Optional[str]]] = None
+            ) -> List[Dict[str, Any]]:
+        """Run each item as a chat turn; returns one result per item, in input order"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        sessions: Dict[str, List[Tuple[int, ChatRequest]]] = {}
+        for index, (item, (chat_request, error)) in enumerate(zip(items, parsed or self.parse(items))):
+            if error:
+                results[index] = self._error_result(index, item, 400, error)
+                continue
+            sessions.setdefault(chat_request.session_id, []).append((index, chat_request))
+        
+        logger.info(f"Running batch of {len(items)} items across {len(sessions)} sessions")
+        futures = [
+            self.executor.submit(self._run_session, session_id, requests, results)
+            for session_id, requests in sessions.items()
+        ]
+        for future in futures:
+            future.result()
+        return results
+    
+    def export(self, items: List[Dict[str, Any]], parsed: List[Tuple[Optional[ChatRequest], Optional[str]]] = None
+               ) -> Dict[str, Any]:
+        """Write a Bedrock batch inference input file for the items"""
+        batch_id = uuid.uuid4().hex
+        results = []
+        records = {}
+        lines = []
+        for index, (item, (chat_request, error)) in enumerate(zip(items, parsed or self.parse(items))):
+            session_id = chat_request.session_id if chat_request else None
+            if not error and any(record['session_id'] == session_id for record in records.values()):
+                # The next turn depends on this turn's reply, which the job has not produced yet
+                error = "Offline batches accept one message per session"
+            if error:
+                results.append(self._error_result(index, item, 400, error))
+                continue
+            
+            message = chat_request.message
+            # Not sent now, so it must not count in the context stats or feed the summarizer
+            context = self.conversation_manager.build_context(session_id, record=False)
+            messages = context.messages + [encode_message('user', message)]
+            record_id = f"R{len(records):010d}"
+            records[record_id] = {'index': index, 'session_id': session_id, 'message': message}
+            model_input = json.loads(self.bedrock_service.build_request_body(messages, context.system))
+            lines.append(json.dumps({'recordId': record_id, 'modelInput': model_input}))
+            results.append({'index': index, 'session_id': session_id, 'status': 202, 'record_id': record_id})
+        
+        os.makedirs(self.batch_dir, exist_ok=True)
+        input_path = self._path(batch_id, '.jsonl')
+        with open(input_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + ('\n' if lines else ''))
+        self._write_manifest(batch_id, {
+            'batch_id': batch_id,
+            'model_id': self.bedrock_service.model_id,
+            'created_at': time.time(),
+            'ingested_at': None,
+            'records': records
+        })
+        
+        logger.info(f"Exported batch {batch_id} with {len(records)} records to {input_path}")
+        return {
+            'batch_id': batch_id,
+            'input_path': input_path,
+            'output_path': self._path(batch_id, '.jsonl.out'),
+            'model_id': self.bedrock_service.model_id,
+            'records': len(records),
+            'results': results
+        }
+    
+    def ingest(self, batch_id: str) -> Dict[str, Any]:
+        """Add the replies from a batch inference output file to the conversations"""
+        with self._ingest_lock:
+            manifest = self._read_manifest(batch_id)
+            if manifest['ingested_at'] is not None or batch_id in self._ingesting:
+                raise BatchError(f"Batch {batch_id} was already ingested", 409)
+            self._ingesting.add(batch_id)
+        try:
+            return self._ingest(batch_id, manifest)
+        finally:
+            with self._ingest_lock:
+                self._ingesting.discard(batch_id)
+    
+    def shutdown(self):
+        """Release executor threads"""
+        self.executor.shutdown(wait=False)
+    
+    def _ingest(self, batch_id: str, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        output_path = self._path(batch_id, '.jsonl.out')
+        if not os.path.exists(output_path):
+            raise BatchError(f"Output file for batch {batch_id} not found", 404)
+        
+        outputs = {}
+        errors = []
+        with open(output_path, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    errors.append({'line': line_number, 'error': f"Malformed output line: {e.msg}"})
+                    continue
+                if not isinstance(record, dict):
+                    errors.append({'line': line_number, 'error': "Output line is not a record object"})
+                    continue
+                outputs[record.get('recordId')] = record
+        
+        ingested = 0
+        records = manifest['records']
+        # Apply in input order so sessions read like the original request
+        for record_id in sorted(records, key=lambda record_id: records[record_id]['index']):
+            entry = records[record_id]
+            output = outputs.get(record_id)
+            reply = extract_text(output.get('modelOutput') or {}) if output else ''
+            if not reply:
+                error = (output or {}).get('error') or 'No output for record'
+                errors.append({'record_id': record_id, 'session_id': entry['session_id'], 'error': error})
+                continue
+            
+            with self.conversation_manager.turn(entry['session_id']):
+                self.conversation_manager.add_message(entry['session_id'], 'user', entry['message'])
+                self.conversation_manager.add_message(entry['session_id'], 'assistant', reply.strip())
+            ingested += 1
+        
+        manifest['ingested_at'] = time.time()
+        self._write_manifest(batch_id, manifest)
+        logger.info(f"Ingested batch {batch_id}: {ingested} replies, {len(errors)} failed records")
+        return {'batch_id': batch_id, 'ingested': ingested, 'failed': len(errors), 'errors': errors}
+    
+    def _run_session(self, session_id: str, requests: List[Tuple[int, ChatRequest]],
+                     results: List[Optional[Dict[str, Any]]]):
+        for index, chat_request in requests:
+            try:
+                with self.conversation_manager.turn(session_id):
+                    self.conversation_manager.add_message(session_id, 'user', chat_request.message)
+                    context = self.conversation_manager.build_context(session_id)
+                    reply = self._generate(context, chat_request)
+                    self.conversation_manager.add_message(session_id, 'assistant', reply)
+                results[index] = {
+                    'index': index,
+                    'session_id': session_id,
+                    'status': 200,
+                    'message': reply,
+                    'context_tokens': context.tokens
+                }
+            except AdmissionRejected as e:
+                logger.info(f"Batch item {index} for session {session_id} shed: {str(e)}")
+                results[index] = self._error_result(index, chat_request, 429, 'Too many requests. Please retry later.')
+                results[index]['retry_after'] = max(1, math.ceil(e.retry_after))
+            except Exception as e:
+                logger.error(f"Error in batch item {index} for session {session_id}: {str(e)}")
+                status_code, user_message = classify_error(e)
+                results[index] = self._error_result(index, chat_request, status_code, user_message)
+    
+    def _generate(self, context: ContextWindow, chat_request: ChatRequest) -> str:
+        """One Bedrock call, holding an admission slot for its duration"""
+        if self.admission is not None:
+            self.admission.acquire_slot()
+        try:
+            return self.bedrock_service.generate_from_messages(
+                context.messages, context.system,
+                priority=chat_request.priority, prompt_tokens=context.tokens
+            )
+        finally:
+            if self.admission is not None:
+                self.admission.release_slot()
+    
+    def _parse_item(self, item: Any) -> Tuple[Optional[ChatRequest], Optional[str]]:
+        if not isinstance(item, dict):
+            return None, "Each item must be an object"
+        return CHAT_REQUEST.parse(item)
+    
+    def _error_result(self, index: int, item: Any, status_code: int, error: str) -> Dict[str, Any]:
+        if isinstance(item, ChatRequest):
+            session_id = item.session_id
+        else:
+            session_id = item.get('session_id', 'default') if isinstance(item, dict) else None
+        return {'index': index, 'session_id': session_id, 'status': status_code, 'error': error}
+    
+    def _path(self, batch_id: str, suffix: str) -> str:
+        return os.path.join(self.batch_dir, f"{batch_id}{suffix}")
+    
+    def _read_manifest(self, batch_id: str) -> Dict[str, Any]:
+        path = self._path(batch_id, '.manifest.json')
+        if not _BATCH_ID.fullmatch(batch_id) or not os.path.exists(path):
+            raise BatchError(f"Batch {batch_id} not found", 404)
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    
+    def _write_manifest(self, batch_id: str, manifest: Dict[str, Any]):
+        path = self._path(batch_id, '.manifest.json')
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
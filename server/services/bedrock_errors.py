@@ -0,0 +1,83 @@
+from botocore.exceptions import BotoCoreError, ClientError, ConnectTimeoutError, EndpointConnectionError, NoCredentialsError, ReadTimeoutError
+
+class BedrockError(Exception):
+    """Base class for classified Bedrock failures"""
+    
+    status_code = 503
+    user_message = "AI service is temporarily unavailable. Please try again later."
+    # Whether the same request may succeed if retried
+    retryable = False
+    # Whether the failure indicates a degraded service (counts toward the circuit breaker)
+    service_fault = False
+
+class BedrockThrottledError(BedrockError):
+    """Request rate or quota exceeded"""
+    
+    status_code = 429
+    user_message = "AI service is busy. Please try again shortly."
+    retryable = True
+    service_fault = True
+
+class BedrockTimeoutError(BedrockError):
+    """Connection or model timed out"""
+    
+    status_code = 504
+    user_message = "AI service timed out. Please try again later."
+    retryable = True
+    service_fault = True
+
+class BedrockUnavailableError(BedrockError):
+    """Service-side failure or unreachable endpoint"""
+    
+    retryable = True
+    service_fault = True
+
+class BedrockRequestError(BedrockError):
+    """Request rejected as invalid or unauthorized; retrying will not help"""
+    
+    status_code = 502
+
+class BedrockConfigurationError(BedrockError):
+    """Client is misconfigured, e.g. no AWS credentials; retrying will not help"""
+
+class CircuitOpenError(BedrockError):
+    """Calls short-circuited because the model is failing"""
+
+_THROTTLING_CODES = {
+    'ThrottlingException', 'TooManyRequestsException', 'ServiceQuotaExceededException',
+    'ProvisionedThroughputExceededException', 'RequestLimitExceeded'
+}
+_TIMEOUT_CODES = {'ModelTimeoutException', 'RequestTimeout', 'RequestTimeoutException'}
+_UNAVAILABLE_CODES = {
+    'ServiceUnavailableException', 'InternalServerException', 'ModelNotReadyException',
+    'InternalFailure', 'ServiceUnavailable'
+}
+
+def classify_code(code: str, message: str) -> BedrockError:
+    """Classify a Bedrock error code (ClientError code or stream event name)"""
+    # Stream exception events use lowerCamelCase names of the same exceptions
+    normalized = code[:1].upper() + code[1:]
+    if normalized in _THROTTLING_CODES:
+        return BedrockThrottledError(f"Bedrock throttled ({code}): {message}")
+    if normalized in _TIMEOUT_CODES:
+        return BedrockTimeoutError(f"Bedrock timed out ({code}): {message}")
+    if normalized in _UNAVAILABLE_CODES:
+        return BedrockUnavailableError(f"Bedrock unavailable ({code}): {message}")
+    return BedrockRequestError(f"Bedrock rejected request ({code}): {message}")
+
+def classify_exception(error: Exception) -> BedrockError:
+    """Map a boto3/botocore exception to a classified BedrockError"""
+    if isinstance(error, BedrockError):
+        return error
+    if isinstance(error, ClientError):
+        details = error.response.get('Error', {})
+        return classify_code(details.get('Code', 'Unknown'), details.get('Message', str(error)))
+    if isinstance(error, (ReadTimeoutError, ConnectTimeoutError)):
+        return BedrockTimeoutError(f"Bedrock timed out: {str(error)}")
+    if isinstance(error, NoCredentialsError):
+        return BedrockConfigurationError(f"Bedrock client misconfigured: {str(error)}")
+    if isinstance(error, EndpointConnectionError):
+        return BedrockUnavailableError(f"Bedrock unavailable: {str(error)}")
+    if isinstance(error, BotoCoreError):
+        return BedrockUnavailableError(f"Bedrock client error: {str(error)}")
+    return BedrockError(f"Bedrock call failed: {str(error)}")
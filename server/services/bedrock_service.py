@@ -1,24 +1,159 @@
 import boto3
+import hashlib
 import json
 import logging
-from typing import List, Dict, Any
+import time
+from botocore.config import Config as BotoConfig
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
 from config import Config
+from services.bedrock_errors import BedrockError, CircuitOpenError, classify_code
+from services.model_router import ModelRouter
+from services.resilience import ResilientInvoker
+from services.response_cache import ResponseCache
+from services.single_flight import SingleFlight
+from utils.logging_config import preview
+from utils.metrics import registry
+from utils.tracing import tracer
+
+BEDROCK_LATENCY = registry.histogram(
+    'bedrock_request_duration_seconds',
+    'Bedrock call latency per model, including retries (time to open the stream when streaming)',
+    ('model', 'operation', 'outcome')
+)
+BEDROCK_TOKENS = registry.counter(
+    'bedrock_tokens_total',
+    'Tokens billed by Bedrock, from the response usage',
+    ('model', 'direction')
+)
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar('T')
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a concise running summary of a conversation between a user and an AI assistant. "
+    "Keep facts, names, preferences, decisions and open questions. Reply with the summary only."
+)
+
+def encode_message(role: str, content: str) -> str:
+    """Encode a single message as a Bedrock messages-API JSON fragment"""
+    return json.dumps({"role": role, "content": [{"text": content}]})
+
+def extract_text(response_data: Dict[str, Any]) -> str:
+    """Join the text blocks of a decoded messages-API response"""
+    content_list = response_data.get('output', {}).get('message', {}).get('content', [])
+    return "\n".join([item.get('text', '') for item in content_list])
+
+def default_pool_size() -> int:
+    """Connections needed so that concurrent Bedrock calls never wait for one
+    
+    Every chat turn that may run at once, plus the batch, summary and hedge
+    threads, can hold a connection. With no cap on in-flight turns the
+    fallback is 64.
+    """
+    if Config.BEDROCK_MAX_POOL_CONNECTIONS > 0:
+        return Config.BEDROCK_MAX_POOL_CONNECTIONS
+    size = max(Config.ADMISSION_MAX_IN_FLIGHT or 64, Config.BATCH_WORKERS)
+    if Config.SUMMARIZATION_ENABLED:
+        size += Config.SUMMARY_WORKERS
+    if Config.BEDROCK_HEDGE_AFTER > 0:
+        size += Config.BEDROCK_HEDGE_WORKERS
+    return size
+
+def client_config(max_pool_connections: int = None) -> BotoConfig:
+    """botocore settings for the bedrock-runtime client"""
+    return BotoConfig(
+        # Retries are handled by ResilientInvoker, not botocore
+        retries={'mode': 'standard', 'max_attempts': 1},
+        # botocore pools only 10 connections by default; calls beyond that
+        # open a connection that is discarded afterwards instead of reused
+        max_pool_connections=max_pool_connections or default_pool_size(),
+        connect_timeout=Config.BEDROCK_CONNECT_TIMEOUT,
+        read_timeout=Config.BEDROCK_READ_TIMEOUT,
+        tcp_keepalive=Config.BEDROCK_TCP_KEEPALIVE
+    )
+
 class BedrockService:
-    def __init__(self):
+    def __init__(self, response_cache: ResponseCache = None, max_pool_connections: int = None):
         try:
             self.client = boto3.client(
                 "bedrock-runtime",
-                region_name=Config.AWS_REGION
+                region_name=Config.AWS_REGION,
+                endpoint_url=Config.BEDROCK_ENDPOINT_URL,
+                config=client_config(max_pool_connections)
             )
             self.model_id = Config.BEDROCK_MODEL_ID
+            self.resilience = ResilientInvoker()
+            self.router = ModelRouter(available=self.resilience.available)
+            self.inference_config = {
+                "maxTokens": 1000,
+                "temperature": 0.7,
+                "topP": 0.9
+            }
+            self._inference_config_json = json.dumps(self.inference_config)
+            if response_cache is None and Config.RESPONSE_CACHE_ENABLED:
+                response_cache = ResponseCache()
+            self.response_cache = response_cache
+            self.single_flight = SingleFlight() if Config.SINGLE_FLIGHT_ENABLED else None
             logger.info(f"Bedrock service initialized with model: {self.model_id}")
         except Exception as e:
             logger.error(f"Failed to initialize Bedrock client: {str(e)}")
             raise
     
+    def warm_up(self, connections: int = None) -> float:
+        """Open pooled connections to Bedrock before the first user request
+        
+        Sends one minimal request (one output token) per connection, all at
+        once, so credential and endpoint resolution and the TLS handshakes
+        happen at startup rather than on the first chat turns. Failures are
+        logged, not raised, so the app still starts. Returns the seconds spent.
+        """
+        connections = connections or Config.BEDROCK_WARMUP_CONNECTIONS
+        body = json.dumps({
+            "messages": [{"role": "user", "content": [{"text": "ping"}]}],
+            "inferenceConfig": {"maxTokens": 1}
+        })
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=connections, thread_name_prefix='bedrock-warmup') as pool:
+            futures = [
+                pool.submit(self.client.invoke_model, modelId=self.model_id, body=body,
+                            accept='application/json', contentType='application/json')
+                for _ in range(connections)
+            ]
+            errors = []
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    errors.append(e)
+        elapsed = time.perf_counter() - start
+        
+        if errors:
+            logger.warning(f"Bedrock warm-up: {len(errors)} of {connections} requests failed: {str(errors[0])}")
+        else:
+            logger.info(f"Bedrock warm-up opened {connections} connections in {elapsed:.2f}s")
+        return elapsed
+    
+    def _encode_messages(self, user_message: str, context: List[Dict[str, Any]] = None) -> List[str]:
+        """Encode the user message and context as Bedrock message fragments"""
+        messages = []
+        
+        # Add conversation history if available
+        if context:
+            for msg in context[-Config.BEDROCK_CONTEXT_MESSAGES:]:
+                messages.append(encode_message(msg["role"], msg["content"]))
+        
+        # Add current user message
+        messages.append(encode_message("user", user_message))
+        
+        return messages
+    
+    def build_request_body(self, messages: List[str], system: str = None) -> str:
+        """Assemble the request body from pre-encoded message fragments"""
+        system_json = f'"system": {json.dumps([{"text": system}])}, ' if system else ''
+        return f'{{{system_json}"messages": [{", ".join(messages)}], "inferenceConfig": {self._inference_config_json}}}'
+    
     def generate_response(self, user_message: str, context: List[Dict[str, Any]] = None) -> str:
         """
         Generate response using Amazon Bedrock
@@ -26,60 +161,259 @@ class BedrockService:
         Args:
             user_message: The user's input message
             context: Previous conversation context
-            
+        
+        Returns:
+            Generated response from the AI model
+        """
+        return self.generate_from_messages(self._encode_messages(user_message, context))
+    
+    def generate_from_messages(self, messages: List[str], system: str = None,
+                               priority: str = None, prompt_tokens: int = None) -> str:
+        """
+        Generate response from an already-encoded message window
+        
+        Args:
+            messages: Bedrock message JSON fragments, oldest first, ending
+                with the current user message
+            system: Optional system prompt, e.g. a running conversation summary
+            priority: Session priority used for model routing
+            prompt_tokens: Estimated prompt size used for model routing
+        
         Returns:
             Generated response from the AI model
         """
         try:
-            # Build messages array with context
-            messages = []
-            
-            # Add conversation history if available
-            if context:
-                for msg in context[-10:]:  # Last 10 messages for context
-                    messages.append({
-                        "role": msg["role"],
-                        "content": [{"text": msg["content"]}]
-                    })
-            
-            # Add current user message
-            messages.append({
-                "role": "user",
-                "content": [{"text": user_message}]
-            })
-            
-            input_data = {
-                "messages": messages,
-                "inferenceConfig": {
-                    "maxTokens": 1000,
-                    "temperature": 0.7,
-                    "topP": 0.9
-                }
-            }
-            
-            logger.info(f"Sending request to Bedrock with {len(messages)} messages")
-            
-            response = self.client.invoke_model(
-                modelId=self.model_id,
-                body=json.dumps(input_data),
+            with tracer.span('bedrock.generate', messages=len(messages)) as span:
+                with tracer.span('bedrock.encode_request'):
+                    body = self.build_request_body(messages, system)
+                prompt_tokens = self._prompt_tokens(body, prompt_tokens)
+                
+                if self.response_cache is not None:
+                    with tracer.span('cache.lookup') as lookup:
+                        cached = self.response_cache.get(self.router.preferred(prompt_tokens, priority),
+                                                         messages, body, system)
+                        lookup.set('cache.hit', cached is not None)
+                    if cached is not None:
+                        logger.info("Serving response from cache")
+                        return cached
+                
+                if self.single_flight is None:
+                    return self._generate(messages, body, system, priority, prompt_tokens)
+                
+                response, shared = self.single_flight.do(
+                    self._flight_key(body, priority),
+                    lambda: self._generate(messages, body, system, priority, prompt_tokens)
+                )
+                span.set('bedrock.coalesced', shared)
+                if shared:
+                    logger.info("Shared the response of an identical in-flight request")
+                return response
+                
+        except BedrockError as e:
+            logger.error(f"Error generating response: {str(e)}")
+            raise
+        except Exception as e:
+            logger.error(f"Error generating response: {str(e)}")
+            raise BedrockError(f"Failed to generate AI response: {str(e)}") from e
+    
+    def _generate(self, messages: List[str], body: str, system: str = None, priority: str = None,
+                  prompt_tokens: int = None) -> str:
+        """Call Bedrock for a request body and cache the reply"""
+        logger.info("Sending request to Bedrock with %d messages", len(messages))
+        
+        response, model_id = self._invoke_routed(
+            lambda model_id: self.client.invoke_model(
+                modelId=model_id,
+                body=body,
                 accept='application/json',
                 contentType='application/json'
-            )
-            
+            ),
+            'invoke',
+            self._prompt_tokens(body, prompt_tokens),
+            priority
+        )
+        
+        with tracer.span('bedrock.decode_response'):
             response_body = response['body'].read().decode('utf-8')
             response_data = json.loads(response_body)
+            self._record_usage(model_id, response_data.get('usage'))
             
             # Extract the response text
-            content_list = response_data.get('output', {}).get('message', {}).get('content', [])
-            formatted_response = "\n".join([item.get('text', '') for item in content_list])
+            formatted_response = extract_text(response_data)
+        
+        if not formatted_response:
+            logger.warning("Empty response from Bedrock model")
+            return "I apologize, but I couldn't generate a response at the moment. Please try again."
+        
+        logger.info("Successfully generated response: %s", preview(formatted_response))
+        formatted_response = formatted_response.strip()
+        
+        if self.response_cache is not None:
+            # Keyed on the model that answered: a spillover reply is not served for the preferred tier
+            self.response_cache.put(model_id, messages, body, formatted_response, system)
+        
+        return formatted_response
+    
+    def stream_response(self, user_message: str, context: List[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Stream a response from Amazon Bedrock as text deltas
+        
+        Args:
+            user_message: The user's input message
+            context: Previous conversation context
+        
+        Yields:
+            Text deltas as they are produced by the model
+        """
+        return self.stream_from_messages(self._encode_messages(user_message, context))
+    
+    def stream_from_messages(self, messages: List[str], system: str = None,
+                             priority: str = None, prompt_tokens: int = None) -> Iterator[str]:
+        """
+        Stream a response for an already-encoded message window
+        
+        Args:
+            messages: Bedrock message JSON fragments, oldest first, ending
+                with the current user message
+            system: Optional system prompt, e.g. a running conversation summary
+            priority: Session priority used for model routing
+            prompt_tokens: Estimated prompt size used for model routing
+        
+        Yields:
+            Text deltas as they are produced by the model
+        """
+        try:
+            with tracer.span('bedrock.encode_request'):
+                body = self.build_request_body(messages, system)
+            prompt_tokens = self._prompt_tokens(body, prompt_tokens)
             
-            if not formatted_response:
-                logger.warning("Empty response from Bedrock model")
-                return "I apologize, but I couldn't generate a response at the moment. Please try again."
+            if self.response_cache is not None:
+                with tracer.span('cache.lookup') as lookup:
+                    cached = self.response_cache.get(self.router.preferred(prompt_tokens, priority),
+                                                     messages, body, system)
+                    lookup.set('cache.hit', cached is not None)
+                if cached is not None:
+                    logger.info("Serving streamed response from cache")
+                    yield cached
+                    return
             
-            logger.info(f"Successfully generated response: {formatted_response[:100]}...")
-            return formatted_response.strip()
+            if self.single_flight is None:
+                deltas = self._stream(messages, body, system, priority, prompt_tokens)
+            else:
+                deltas = self.single_flight.stream(
+                    self._flight_key(body, priority),
+                    lambda: self._stream(messages, body, system, priority, prompt_tokens)
+                )
+            yield from deltas
             
+        except BedrockError as e:
+            logger.error(f"Error streaming response: {str(e)}")
+            raise
         except Exception as e:
-            logger.error(f"Error generating response: {str(e)}")
-            raise Exception(f"Failed to generate AI response: {str(e)}")
\ No newline at end of file
+            logger.error(f"Error streaming response: {str(e)}")
+            raise BedrockError(f"Failed to stream AI response: {str(e)}") from e
+    
+    def _stream(self, messages: List[str], body: str, system: str = None, priority: str = None,
+                prompt_tokens: int = None) -> Iterator[str]:
+        """Stream text deltas from Bedrock for a request body and cache the reply"""
+        logger.info("Streaming request to Bedrock with %d messages", len(messages))
+        
+        # Only opening the stream is retried; deltas already sent cannot be replayed
+        response, model_id = self._invoke_routed(
+            lambda model_id: self.client.invoke_model_with_response_stream(
+                modelId=model_id,
+                body=body,
+                accept='application/json',
+                contentType='application/json'
+            ),
+            'stream',
+            self._prompt_tokens(body, prompt_tokens),
+            priority,
+            hedge=False
+        )
+        
+        parts = []
+        # Close the event stream, and so its HTTP connection, also when the
+        # consumer stops early (e.g. the client disconnects) or an event fails
+        try:
+            for event in response['body']:
+                chunk = event.get('chunk')
+                if chunk is None:
+                    # Stream errors arrive as named exception events
+                    error_name = next(iter(event), 'unknown')
+                    error_message = event.get(error_name, {}).get('message', '')
+                    raise classify_code(error_name, error_message)
+                
+                chunk_data = json.loads(chunk['bytes'].decode('utf-8'))
+                delta = chunk_data.get('contentBlockDelta', {}).get('delta', {}).get('text')
+                if delta:
+                    parts.append(delta)
+                    yield delta
+                elif 'metadata' in chunk_data:
+                    self._record_usage(model_id, chunk_data['metadata'].get('usage'))
+        finally:
+            response['body'].close()
+        
+        if self.response_cache is not None and parts:
+            self.response_cache.put(model_id, messages, body, ''.join(parts).strip(), system)
+    
+    def summarize(self, previous_summary: Optional[str], messages: List[Dict[str, Any]]) -> str:
+        """
+        Fold conversation turns into a running summary
+        
+        Args:
+            previous_summary: The current summary, if any
+            messages: Turns to fold in, as role/content dicts, oldest first
+        
+        Returns:
+            The updated summary
+        """
+        transcript = "\n".join(f"{msg['role'].capitalize()}: {msg['content']}" for msg in messages)
+        prompt = (
+            f"Current summary:\n{previous_summary or '(none)'}\n\n"
+            f"New conversation turns:\n{transcript}\n\n"
+            f"Write the updated summary in at most {Config.SUMMARY_MAX_WORDS} words."
+        )
+        return self.generate_from_messages([encode_message("user", prompt)], system=SUMMARY_SYSTEM_PROMPT, priority='low')
+    
+    def _invoke_routed(self, call: Callable[[str], T], operation: str, prompt_tokens: int,
+                       priority: str = None, hedge: bool = True) -> Tuple[T, str]:
+        """Run call on the routed model, spilling over to the next candidate on service faults
+        
+        Returns the response and the id of the model that produced it.
+        """
+        model_ids = self.router.route(prompt_tokens, priority)
+        last = len(model_ids) - 1
+        for index, model_id in enumerate(model_ids):
+            started = time.monotonic()
+            try:
+                # Spill over at once while alternates remain; only the last candidate retries
+                with tracer.span('bedrock.invoke', model=model_id, operation=operation):
+                    response = self.resilience.invoke(call, model_id, hedge=hedge, max_retries=None if index == last else 0)
+            except BedrockError as e:
+                elapsed = time.monotonic() - started
+                BEDROCK_LATENCY.observe(elapsed, (model_id, operation, type(e).__name__))
+                if e.service_fault:
+                    self.router.record_failure(model_id, elapsed)
+                if index == last or not (e.service_fault or isinstance(e, CircuitOpenError)):
+                    raise
+                self.router.record_spillover(model_id, model_ids[index + 1], e)
+                continue
+            
+            elapsed = time.monotonic() - started
+            BEDROCK_LATENCY.observe(elapsed, (model_id, operation, 'success'))
+            self.router.record_success(model_id, elapsed)
+            return response, model_id
+    
+    def _record_usage(self, model_id: str, usage: Optional[Dict[str, Any]]):
+        if usage:
+            BEDROCK_TOKENS.inc((model_id, 'input'), usage.get('inputTokens', 0))
+            BEDROCK_TOKENS.inc((model_id, 'output'), usage.get('outputTokens', 0))
+    
+    def _flight_key(self, body: str, priority: str = None) -> str:
+        # Priority can change the routed model, so it is part of the key
+        return hashlib.sha256(f"{priority or 'normal'}\n{body}".encode('utf-8')).hexdigest()
+    
+    def _prompt_tokens(self, body: str, prompt_tokens: int = None) -> int:
+        # Rough fallback when the caller has no token estimate for the window
+        return prompt_tokens if prompt_tokens is not None else len(body) // 4
@@ -0,0 +1,103 @@
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence
+from config import Config
+from services.message import Message
+from utils.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+class ContextWindow:
+    """Encoded messages and optional system prompt selected for one model call"""
+    
+    __slots__ = ('messages', 'tokens', 'dropped', 'system', 'overflow')
+    
+    def __init__(self, messages: List[str], tokens: int, dropped: int, system: Optional[str] = None,
+                 overflow: int = 0):
+        self.messages = messages
+        self.tokens = tokens
+        self.dropped = dropped
+        self.system = system
+        # Messages included past the budget because no summary covers them yet
+        self.overflow = overflow
+
+class ContextBuilder:
+    """Packs the most recent messages under a token budget.
+    
+    Messages are taken newest first until the next one would exceed the
+    budget. The newest message is always included, and the window always
+    opens with a user turn. A system prompt (such as a running summary)
+    counts against the same budget. Messages newer than keep_after are
+    never dropped: they go past the budget until the summary covers them.
+    """
+    
+    def __init__(self, token_budget: int = None, max_messages: int = None):
+        self.token_budget = token_budget or Config.CONTEXT_TOKEN_BUDGET
+        self.max_messages = max_messages or Config.BEDROCK_CONTEXT_MESSAGES
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.tokens_sent = 0
+        self.messages_dropped = 0
+        self.last_tokens = 0
+    
+    def build(self, records: Sequence[Message], max_messages: int = None, system: str = None,
+              keep_after: int = None, record: bool = True) -> ContextWindow:
+        """Select and encode the context window for a model call
+        
+        With record=False the window is not counted in the stats, e.g. when
+        it is exported rather than sent.
+        """
+        max_messages = max_messages or self.max_messages
+        tokens = estimate_tokens(system) if system else 0
+        start = len(records)
+        
+        while start > 0 and len(records) - start < max_messages:
+            cost = records[start - 1].token_count()
+            if start < len(records) and tokens + cost > self.token_budget:
+                break
+            start -= 1
+            tokens += cost
+        
+        # Bedrock requires the conversation to open with a user turn
+        while start < len(records) and records[start].role != 'user':
+            tokens -= records[start].token_count()
+            start += 1
+        
+        fits = start
+        if keep_after is not None:
+            while start > 0 and records[start - 1].seq > keep_after:
+                start -= 1
+            if start < fits:
+                # Reach back to the user turn that opens the kept messages
+                while start > 0 and records[start].role != 'user':
+                    start -= 1
+                while start < len(records) and records[start].role != 'user':
+                    start += 1
+                tokens += sum(record.token_count() for record in records[start:fits])
+        
+        selected = records[start:]
+        window = ContextWindow([record.to_bedrock_json() for record in selected], tokens,
+                               len(records) - len(selected), system, max(fits - start, 0))
+        
+        if not record:
+            return window
+        
+        with self._lock:
+            self.turns += 1
+            self.tokens_sent += tokens
+            self.messages_dropped += window.dropped
+            self.last_tokens = tokens
+        
+        return window
+    
+    def stats(self) -> Dict[str, float]:
+        """Tokens-per-turn counters for operators"""
+        with self._lock:
+            return {
+                'token_budget': self.token_budget,
+                'turns': self.turns,
+                'tokens_sent': self.tokens_sent,
+                'avg_tokens_per_turn': self.tokens_sent / self.turns if self.turns else 0.0,
+                'last_tokens': self.last_tokens,
+                'messages_dropped': self.messages_dropped
+            }
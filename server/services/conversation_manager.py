@@ -1,17 +1,87 @@
-import json
 import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from config import Config
+from services.context_builder import ContextBuilder, ContextWindow
+from services.message import Message
+from services.session_catalog import SessionCatalog, SessionInfo
+from services.session_store import SQLiteSessionStore, SessionStore, create_session_store
+from services.summarizer import ConversationSummarizer
 
 logger = logging.getLogger(__name__)
 
+class HistoryPage:
+    """One page of a session's history and the cursors around it"""
+    
+    __slots__ = ('messages', 'message_count', 'first_seq', 'last_seq', 'has_more', 'next_cursor', 'reset', 'version')
+    
+    def __init__(self, messages: List[Dict[str, Any]], message_count: int, first_seq: int, last_seq: int,
+                 has_more: bool, next_cursor: Optional[int], reset: bool, version: str):
+        self.messages = messages
+        self.message_count = message_count
+        self.first_seq = first_seq
+        self.last_seq = last_seq
+        self.has_more = has_more
+        self.next_cursor = next_cursor
+        self.reset = reset
+        self.version = version
+
 class ConversationManager:
-    def __init__(self):
-        self.conversations: Dict[str, List[Dict[str, Any]]] = {}
-        self.session_timestamps: Dict[str, datetime] = {}
+    def __init__(self, store: SessionStore = None, summarizer: ConversationSummarizer = None):
+        self.store = store or create_session_store()
+        # Optional: folds messages evicted from history into a running summary
+        self.summarizer = summarizer
+        if summarizer is not None and summarizer.on_update is None:
+            summarizer.on_update = self.store.save_summary
+        # Bounded ring buffers: appending past max_history drops the oldest message.
+        # Kept in LRU order: sessions beyond the memory budget (or, with a persistent
+        # store, the cache size) are evicted from the front.
+        self.conversations: OrderedDict[str, deque] = OrderedDict()
+        self.cache_size = Config.SESSION_CACHE_SIZE
+        self.memory_budget = int(Config.MEMORY_BUDGET_MB * 1024 * 1024)
+        # Where evicted sessions are reloaded from: the store itself when it is
+        # persistent, else an optional spill file; with neither they are dropped
+        if self.store.persistent:
+            self.spill = self.store
+        elif Config.MEMORY_SPILL_PATH:
+            self.spill = self._open_spill(Config.MEMORY_SPILL_PATH)
+        else:
+            self.spill = None
+            if self.memory_budget:
+                logger.warning("MEMORY_BUDGET_MB is set without a persistent store or MEMORY_SPILL_PATH: "
+                               "sessions beyond the budget will be dropped")
+        # Running totals for in-memory histories, updated on every change
+        self._memory_bytes = 0
+        self._memory_messages = 0
+        self._session_overhead = sys.getsizeof(deque(maxlen=Config.MAX_CONVERSATION_HISTORY))
+        self._evictions = {'spilled': 0, 'dropped': 0}
+        self.context_builder = ContextBuilder()
+        # Ordered by last activity (oldest first) so expiry only inspects the front
+        self.session_timestamps: OrderedDict[str, datetime] = OrderedDict()
+        # Per-session metadata with sorted indexes, for listing sessions
+        self.catalog = SessionCatalog()
         self.max_history = Config.MAX_CONVERSATION_HISTORY
         self.timeout = timedelta(seconds=Config.CONVERSATION_TIMEOUT)
+        # Short-lived index lock for session_timestamps and the memory totals; session
+        # data is guarded by striped locks so unrelated sessions rarely contend
+        self._index_lock = threading.Lock()
+        # Guards the LRU order of conversations, which sessions under different
+        # stripes reorder; held only for single dict operations, and no stripe
+        # is acquired while it is held
+        self._lru_lock = threading.Lock()
+        self._stripes = [threading.RLock() for _ in range(Config.SESSION_LOCK_STRIPES)]
+        self._turn_locks: Dict[str, list] = {}
+        # Sessions held in memory by callers that serialize turns themselves (the
+        # ASGI app); guarded by the LRU lock, which eviction holds while checking
+        self._pins: Dict[str, int] = {}
+        self._sweeper: Optional[threading.Thread] = None
+        self._sweeper_stop = threading.Event()
         logger.info("Conversation manager initialized")
     
     def add_message(self, session_id: str, role: str, content: str):
@@ -20,23 +90,30 @@ class ConversationManager:
             # Clean up expired sessions
             self._cleanup_expired_sessions()
             
-            if session_id not in self.conversations:
-                self.conversations[session_id] = []
-            
-            message = {
-                "role": role,
-                "content": content,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-            
-            self.conversations[session_id].append(message)
-            self.session_timestamps[session_id] = datetime.utcnow()
-            
-            # Keep only the last N messages to prevent memory issues
-            if len(self.conversations[session_id]) > self.max_history:
-                self.conversations[session_id] = self.conversations[session_id][-self.max_history:]
+            with self._stripe(session_id):
+                messages = self._get_messages(session_id)
+                if messages is None:
+                    messages = deque(maxlen=self.max_history)
+                    with self._lru_lock:
+                        self.conversations[session_id] = messages
+                
+                evicted = messages[0] if len(messages) == messages.maxlen else None
+                
+                seq = messages[-1].seq + 1 if messages else 1
+                message = Message(role, content, time.time(), seq)
+                messages.append(message)
+                self.store.append(session_id, message)
+                self._touch(session_id)
+                added = 1 if evicted is None else 0
+                size = message.record_bytes() - (evicted.record_bytes() if evicted is not None else 0)
+                self._account(added, size)
+                self.catalog.record(session_id, message.created_at, added, size)
+                self._evict_cold_sessions(keep=session_id)
+                
+                if evicted is not None and self.summarizer is not None:
+                    self.summarizer.fold(session_id, [evicted])
             
-            logger.info(f"Added {role} message to session {session_id}")
+            logger.info("Added %s message to session %s", role, session_id)
             
         except Exception as e:
             logger.error(f"Error adding message to conversation: {str(e)}")
@@ -45,38 +122,112 @@ class ConversationManager:
     def get_context(self, session_id: str) -> List[Dict[str, Any]]:
         """Get conversation context for AI model"""
         try:
-            if session_id not in self.conversations:
-                return []
-            
             # Return conversation history without timestamps for AI context
-            context = []
-            for msg in self.conversations[session_id]:
-                context.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
-            
-            return context
-            
+            with self._stripe(session_id):
+                return [msg.to_context() for msg in self._get_messages(session_id) or ()]
+                
         except Exception as e:
             logger.error(f"Error getting context: {str(e)}")
             return []
     
+    def build_context(self, session_id: str, limit: int = None, record: bool = True) -> ContextWindow:
+        """Build the token-budgeted Bedrock context window for a session
+        
+        Messages are packed newest first under the configured token budget.
+        Each message is encoded and token-counted once, so a turn only pays
+        for the newly added message. The window always starts with a user message.
+        The running summary of evicted turns, if any, is sent as the system prompt.
+        With a summarizer, turns it has not folded in yet stay in the window,
+        past the budget if need be, and those that would not fit are queued
+        for it, so every turn reaches the model either verbatim or summarized.
+        With record=False the window is neither counted nor summarized from,
+        for requests that are not sent now, such as offline batch exports.
+        """
+        try:
+            with self._stripe(session_id):
+                records = list(self._get_messages(session_id) or ())
+            
+            if self.summarizer is None:
+                return self.context_builder.build(records, max_messages=limit, record=record)
+            
+            summary, covered, backlog = self.summarizer.snapshot(session_id)
+            # Evicted from history but not summarized yet: still part of the conversation
+            first = records[0].seq if records else 0
+            records = [record for record in backlog if record.seq < first] + records
+            window = self.context_builder.build(records, max_messages=limit, system=summary,
+                                                keep_after=covered, record=record)
+            if record and (window.dropped or window.overflow):
+                self.summarizer.fold(session_id, records[:window.dropped + window.overflow])
+            return window
+            
+        except Exception as e:
+            logger.error(f"Error building context: {str(e)}")
+            return ContextWindow([], 0, 0)
+    
+    def get_bedrock_messages(self, session_id: str, limit: int = None) -> List[str]:
+        """Get the context window as cached Bedrock JSON fragments"""
+        return self.build_context(session_id, limit).messages
+    
     def get_conversation_history(self, session_id: str) -> List[Dict[str, Any]]:
         """Get full conversation history including timestamps"""
         try:
-            return self.conversations.get(session_id, [])
+            with self._stripe(session_id):
+                return [msg.to_dict() for msg in self._get_messages(session_id) or ()]
         except Exception as e:
             logger.error(f"Error getting conversation history: {str(e)}")
             return []
     
+    def get_history_version(self, session_id: str) -> str:
+        """Opaque version of a session's history that changes with every message or reset
+        
+        Derived from the newest message alone, so checking it never walks the history.
+        """
+        with self._stripe(session_id):
+            return self._version(self._get_messages(session_id))
+    
+    def get_history_page(self, session_id: str, since: int = None, before: int = None,
+                         limit: int = None) -> HistoryPage:
+        """Get a page of history by sequence number
+        
+        since returns the oldest messages after that seq, for delta sync;
+        before returns the newest messages ahead of that seq, for paging back;
+        with neither, the newest messages are returned. Seqs held in memory are
+        contiguous, so the page is located by arithmetic and only its own
+        messages are serialized. A since past the newest seq means the session
+        was cleared and restarted; the page then starts over and reset is set.
+        """
+        with self._stripe(session_id):
+            messages = self._get_messages(session_id) or ()
+            count = len(messages)
+            first_seq = messages[0].seq if count else 1
+            last_seq = messages[-1].seq if count else 0
+            version = self._version(messages)
+            
+            reset = since is not None and since > last_seq
+            if reset:
+                since = 0
+            if since is not None:
+                start = min(max(since - first_seq + 1, 0), count)
+                end = count if limit is None else min(start + limit, count)
+                has_more = end < count
+                next_cursor = messages[end - 1].seq if end > start else since
+            else:
+                end = count if before is None else min(max(before - first_seq, 0), count)
+                start = 0 if limit is None else max(end - limit, 0)
+                has_more = start > 0
+                next_cursor = messages[start].seq if has_more else None
+            
+            page = [dict(messages[index].to_dict(), seq=messages[index].seq) for index in range(start, end)]
+        
+        return HistoryPage(page, count, first_seq, last_seq, has_more, next_cursor, reset, version)
+    
     def clear_conversation(self, session_id: str):
         """Clear conversation history for a session"""
         try:
-            if session_id in self.conversations:
-                del self.conversations[session_id]
-            if session_id in self.session_timestamps:
-                del self.session_timestamps[session_id]
+            with self._stripe(session_id):
+                with self._index_lock:
+                    self.session_timestamps.pop(session_id, None)
+                self._discard_session(session_id)
             
             logger.info(f"Cleared conversation for session {session_id}")
             
@@ -84,30 +235,312 @@ class ConversationManager:
             logger.error(f"Error clearing conversation: {str(e)}")
             raise
     
+    def memory_stats(self) -> Dict[str, int]:
+        """Approximate memory held by in-memory sessions, read from running totals
+        
+        Counts each message record and its content plus a fixed overhead per
+        session; cached Bedrock encodings are not included.
+        """
+        sessions = len(self.conversations)
+        return {
+            'sessions': sessions,
+            'messages': self._memory_messages,
+            'bytes': self._memory_bytes + sessions * self._session_overhead,
+            'budget_bytes': self.memory_budget,
+            'spilled_sessions': self._evictions['spilled'],
+            'dropped_sessions': self._evictions['dropped']
+        }
+    
     def get_active_sessions(self) -> List[str]:
         """Get list of active session IDs"""
         try:
             self._cleanup_expired_sessions()
-            return list(self.conversations.keys())
+            return list(self.session_timestamps.keys())
         except Exception as e:
             logger.error(f"Error getting active sessions: {str(e)}")
             return []
     
+    def list_sessions(self, order: str = 'activity', prefix: str = '', cursor: Optional[str] = None,
+                      limit: int = 100) -> Tuple[List[SessionInfo], Optional[str]]:
+        """Page through active sessions with their metadata, without scanning them all"""
+        self._cleanup_expired_sessions()
+        return self.catalog.page(order, prefix, cursor, limit)
+    
+    @contextmanager
+    def turn(self, session_id: str):
+        """Serialize a full chat turn (user message, model call, reply) per session
+        
+        Requests on the same session commit their turns one after another so
+        user/assistant messages never interleave. Other sessions are unaffected.
+        """
+        stripe = self._stripe(session_id)
+        with stripe:
+            entry = self._turn_locks.get(session_id)
+            if entry is None:
+                entry = self._turn_locks[session_id] = [threading.Lock(), 0]
+            entry[1] += 1
+        
+        entry[0].acquire()
+        try:
+            yield
+        finally:
+            entry[0].release()
+            with stripe:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._turn_locks[session_id]
+    
+    @contextmanager
+    def pinned(self, session_id: str):
+        """Keep a session from being evicted for the block
+        
+        turn() already does this; callers with their own turn locks use it to
+        hold the session while its model call runs, so the reply is not added
+        to a session that was evicted and restarted meanwhile.
+        """
+        with self._lru_lock:
+            self._pins[session_id] = self._pins.get(session_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lru_lock:
+                if self._pins[session_id] == 1:
+                    del self._pins[session_id]
+                else:
+                    self._pins[session_id] -= 1
+    
+    def start_sweeper(self, interval: float = None):
+        """Start a background thread that evicts expired sessions periodically"""
+        interval = interval or Config.CONVERSATION_SWEEP_INTERVAL
+        if interval <= 0 or self._sweeper is not None:
+            return
+        
+        def sweep():
+            while not self._sweeper_stop.wait(interval):
+                self._cleanup_expired_sessions()
+        
+        self._sweeper_stop.clear()
+        self._sweeper = threading.Thread(target=sweep, name='session-sweeper', daemon=True)
+        self._sweeper.start()
+        logger.info(f"Session sweeper started with interval {interval}s")
+    
+    def stop_sweeper(self):
+        """Stop the background sweeper thread if running"""
+        if self._sweeper is None:
+            return
+        self._sweeper_stop.set()
+        self._sweeper.join()
+        self._sweeper = None
+    
+    def close(self):
+        """Stop background work and flush the session store"""
+        self.stop_sweeper()
+        if self.summarizer is not None:
+            self.summarizer.shutdown()
+        self.store.close()
+        if self.spill is not None and self.spill is not self.store:
+            self.spill.close()
+    
+    def _get_messages(self, session_id: str) -> Optional[deque]:
+        """Return a session's messages, loading them from the store on a cache miss"""
+        with self._lru_lock:
+            messages = self.conversations.get(session_id)
+            if messages is not None:
+                self.conversations.move_to_end(session_id)
+                return messages
+        
+        if self.spill is None:
+            return None
+        
+        records = self.spill.load(session_id, self.max_history)
+        if not records:
+            return None
+        
+        last_activity = datetime.utcfromtimestamp(records[-1].created_at)
+        if datetime.utcnow() - last_activity > self.timeout:
+            self.spill.delete(session_id)
+            return None
+        
+        messages = deque(records, maxlen=self.max_history)
+        with self._lru_lock:
+            self.conversations[session_id] = messages
+        if self.summarizer is not None:
+            # The stored summary covers what was evicted before the loaded messages
+            self.summarizer.restore(session_id, self.spill.load_summary(session_id), records[0].seq - 1)
+        if self.spill is not self.store:
+            # The session lives in memory again, so its spilled copy is stale
+            self.spill.delete(session_id)
+        with self._index_lock:
+            # Reloading counts as activity. Stamping it now keeps the index in
+            # activity order; an older stamp at the back would hide the session
+            # from expiry, which stops at the first live entry.
+            if session_id not in self.session_timestamps:
+                self.session_timestamps[session_id] = datetime.utcnow()
+        size = sum(record.record_bytes() for record in records)
+        self._account(len(records), size)
+        if self.catalog.get(session_id) is None:
+            self.catalog.record(session_id, records[-1].created_at, len(records), size)
+        self._evict_cold_sessions(keep=session_id)
+        return messages
+    
+    @staticmethod
+    def _version(messages: Optional[deque]) -> str:
+        if not messages:
+            return '0'
+        newest = messages[-1]
+        # The timestamp tells apart a restarted session that reached the same seq
+        return f"{newest.seq}-{int(newest.created_at * 1e6):x}"
+    
+    def _evict_cold_sessions(self, keep: str = None):
+        """Evict least recently used sessions until memory is within the byte budget
+        
+        With a persistent store the session count is also capped at cache_size.
+        Sessions that are busy (their lock is held, a turn is in flight or they
+        are pinned) are passed over this round rather than waited for.
+        """
+        passed_over = 0
+        while True:
+            with self._lru_lock:
+                if len(self.conversations) - passed_over <= 1 or not self._over_budget():
+                    return
+                session_id = next(iter(self.conversations))
+                busy = session_id == keep or session_id in self._turn_locks or session_id in self._pins
+                if busy:
+                    self.conversations.move_to_end(session_id)
+            # The stripe is only tried, outside the LRU lock, so the lock order stays stripe first
+            if not busy and not self._evict(session_id):
+                with self._lru_lock:
+                    if session_id in self.conversations:
+                        self.conversations.move_to_end(session_id)
+                busy = True
+            if busy:
+                passed_over += 1
+    
+    def _over_budget(self) -> bool:
+        if self.store.persistent and 0 < self.cache_size < len(self.conversations):
+            return True
+        if self.memory_budget <= 0:
+            return False
+        return self._memory_bytes + len(self.conversations) * self._session_overhead > self.memory_budget
+    
+    def _evict(self, session_id: str) -> bool:
+        """Move one session out of memory; False if its lock is busy"""
+        stripe = self._stripe(session_id)
+        if not stripe.acquire(blocking=False):
+            return False
+        try:
+            with self._lru_lock:
+                messages = self.conversations.pop(session_id, None)
+            if messages is None:
+                return True
+            records = list(messages)
+            self._account(-len(records), -sum(record.record_bytes() for record in records))
+            
+            if self.spill is self.store:
+                # Already persisted; reloaded from the store on next access
+                return True
+            
+            if self.spill is not None:
+                for record in records:
+                    self.spill.append(session_id, record)
+                summary = self.summarizer.get(session_id) if self.summarizer is not None else None
+                if summary:
+                    self.spill.save_summary(session_id, summary)
+                action = 'spilled'
+            else:
+                # Nowhere to keep it: the session ends early rather than exhausting memory
+                with self._index_lock:
+                    self.session_timestamps.pop(session_id, None)
+                self.catalog.remove(session_id)
+                action = 'dropped'
+            if self.summarizer is not None:
+                self.summarizer.discard(session_id)
+        finally:
+            stripe.release()
+        
+        with self._index_lock:
+            self._evictions[action] += 1
+        logger.warning("Memory budget exceeded: %s session %s", action, session_id)
+        return True
+    
+    def _discard_session(self, session_id: str):
+        """Remove a session from memory and every store; caller holds its stripe"""
+        with self._lru_lock:
+            messages = self.conversations.pop(session_id, None)
+        if messages is not None:
+            records = list(messages)
+            self._account(-len(records), -sum(record.record_bytes() for record in records))
+        self.catalog.remove(session_id)
+        self.store.delete(session_id)
+        if self.spill is not None and self.spill is not self.store:
+            self.spill.delete(session_id)
+        if self.summarizer is not None:
+            self.summarizer.discard(session_id)
+    
+    def _account(self, messages: int, size: int):
+        """Adjust the running totals of in-memory messages and bytes"""
+        with self._index_lock:
+            self._memory_messages += messages
+            self._memory_bytes += size
+    
+    @staticmethod
+    def _open_spill(path: str) -> SQLiteSessionStore:
+        """Open a fresh spill file; sessions spilled by an earlier process are not resumed"""
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return SQLiteSessionStore(path=path)
+    
+    def _stripe(self, session_id: str) -> threading.RLock:
+        """Lock guarding a session's data"""
+        return self._stripes[hash(session_id) % len(self._stripes)]
+    
+    def _touch(self, session_id: str):
+        """Record activity for a session and move it to the back of the expiry index"""
+        with self._index_lock:
+            self.session_timestamps[session_id] = datetime.utcnow()
+            self.session_timestamps.move_to_end(session_id)
+    
     def _cleanup_expired_sessions(self):
-        """Remove expired conversation sessions"""
+        """Remove expired conversation sessions
+        
+        Sessions are ordered by last activity, so this stops at the first
+        session that has not expired and costs O(expired) rather than O(N).
+        """
         try:
             current_time = datetime.utcnow()
-            expired_sessions = []
+            expired = []
             
-            for session_id, timestamp in self.session_timestamps.items():
-                if current_time - timestamp > self.timeout:
-                    expired_sessions.append(session_id)
+            with self._index_lock:
+                while self.session_timestamps:
+                    session_id, timestamp = next(iter(self.session_timestamps.items()))
+                    if current_time - timestamp <= self.timeout:
+                        break
+                    
+                    self.session_timestamps.popitem(last=False)
+                    expired.append((session_id, timestamp))
             
-            for session_id in expired_sessions:
-                if session_id in self.conversations:
-                    del self.conversations[session_id]
-                del self.session_timestamps[session_id]
+            for session_id, timestamp in expired:
+                stripe = self._stripe(session_id)
+                # Never wait on a stripe here: the caller may already hold one
+                if not stripe.acquire(blocking=False):
+                    self._requeue_expired(session_id, timestamp)
+                    continue
+                try:
+                    # Skip sessions that were touched again after being dequeued
+                    if session_id in self.session_timestamps:
+                        continue
+                    self._discard_session(session_id)
+                finally:
+                    stripe.release()
                 logger.info(f"Cleaned up expired session: {session_id}")
                 
         except Exception as e:
-            logger.error(f"Error during session cleanup: {str(e)}")
\ No newline at end of file
+            logger.error(f"Error during session cleanup: {str(e)}")
+    
+    def _requeue_expired(self, session_id: str, timestamp: datetime):
+        """Put a busy expired session back at the front so a later pass retries it"""
+        with self._index_lock:
+            if session_id not in self.session_timestamps:
+                self.session_timestamps[session_id] = timestamp
+                self.session_timestamps.move_to_end(session_id, last=False)
@@ -0,0 +1,63 @@
+import json
+import sys
+from datetime import datetime
+from typing import Dict, Any
+from utils.tokens import estimate_tokens, MESSAGE_TOKEN_OVERHEAD
+
+class Message:
+    """Compact conversation message record.
+    
+    The timestamp is kept as epoch seconds and only formatted as ISO 8601
+    when the message is serialized for the API. The Bedrock encoding is
+    computed once and reused for every later turn that includes the message,
+    as is its token estimate. seq numbers a session's messages from 1 in the
+    order they were added, so it doubles as a history cursor.
+    """
+    
+    __slots__ = ('role', 'content', 'created_at', 'seq', '_encoded', '_tokens')
+    
+    def __init__(self, role: str, content: str, created_at: float, seq: int = 0):
+        self.role = role
+        self.content = content
+        self.created_at = created_at
+        self.seq = seq
+        self._encoded = None
+        self._tokens = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize as returned by the conversation history API"""
+        return {
+            "role": self.role,
+            "content": self.content,
+            "timestamp": datetime.utcfromtimestamp(self.created_at).isoformat()
+        }
+    
+    def to_context(self) -> Dict[str, Any]:
+        """Serialize as passed to the AI model (no timestamp)"""
+        return {
+            "role": self.role,
+            "content": self.content
+        }
+    
+    def to_bedrock_json(self) -> str:
+        """Bedrock messages-API JSON fragment, encoded on first use"""
+        if self._encoded is None:
+            self._encoded = json.dumps({"role": self.role, "content": [{"text": self.content}]})
+        return self._encoded
+    
+    def token_count(self) -> int:
+        """Estimated prompt tokens for this message, computed on first use"""
+        if self._tokens is None:
+            self._tokens = estimate_tokens(self.content) + MESSAGE_TOKEN_OVERHEAD
+        return self._tokens
+    
+    def record_bytes(self) -> int:
+        """Approximate bytes of this record and its content; fixed once created"""
+        return sys.getsizeof(self) + sys.getsizeof(self.content)
+    
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by this record, its content and cached encoding"""
+        size = self.record_bytes()
+        if self._encoded is not None:
+            size += sys.getsizeof(self._encoded)
+        return size
@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+def _parse_list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+class ModelStats:
+    """Live counters and decaying latency/error averages for one model"""
+    
+    __slots__ = ('routed', 'spillovers', 'successes', 'failures', 'latency', 'error_rate', 'updated_at')
+    
+    def __init__(self):
+        self.routed = 0
+        self.spillovers = 0
+        self.successes = 0
+        self.failures = 0
+        self.latency = 0.0
+        self.error_rate = 0.0
+        self.updated_at = time.monotonic()
+
+class ModelRouter:
+    """Picks the Bedrock model for each request from a tier list.
+    
+    Tiers are ordered smallest model first. A request's tier comes from its
+    estimated prompt size, bumped one tier up for high-priority sessions.
+    Candidates are the chosen tier, then larger tiers, then smaller ones;
+    models whose circuit is open or whose recent error rate or latency is
+    over the limit are moved to the end so they are only used as a last
+    resort. Averages fade while a model gets no traffic, so a demoted
+    model is tried again once it has been quiet for a while.
+    """
+    
+    def __init__(self, tiers: List[str] = None, tier_max_tokens: List[int] = None,
+                 max_error_rate: float = None, max_latency: float = None,
+                 available: Callable[[str], bool] = None):
+        self.tiers = tiers or _parse_list(Config.BEDROCK_MODEL_TIERS) or [Config.BEDROCK_MODEL_ID]
+        if tier_max_tokens is None:
+            tier_max_tokens = [int(value) for value in _parse_list(Config.ROUTING_TIER_MAX_TOKENS)]
+        self.tier_max_tokens = tier_max_tokens
+        self.max_error_rate = Config.ROUTING_MAX_ERROR_RATE if max_error_rate is None else max_error_rate
+        self.max_latency = Config.ROUTING_MAX_LATENCY if max_latency is None else max_latency
+        self.half_life = Config.ROUTING_STATS_HALF_LIFE
+        self.alpha = 0.2
+        self.available = available
+        self._stats: Dict[str, ModelStats] = {model_id: ModelStats() for model_id in self.tiers}
+        self._lock = threading.Lock()
+        logger.info(f"Model router tiers: {', '.join(self.tiers)}")
+    
+    def route(self, prompt_tokens: int, priority: str = None) -> List[str]:
+        """Ordered candidate model ids for a request, preferred model first"""
+        tier = self._tier_for(prompt_tokens, priority)
+        ordered = self.tiers[tier:] + self.tiers[:tier][::-1]
+        healthy = [model_id for model_id in ordered if self._healthy(model_id)]
+        candidates = healthy + [model_id for model_id in ordered if model_id not in healthy]
+        
+        with self._lock:
+            self._stats[candidates[0]].routed += 1
+        if len(self.tiers) > 1:
+            logger.info("Routed %d prompt tokens (priority %s) to %s", prompt_tokens, priority or 'normal', candidates[0])
+        return candidates
+    
+    def preferred(self, prompt_tokens: int, priority: str = None) -> str:
+        """The tier model a request goes to while it is healthy; not counted as routed"""
+        return self.tiers[self._tier_for(prompt_tokens, priority)]
+    
+    def record_success(self, model_id: str, latency: float):
+        with self._lock:
+            stats = self._get(model_id)
+            self._decay(stats)
+            stats.successes += 1
+            stats.latency += self.alpha * (latency - stats.latency)
+            stats.error_rate -= self.alpha * stats.error_rate
+    
+    def record_failure(self, model_id: str, latency: float):
+        with self._lock:
+            stats = self._get(model_id)
+            self._decay(stats)
+            stats.failures += 1
+            stats.latency += self.alpha * (latency - stats.latency)
+            stats.error_rate += self.alpha * (1.0 - stats.error_rate)
+    
+    def record_spillover(self, from_model_id: str, to_model_id: str, reason: Exception):
+        with self._lock:
+            self._get(from_model_id).spillovers += 1
+        logger.warning(f"Spilling over from {from_model_id} to {to_model_id}: {str(reason)}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Routing counters and live averages per model"""
+        with self._lock:
+            models = {}
+            for model_id, stats in self._stats.items():
+                self._decay(stats)
+                models[model_id] = {
+                    'routed': stats.routed,
+                    'spillovers': stats.spillovers,
+                    'successes': stats.successes,
+                    'failures': stats.failures,
+                    'latency': round(stats.latency, 4),
+                    'error_rate': round(stats.error_rate, 4)
+                }
+            return {'tiers': list(self.tiers), 'models': models}
+    
+    def _tier_for(self, prompt_tokens: int, priority: str = None) -> int:
+        tier = min(len(self.tier_max_tokens), len(self.tiers) - 1)
+        for index, max_tokens in enumerate(self.tier_max_tokens[:len(self.tiers) - 1]):
+            if prompt_tokens <= max_tokens:
+                tier = index
+                break
+        if priority == 'high':
+            tier = min(tier + 1, len(self.tiers) - 1)
+        return tier
+    
+    def _healthy(self, model_id: str) -> bool:
+        if self.available is not None and not self.available(model_id):
+            return False
+        with self._lock:
+            stats = self._get(model_id)
+            self._decay(stats)
+            if stats.error_rate > self.max_error_rate:
+                return False
+            return not self.max_latency or stats.latency <= self.max_latency
+    
+    def _get(self, model_id: str) -> ModelStats:
+        # Caller holds self._lock; fallback models outside the tier list get stats too
+        stats = self._stats.get(model_id)
+        if stats is None:
+            stats = self._stats[model_id] = ModelStats()
+        return stats
+    
+    def _decay(self, stats: ModelStats):
+        now = time.monotonic()
+        if self.half_life > 0:
+            factor = 0.5 ** ((now - stats.updated_at) / self.half_life)
+            stats.latency *= factor
+            stats.error_rate *= factor
+        stats.updated_at = now
@@ -0,0 +1,189 @@
+import contextvars
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from typing import Callable, Dict, Optional, TypeVar
+from config import Config
+from services.bedrock_errors import BedrockError, CircuitOpenError, classify_exception
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open trial call"""
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, name: str, failure_threshold: int = None, reset_timeout: float = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or Config.CIRCUIT_BREAKER_FAILURES
+        self.reset_timeout = reset_timeout or Config.CIRCUIT_BREAKER_RESET
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+    
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may proceed"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            raise CircuitOpenError(f"Bedrock circuit open for {self.name}")
+    
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit for {self.name} closed")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit for {self.name} opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+    
+    def release(self):
+        """End a call that neither succeeded nor indicated a service fault"""
+        with self._lock:
+            self._trial_in_flight = False
+    
+    def available(self) -> bool:
+        """Whether a call would currently be let through"""
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at >= self.reset_timeout
+            return not (self.state == self.HALF_OPEN and self._trial_in_flight)
+
+class ResilientInvoker:
+    """Runs Bedrock calls with retries, circuit breaking and an optional fallback model.
+    
+    Throttling, timeouts and service faults are retried with full-jitter
+    exponential backoff. Each model id has its own circuit breaker. With a
+    fallback model configured, a call that fails (or, when hedging is on,
+    that is still running after the hedge delay) is also sent to the
+    fallback model and the first success wins.
+    """
+    
+    def __init__(self, fallback_model_id: str = None, max_retries: int = None,
+                 base_delay: float = None, max_delay: float = None, hedge_after: float = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.fallback_model_id = Config.BEDROCK_FALLBACK_MODEL_ID if fallback_model_id is None else fallback_model_id
+        self.max_retries = Config.BEDROCK_MAX_RETRIES if max_retries is None else max_retries
+        self.base_delay = Config.BEDROCK_RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = Config.BEDROCK_RETRY_MAX_DELAY if max_delay is None else max_delay
+        self.hedge_after = Config.BEDROCK_HEDGE_AFTER if hedge_after is None else hedge_after
+        self.sleep = sleep
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._breakers_lock = threading.Lock()
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+        if self.fallback_model_id and self.hedge_after > 0:
+            self._hedge_executor = ThreadPoolExecutor(max_workers=Config.BEDROCK_HEDGE_WORKERS, thread_name_prefix='bedrock-hedge')
+    
+    def invoke(self, call: Callable[[str], T], model_id: str, hedge: bool = True, max_retries: int = None) -> T:
+        """Run call(model_id) resiliently; call performs one upstream attempt"""
+        retries = self.max_retries if max_retries is None else max_retries
+        if not self.fallback_model_id or self.fallback_model_id == model_id:
+            return self._with_retries(call, model_id, retries)
+        if hedge and self._hedge_executor is not None:
+            return self._hedged(call, model_id, retries)
+        
+        try:
+            return self._with_retries(call, model_id, retries)
+        except BedrockError as e:
+            if not e.service_fault and not isinstance(e, CircuitOpenError):
+                raise
+            logger.warning(f"Falling back to {self.fallback_model_id} after: {str(e)}")
+            return self._with_retries(call, self.fallback_model_id, retries)
+    
+    def breaker(self, model_id: str) -> CircuitBreaker:
+        breaker = self.breakers.get(model_id)
+        if breaker is None:
+            with self._breakers_lock:
+                breaker = self.breakers.setdefault(model_id, CircuitBreaker(model_id))
+        return breaker
+    
+    def available(self, model_id: str) -> bool:
+        """Whether the model's circuit would let a call through"""
+        breaker = self.breakers.get(model_id)
+        return breaker is None or breaker.available()
+    
+    def status(self) -> Dict[str, str]:
+        """Circuit state per model id"""
+        return {model_id: breaker.state for model_id, breaker in self.breakers.items()}
+    
+    def _with_retries(self, call: Callable[[str], T], model_id: str, max_retries: int) -> T:
+        breaker = self.breaker(model_id)
+        attempt = 0
+        while True:
+            breaker.before_call()
+            try:
+                result = call(model_id)
+            except Exception as e:
+                error = classify_exception(e)
+                if error.service_fault:
+                    breaker.record_failure()
+                else:
+                    breaker.release()
+                if not error.retryable or attempt >= max_retries:
+                    if error is e:
+                        raise
+                    raise error from e
+                
+                delay = self._backoff(attempt)
+                attempt += 1
+                logger.warning(f"Retrying {model_id} in {delay:.2f}s (attempt {attempt}/{max_retries}): {str(error)}")
+                self.sleep(delay)
+                continue
+            
+            breaker.record_success()
+            return result
+    
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: spreads retries from many clients across the window
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+    
+    def _submit(self, call: Callable[[str], T], model_id: str, max_retries: int) -> Future:
+        # Each attempt runs in a copy of the caller's context, so it keeps the
+        # request's trace and parent span; a context cannot be entered twice at once
+        context = contextvars.copy_context()
+        return self._hedge_executor.submit(context.run, self._with_retries, call, model_id, max_retries)
+    
+    def _hedged(self, call: Callable[[str], T], model_id: str, max_retries: int) -> T:
+        primary = self._submit(call, model_id, max_retries)
+        try:
+            return primary.result(timeout=self.hedge_after)
+        except FutureTimeoutError:
+            logger.warning(f"{model_id} slower than {self.hedge_after}s, hedging with {self.fallback_model_id}")
+        except BedrockError as e:
+            if not e.service_fault and not isinstance(e, CircuitOpenError):
+                raise
+            logger.warning(f"Falling back to {self.fallback_model_id} after: {str(e)}")
+            return self._with_retries(call, self.fallback_model_id, max_retries)
+        
+        pending = {primary, self._submit(call, self.fallback_model_id, max_retries)}
+        last_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                last_error = future.exception()
+        raise last_error
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r'[^\w\s]+')
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_text(text: str) -> str:
+    """Case-fold, drop punctuation and collapse whitespace"""
+    return _WHITESPACE.sub(' ', _NON_WORD.sub(' ', text.casefold())).strip()
+
+class _Entry:
+    __slots__ = ('response', 'expires_at', 'bucket', 'words')
+    
+    def __init__(self, response: str, expires_at: float, bucket: Optional[str], words: Optional[frozenset]):
+        self.response = response
+        self.expires_at = expires_at
+        self.bucket = bucket
+        self.words = words
+
+class ResponseCache:
+    """Bounded TTL + LRU cache of model responses.
+    
+    Entries are keyed by a hash of the model id (the routed model, so a
+    reply from one tier is never served for another), the system prompt and
+    the full request body, which already contains the inference config and the
+    trimmed message window. In near-duplicate mode, a miss falls back to
+    comparing the last user message against recent entries that share the
+    same earlier context, system prompt included: a session's running
+    summary stands in for turns no longer in the window.
+    """
+    
+    def __init__(self, max_entries: int = None, ttl: float = None,
+                 near_duplicates: bool = None, similarity_threshold: float = None):
+        self.max_entries = max_entries or Config.RESPONSE_CACHE_MAX_ENTRIES
+        self.ttl = ttl or Config.RESPONSE_CACHE_TTL
+        self.near_duplicates = Config.RESPONSE_CACHE_NEAR_DUPLICATES if near_duplicates is None else near_duplicates
+        self.similarity_threshold = similarity_threshold or Config.RESPONSE_CACHE_SIMILARITY
+        self.scan_limit = 64
+        
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        # bucket (model + earlier context) -> entry keys, most recent last
+        self._buckets: Dict[str, OrderedDict] = {}
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        logger.info(f"Response cache enabled: {self.max_entries} entries, ttl {self.ttl}s")
+    
+    def get(self, model_id: str, messages: List[str], body: str, system: str = None) -> Optional[str]:
+        """Return a cached response for this request, or None on a miss"""
+        key = self._key(model_id, body, system)
+        now = time.monotonic()
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.response
+            if entry is not None:
+                self._remove(key)
+            
+            if self.near_duplicates and messages:
+                response = self._find_near_duplicate(model_id, messages, system, now)
+                if response is not None:
+                    self.near_hits += 1
+                    return response
+            
+            self.misses += 1
+            return None
+    
+    def put(self, model_id: str, messages: List[str], body: str, response: str, system: str = None):
+        """Store a response for this request"""
+        key = self._key(model_id, body, system)
+        bucket = words = None
+        if self.near_duplicates and messages:
+            bucket = self._bucket(model_id, messages, system)
+            words = self._words(messages[-1])
+        
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(response, time.monotonic() + self.ttl, bucket, words)
+            if bucket is not None:
+                self._buckets.setdefault(bucket, OrderedDict())[key] = None
+            
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+    
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters for operators"""
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.near_hits) / lookups if lookups else 0.0
+            }
+    
+    def _find_near_duplicate(self, model_id: str, messages: List[str], system: Optional[str],
+                             now: float) -> Optional[str]:
+        keys = self._buckets.get(self._bucket(model_id, messages, system))
+        if not keys:
+            return None
+        
+        words = self._words(messages[-1])
+        for scanned, key in enumerate(reversed(keys)):
+            if scanned >= self.scan_limit:
+                break
+            entry = self._entries[key]
+            if entry.expires_at <= now:
+                continue
+            if self._similarity(words, entry.words) >= self.similarity_threshold:
+                self._entries.move_to_end(key)
+                return entry.response
+        return None
+    
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        if entry.bucket is not None:
+            keys = self._buckets.get(entry.bucket)
+            if keys is not None:
+                keys.pop(key, None)
+                if not keys:
+                    del self._buckets[entry.bucket]
+    
+    def _key(self, model_id: str, body: str, system: Optional[str]) -> str:
+        return hashlib.sha256(f"{model_id}\n{json.dumps(system)}\n{body}".encode('utf-8')).hexdigest()
+    
+    def _bucket(self, model_id: str, messages: List[str], system: Optional[str]) -> str:
+        context = f"{model_id}\n{json.dumps(system)}\n{','.join(messages[:-1])}"
+        return hashlib.sha256(context.encode('utf-8')).hexdigest()
+    
+    def _words(self, encoded_message: str) -> frozenset:
+        message = json.loads(encoded_message)
+        text = ' '.join(block.get('text', '') for block in message.get('content', []))
+        return frozenset(normalize_text(text).split())
+    
+    def _similarity(self, a: frozenset, b: frozenset) -> float:
+        if not a and not b:
+            return 1.0
+        return len(a & b) / len(a | b)
@@ -0,0 +1,79 @@
+import os
+import resource
+from typing import Iterable
+from services.admission_control import AdmissionController
+from services.bedrock_service import BedrockService
+from services.conversation_manager import ConversationManager
+from utils.metrics import Family, MetricsRegistry, registry as default_registry
+
+def resident_memory_bytes() -> int:
+    """Current resident set size of this process (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+def collect_service_metrics(bedrock_service: BedrockService, conversation_manager: ConversationManager,
+                            admission: AdmissionController = None) -> Iterable[Family]:
+    """Scrape-time gauges and counters read from the services' own stats"""
+    yield 'process_resident_memory_bytes', 'Resident memory size in bytes', 'gauge', [({}, resident_memory_bytes())]
+    
+    memory = conversation_manager.memory_stats()
+    cached = memory['sessions']
+    yield 'chat_active_sessions', 'Sessions not yet expired', 'gauge', [({}, len(conversation_manager.session_timestamps))]
+    yield 'chat_cached_sessions', 'Sessions whose history is held in memory', 'gauge', [({}, cached)]
+    yield 'chat_cached_messages', 'Messages held in memory across sessions', 'gauge', [({}, memory['messages'])]
+    yield 'chat_session_memory_bytes', 'Approximate bytes held by in-memory session histories', 'gauge', [({}, memory['bytes'])]
+    yield 'chat_session_memory_bytes_per_session', 'Average bytes per in-memory session', 'gauge', [
+        ({}, memory['bytes'] / cached if cached else 0)
+    ]
+    yield 'chat_memory_budget_bytes', 'Byte budget for in-memory session histories, 0 if unlimited', 'gauge', [
+        ({}, memory['budget_bytes'])
+    ]
+    yield 'chat_session_evictions_total', 'Sessions evicted to stay under the memory budget', 'counter', [
+        ({'action': 'spilled'}, memory['spilled_sessions']),
+        ({'action': 'dropped'}, memory['dropped_sessions'])
+    ]
+    
+    context = conversation_manager.context_builder.stats()
+    yield 'chat_context_tokens_per_turn', 'Average estimated context tokens sent per turn', 'gauge', [
+        ({}, context.get('avg_tokens_per_turn', 0))
+    ]
+    
+    cache = bedrock_service.response_cache
+    if cache is not None:
+        stats = cache.stats()
+        yield 'response_cache_lookups_total', 'Response cache lookups by result', 'counter', [
+            ({'result': 'hit'}, stats['hits']),
+            ({'result': 'near_hit'}, stats['near_hits']),
+            ({'result': 'miss'}, stats['misses'])
+        ]
+        yield 'response_cache_hit_ratio', 'Share of lookups served from the response cache', 'gauge', [({}, stats['hit_rate'])]
+        yield 'response_cache_entries', 'Responses held in the cache', 'gauge', [({}, stats['entries'])]
+        yield 'response_cache_evictions_total', 'Responses evicted to stay under the size limit', 'counter', [({}, stats['evictions'])]
+    
+    if bedrock_service.single_flight is not None:
+        stats = bedrock_service.single_flight.stats()
+        yield 'bedrock_coalesced_requests_total', 'Requests that shared an identical in-flight Bedrock call', 'counter', [
+            ({}, stats['coalesced'])
+        ]
+    
+    if admission is not None:
+        stats = admission.stats()
+        yield 'admission_in_flight', 'Chat turns holding a concurrency slot', 'gauge', [({}, stats['in_flight'])]
+        yield 'admission_queued', 'Chat turns waiting for a concurrency slot', 'gauge', [({}, stats['queued'])]
+    
+    circuits = bedrock_service.resilience.status()
+    yield 'bedrock_circuit_open', 'Whether a model circuit is open (1) or half-open (0.5)', 'gauge', [
+        ({'model': model_id}, {'open': 1, 'half_open': 0.5}.get(state, 0)) for model_id, state in sorted(circuits.items())
+    ]
+
+def register_service_metrics(bedrock_service: BedrockService, conversation_manager: ConversationManager,
+                             registry: MetricsRegistry = None, admission: AdmissionController = None):
+    """Expose the services' stats on /metrics, replacing any earlier registration"""
+    (registry or default_registry).register_collector(
+        'services', lambda: collect_service_metrics(bedrock_service, conversation_manager, admission)
+    )
@@ -0,0 +1,209 @@
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+EPOCH = datetime(1970, 1, 1)
+
+class SortedKeys:
+    """Sorted collection of unique keys, split into bounded blocks
+    
+    Adding or removing a key bisects the block maxima and then one block,
+    so it costs O(log n) comparisons plus a shift of at most one block.
+    Iteration can start from any key in either direction.
+    """
+    
+    BLOCK_SIZE = 512
+    
+    def __init__(self):
+        self._blocks: List[list] = []
+        self._maxes: list = []
+        self._len = 0
+    
+    def __len__(self) -> int:
+        return self._len
+    
+    def add(self, key):
+        if not self._blocks:
+            self._blocks.append([key])
+            self._maxes.append(key)
+            self._len = 1
+            return
+        
+        index = bisect_left(self._maxes, key)
+        if index == len(self._maxes):
+            index -= 1
+            self._blocks[index].append(key)
+            self._maxes[index] = key
+        else:
+            insort(self._blocks[index], key)
+        self._len += 1
+        
+        block = self._blocks[index]
+        if len(block) > 2 * self.BLOCK_SIZE:
+            half = self.BLOCK_SIZE
+            self._blocks[index:index + 1] = [block[:half], block[half:]]
+            self._maxes[index:index + 1] = [block[half - 1], block[-1]]
+    
+    def discard(self, key):
+        index = bisect_left(self._maxes, key)
+        if index == len(self._maxes):
+            return
+        block = self._blocks[index]
+        position = bisect_left(block, key)
+        if position == len(block) or block[position] != key:
+            return
+        
+        del block[position]
+        self._len -= 1
+        if block:
+            self._maxes[index] = block[-1]
+        else:
+            del self._blocks[index]
+            del self._maxes[index]
+    
+    def iter_from(self, start=None, inclusive: bool = True) -> Iterator:
+        """Keys in ascending order, from start onwards"""
+        if start is None:
+            index, position = 0, 0
+        else:
+            index = bisect_left(self._maxes, start)
+            if index == len(self._maxes):
+                return
+            find = bisect_left if inclusive else bisect_right
+            position = find(self._blocks[index], start)
+        for block in self._blocks[index:]:
+            yield from block[position:]
+            position = 0
+    
+    def iter_before(self, end=None) -> Iterator:
+        """Keys in descending order, below end"""
+        if end is None:
+            index, position = len(self._blocks) - 1, None
+        else:
+            index = min(bisect_left(self._maxes, end), len(self._blocks) - 1)
+            position = bisect_left(self._blocks[index], end) if index >= 0 else 0
+        for block_index in range(index, -1, -1):
+            block = self._blocks[block_index]
+            yield from reversed(block if position is None else block[:position])
+            position = None
+
+class SessionInfo:
+    """Metadata of one session, updated as its messages change"""
+    
+    __slots__ = ('session_id', 'created_at', 'last_activity', 'message_count', 'bytes')
+    
+    def __init__(self, session_id: str, created_at: float):
+        self.session_id = session_id
+        self.created_at = created_at
+        self.last_activity = created_at
+        self.message_count = 0
+        self.bytes = 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'session_id': self.session_id,
+            'message_count': self.message_count,
+            'bytes': self.bytes,
+            'created_at': datetime.utcfromtimestamp(self.created_at).isoformat(),
+            # Rendered from the same integer microseconds as the activity cursor,
+            # so a page's cursor can be rebuilt from its last entry
+            'last_activity': (EPOCH + timedelta(microseconds=int(self.last_activity * 1e6))).isoformat()
+        }
+
+class SessionCatalog:
+    """Index of active sessions for listing without scanning
+    
+    Keeps each session's metadata and two sorted indexes: by session id,
+    for prefix filters, and by last activity, for newest-first listing.
+    Both are updated as messages are recorded, so counting is O(1) and a
+    page costs O(log n) plus its own size. The activity index is keyed by
+    integer microseconds so its cursors round-trip exactly.
+    """
+    
+    def __init__(self):
+        self._sessions: Dict[str, SessionInfo] = {}
+        self._by_id = SortedKeys()
+        self._by_activity = SortedKeys()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._sessions)
+    
+    def get(self, session_id: str) -> Optional[SessionInfo]:
+        return self._sessions.get(session_id)
+    
+    def record(self, session_id: str, timestamp: float, messages: int = 0, size: int = 0):
+        """Note activity on a session and the change in its messages and bytes"""
+        with self._lock:
+            info = self._sessions.get(session_id)
+            if info is None:
+                info = self._sessions[session_id] = SessionInfo(session_id, timestamp)
+                self._by_id.add(session_id)
+            else:
+                self._by_activity.discard(self._activity_key(info))
+            info.last_activity = max(info.last_activity, timestamp)
+            info.message_count += messages
+            info.bytes += size
+            self._by_activity.add(self._activity_key(info))
+    
+    def remove(self, session_id: str):
+        with self._lock:
+            info = self._sessions.pop(session_id, None)
+            if info is None:
+                return
+            self._by_id.discard(session_id)
+            self._by_activity.discard(self._activity_key(info))
+    
+    def page(self, order: str = 'activity', prefix: str = '', cursor: Optional[str] = None,
+             limit: int = 100) -> Tuple[List[SessionInfo], Optional[str]]:
+        """One page of sessions and the cursor for the next page, or None at the end
+        
+        'activity' lists the most recently active sessions first; 'id' lists
+        by session id. A prefix narrows the id index directly; in activity
+        order it filters while walking the index.
+        """
+        with self._lock:
+            if order == 'id':
+                if cursor is not None and cursor >= prefix:
+                    keys = self._by_id.iter_from(cursor, inclusive=False)
+                else:
+                    keys = self._by_id.iter_from(prefix or None)
+                infos = self._take(keys, prefix, limit, lambda key: key, stop_outside_prefix=True)
+            else:
+                keys = self._by_activity.iter_before(self._parse_activity_cursor(cursor))
+                infos = self._take(keys, prefix, limit, lambda key: key[1], stop_outside_prefix=False)
+        
+        if len(infos) <= limit:
+            return infos, None
+        infos = infos[:limit]
+        last = infos[-1]
+        next_cursor = last.session_id if order == 'id' else '{}:{}'.format(*self._activity_key(last))
+        return infos, next_cursor
+    
+    def _take(self, keys: Iterator, prefix: str, limit: int, session_of, stop_outside_prefix: bool) -> List[SessionInfo]:
+        """Collect up to limit + 1 sessions so the caller can tell whether more remain"""
+        infos = []
+        for key in keys:
+            session_id = session_of(key)
+            if prefix and not session_id.startswith(prefix):
+                if stop_outside_prefix:
+                    break
+                continue
+            infos.append(self._sessions[session_id])
+            if len(infos) > limit:
+                break
+        return infos
+    
+    @staticmethod
+    def _activity_key(info: SessionInfo) -> Tuple[int, str]:
+        return int(info.last_activity * 1e6), info.session_id
+    
+    @staticmethod
+    def _parse_activity_cursor(cursor: Optional[str]) -> Optional[Tuple[int, str]]:
+        if not cursor:
+            return None
+        micros, _, session_id = cursor.partition(':')
+        if not micros.isdigit():
+            raise ValueError("Invalid cursor")
+        return int(micros), session_id
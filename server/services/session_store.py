@@ -0,0 +1,293 @@
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from config import Config
+from services.message import Message
+
+logger = logging.getLogger(__name__)
+
+class SessionStore(ABC):
+    """Persistence backend behind ConversationManager.
+    
+    The manager keeps live sessions in memory; a store only has to persist
+    appended messages and return them when a session is not cached.
+    """
+    
+    persistent = False
+    
+    @abstractmethod
+    def append(self, session_id: str, message: Message):
+        """Persist a message appended to a session"""
+    
+    @abstractmethod
+    def load(self, session_id: str, limit: int) -> Optional[List[Message]]:
+        """Load the most recent messages of a session, oldest first, with their seq numbers"""
+    
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Remove a session, its messages and its summary"""
+    
+    @abstractmethod
+    def save_summary(self, session_id: str, summary: str):
+        """Persist the running summary of a session"""
+    
+    @abstractmethod
+    def load_summary(self, session_id: str) -> Optional[str]:
+        """Load the running summary of a session"""
+    
+    def flush(self):
+        """Block until pending writes are durable"""
+    
+    def close(self):
+        """Flush and release resources"""
+
+class MemorySessionStore(SessionStore):
+    """Default backend: state lives only in the manager's in-process dicts"""
+    
+    def append(self, session_id: str, message: Message):
+        pass
+    
+    def load(self, session_id: str, limit: int) -> Optional[List[Message]]:
+        return None
+    
+    def delete(self, session_id: str):
+        pass
+    
+    def save_summary(self, session_id: str, summary: str):
+        pass
+    
+    def load_summary(self, session_id: str) -> Optional[str]:
+        return None
+
+class SQLiteSessionStore(SessionStore):
+    """Embedded on-disk backend with append-only, write-behind persistence.
+    
+    Writes are queued and committed in batches by a single writer thread, so
+    add_message never waits on disk I/O. Queued writes are also kept per
+    session until they are committed, and reads overlay a session's own
+    pending writes on what is on disk, so a read waits at most for the
+    batch being committed rather than for the whole queue.
+    
+    Several processes may share one file, but each caches the sessions it
+    has loaded and does not see the others' writes to them. A session must
+    therefore be served by one process at a time, as the cluster router
+    does; a session moved to another process is read as of its last commit.
+    """
+    
+    persistent = True
+    
+    _APPEND = 'append'
+    _DELETE = 'delete'
+    _SUMMARY = 'summary'
+    _STOP = 'stop'
+    
+    def __init__(self, path: str = None, batch_size: int = None, max_history: int = None):
+        self.path = path or Config.SESSION_STORE_PATH
+        self.batch_size = batch_size or Config.SESSION_STORE_BATCH_SIZE
+        # Rows kept per session; older ones are deleted as new ones are committed
+        self.max_history = max_history or Config.MAX_CONVERSATION_HISTORY
+        
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    seq INTEGER NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS summaries (
+                    session_id TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL
+                )
+            """)
+        
+        self._queue: queue.Queue = queue.Queue()
+        # Operations queued but not yet committed, per session, in queue order
+        self._pending: Dict[str, Deque[Tuple[str, object]]] = {}
+        self._pending_lock = threading.Lock()
+        # Held by the writer while it commits a batch and retires its pending
+        # operations, and by readers, so a read sees each write exactly once
+        self._commit_lock = threading.Lock()
+        self._local = threading.local()
+        self._closed = False
+        self._writer = threading.Thread(target=self._run_writer, name='session-store-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+        logger.info(f"SQLite session store opened at {self.path}")
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+    
+    def append(self, session_id: str, message: Message):
+        self._enqueue(self._APPEND, session_id, message)
+    
+    def delete(self, session_id: str):
+        self._enqueue(self._DELETE, session_id, None)
+    
+    def save_summary(self, session_id: str, summary: str):
+        self._enqueue(self._SUMMARY, session_id, summary)
+    
+    def load_summary(self, session_id: str) -> Optional[str]:
+        with self._commit_lock:
+            for op, value in reversed(self._pending_ops(session_id)):
+                if op == self._SUMMARY:
+                    return value
+                if op == self._DELETE:
+                    return None
+            row = self._reader().execute(
+                "SELECT summary FROM summaries WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def load(self, session_id: str, limit: int) -> Optional[List[Message]]:
+        with self._commit_lock:
+            pending = self._pending_ops(session_id)
+            deletes = [index for index, (op, _) in enumerate(pending) if op == self._DELETE]
+            if deletes:
+                # Whatever is on disk predates the queued delete
+                pending = pending[deletes[-1] + 1:]
+                stored = []
+            else:
+                stored = self._load_stored(session_id, limit)
+        messages = stored + [message for op, message in pending if op == self._APPEND]
+        return messages[-limit:] or None
+    
+    def _load_stored(self, session_id: str, limit: int) -> List[Message]:
+        rows = self._reader().execute(
+            "SELECT role, content, created_at, seq FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, limit)
+        ).fetchall()
+        return [Message(role, content, created_at, seq) for role, content, created_at, seq in reversed(rows)]
+    
+    def flush(self):
+        self._queue.join()
+    
+    def _enqueue(self, op: str, session_id: str, value):
+        # Under the lock so the pending order matches the queue order
+        with self._pending_lock:
+            self._pending.setdefault(session_id, deque()).append((op, value))
+            self._queue.put((op, session_id, value))
+    
+    def _pending_ops(self, session_id: str) -> List[Tuple[str, object]]:
+        with self._pending_lock:
+            return list(self._pending.get(session_id, ()))
+    
+    def _committed(self, batch):
+        with self._pending_lock:
+            for op, session_id, _ in batch:
+                if op == self._STOP:
+                    continue
+                ops = self._pending[session_id]
+                ops.popleft()
+                if not ops:
+                    del self._pending[session_id]
+    
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put((self._STOP, None, None))
+        self._writer.join()
+        logger.info("SQLite session store closed")
+    
+    def _run_writer(self):
+        conn = self._connect()
+        running = True
+        while running:
+            # Block for the first operation, then drain whatever else is queued
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            running = not any(op == self._STOP for op, _, _ in batch)
+            try:
+                with self._commit_lock:
+                    try:
+                        self._write_batch(conn, batch)
+                    finally:
+                        # A failed batch is logged and dropped, like a committed one
+                        self._committed(batch)
+            except Exception as e:
+                logger.error(f"Error writing session store batch: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+        conn.close()
+    
+    def _write_batch(self, conn: sqlite3.Connection, batch):
+        appends = []
+        appended = set()
+        with conn:
+            for op, session_id, message in batch:
+                if op == self._APPEND:
+                    appends.append((session_id, message.role, message.content, message.created_at, message.seq))
+                    appended.add(session_id)
+                    continue
+                
+                # Keep operation order: write pending appends before anything else
+                if appends:
+                    conn.executemany(
+                        "INSERT INTO messages (session_id, role, content, created_at, seq) VALUES (?, ?, ?, ?, ?)",
+                        appends
+                    )
+                    appends = []
+                if op == self._DELETE:
+                    conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                    conn.execute("DELETE FROM summaries WHERE session_id = ?", (session_id,))
+                elif op == self._SUMMARY:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO summaries (session_id, summary) VALUES (?, ?)",
+                        (session_id, message)
+                    )
+            
+            if appends:
+                conn.executemany(
+                    "INSERT INTO messages (session_id, role, content, created_at, seq) VALUES (?, ?, ?, ?, ?)",
+                    appends
+                )
+            
+            # Only the newest max_history messages are ever loaded, so older rows are dropped
+            conn.executemany(
+                """
+                DELETE FROM messages WHERE session_id = ? AND id <= (
+                    SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?
+                )
+                """,
+                [(session_id, session_id, self.max_history) for session_id in appended]
+            )
+
+def create_session_store(backend: str = None) -> SessionStore:
+    """Create the session store configured by SESSION_STORE"""
+    backend = (backend or Config.SESSION_STORE).lower()
+    if backend == 'memory':
+        return MemorySessionStore()
+    if backend == 'sqlite':
+        return SQLiteSessionStore()
+    raise ValueError(f"Unknown session store backend: {backend}")
@@ -0,0 +1,154 @@
+import logging
+import threading
+from typing import Callable, Dict, Iterator, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class _Broadcast:
+    """Deltas of one upstream stream, replayed to every subscriber"""
+    
+    __slots__ = ('parts', 'finished', 'error', 'followers', 'cond')
+    
+    def __init__(self):
+        self.parts = []
+        self.finished = False
+        self.error = None
+        self.followers = 0
+        self.cond = threading.Condition()
+    
+    def publish(self, part: str):
+        with self.cond:
+            self.parts.append(part)
+            self.cond.notify_all()
+    
+    def finish(self, error: BaseException = None):
+        with self.cond:
+            if not self.finished:
+                self.finished = True
+                self.error = error
+            self.cond.notify_all()
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into one upstream call.
+    
+    The first caller for a key runs the call; callers arriving while it is
+    in flight wait and receive the same result or exception. Streams fan
+    out the same way: every follower replays the deltas received so far,
+    then follows the live stream.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+    
+    def do(self, key: str, fn: Callable[[], T]) -> Tuple[T, bool]:
+        """Run fn once per concurrent key; returns (result, shared)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+    
+    def stream(self, key: str, factory: Callable[[], Iterator[str]]) -> Iterator[str]:
+        """Iterate factory() once per concurrent key, fanning deltas out to every caller"""
+        with self._lock:
+            broadcast = self._streams.get(key)
+            if broadcast is None:
+                broadcast = self._streams[key] = _Broadcast()
+                self.leaders += 1
+                return self._lead(key, broadcast, factory)
+            broadcast.followers += 1
+            self.coalesced += 1
+        return self._follow(broadcast)
+    
+    def stats(self) -> Dict[str, int]:
+        """Leader and coalesced-follower counters"""
+        with self._lock:
+            return {
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls) + len(self._streams)
+            }
+    
+    def _lead(self, key: str, broadcast: _Broadcast, factory: Callable[[], Iterator[str]]) -> Iterator[str]:
+        error = None
+        upstream = None
+        try:
+            upstream = factory()
+            for part in upstream:
+                broadcast.publish(part)
+                yield part
+        except GeneratorExit:
+            # The leading client went away; finish the stream for the others
+            with self._lock:
+                followers = broadcast.followers
+                if not followers:
+                    # Nobody else is reading: stop upstream and let new callers start afresh
+                    self._streams.pop(key, None)
+            if followers:
+                logger.info(f"Leading stream client disconnected, finishing stream for {followers} followers")
+                try:
+                    for part in upstream:
+                        broadcast.publish(part)
+                except Exception as e:
+                    error = e
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            if upstream is not None and hasattr(upstream, 'close'):
+                upstream.close()
+            with self._lock:
+                if self._streams.get(key) is broadcast:
+                    del self._streams[key]
+            broadcast.finish(error)
+    
+    def _follow(self, broadcast: _Broadcast) -> Iterator[str]:
+        index = 0
+        while True:
+            with broadcast.cond:
+                broadcast.cond.wait_for(lambda: len(broadcast.parts) > index or broadcast.finished)
+                parts = broadcast.parts[index:]
+                finished = broadcast.finished
+                error = broadcast.error
+            index += len(parts)
+            for part in parts:
+                yield part
+            if finished:
+                if error is not None:
+                    raise error
+                return
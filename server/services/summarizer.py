@@ -0,0 +1,136 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from config import Config
+from services.message import Message
+
+logger = logging.getLogger(__name__)
+
+SummarizeFn = Callable[[Optional[str], List[Dict[str, Any]]], str]
+
+class _SummaryState:
+    __slots__ = ('summary', 'pending', 'in_flight', 'batch', 'folded', 'covered')
+    
+    def __init__(self):
+        self.summary: Optional[str] = None
+        self.pending: List[Message] = []
+        self.in_flight: Optional[object] = None
+        self.batch: List[Message] = []
+        # seq of the newest message queued, and of the newest the summary accounts for
+        self.folded = 0
+        self.covered = 0
+
+class ConversationSummarizer:
+    """Folds turns evicted from a session's history into a running summary.
+    
+    Evicted messages are batched per session and summarized on a background
+    executor, off the request path. At most one job runs per session at a
+    time so updates apply in order. Until a job finishes, its messages and
+    those still waiting for a full batch are the session's backlog, which
+    callers send to the model as plain turns so nothing goes missing from
+    the prompt in between.
+    """
+    
+    def __init__(self, summarize_fn: SummarizeFn, batch_size: int = None, max_workers: int = None,
+                 on_update: Callable[[str, str], None] = None):
+        self.summarize_fn = summarize_fn
+        self.batch_size = batch_size or Config.SUMMARY_BATCH_MESSAGES
+        self.on_update = on_update
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or Config.SUMMARY_WORKERS,
+            thread_name_prefix='summarizer'
+        )
+        self._sessions: Dict[str, _SummaryState] = {}
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._outstanding = 0
+    
+    def get(self, session_id: str) -> Optional[str]:
+        """Current summary for a session, if any"""
+        state = self._sessions.get(session_id)
+        return state.summary if state is not None else None
+    
+    def snapshot(self, session_id: str) -> Tuple[Optional[str], int, List[Message]]:
+        """A session's summary, the seq it covers through, and its backlog oldest first"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                return None, 0, []
+            return state.summary, state.covered, state.batch + state.pending
+    
+    def restore(self, session_id: str, summary: Optional[str], covered: int = 0):
+        """Seed a session's summary, e.g. after loading it from a store
+        
+        covered is the seq of the newest message the summary accounts for.
+        """
+        if not summary and not covered:
+            return
+        with self._lock:
+            state = self._sessions.setdefault(session_id, _SummaryState())
+            if summary:
+                state.summary = summary
+            state.covered = max(state.covered, covered)
+            state.folded = max(state.folded, covered)
+    
+    def fold(self, session_id: str, records: Sequence[Message]):
+        """Queue messages to be folded into the session summary
+        
+        Messages already queued are skipped, so callers may pass any records
+        that have left the prompt window.
+        """
+        with self._lock:
+            state = self._sessions.setdefault(session_id, _SummaryState())
+            records = [record for record in records if record.seq > state.folded]
+            if not records:
+                return
+            state.pending.extend(records)
+            state.folded = records[-1].seq
+            self._maybe_submit(session_id, state)
+    
+    def discard(self, session_id: str):
+        """Forget a session; an in-flight job for it is ignored on completion"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+    
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until no summarization jobs are outstanding"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._outstanding == 0, timeout=timeout)
+    
+    def shutdown(self):
+        """Stop accepting work and release executor threads"""
+        self.executor.shutdown(wait=False)
+    
+    def _maybe_submit(self, session_id: str, state: _SummaryState):
+        # Caller holds self._lock
+        if state.in_flight is not None or len(state.pending) < self.batch_size:
+            return
+        
+        state.batch, state.pending = state.pending, []
+        token = state.in_flight = object()
+        self._outstanding += 1
+        self.executor.submit(self._run, session_id, token, state.summary, state.batch)
+    
+    def _run(self, session_id: str, token: object, previous: Optional[str], batch: List[Message]):
+        summary = None
+        try:
+            summary = self.summarize_fn(previous, [record.to_context() for record in batch])
+        except Exception as e:
+            logger.error(f"Error summarizing session {session_id}: {str(e)}")
+        
+        with self._lock:
+            self._outstanding -= 1
+            state = self._sessions.get(session_id)
+            if state is not None and state.in_flight is token:
+                state.in_flight, state.batch = None, []
+                # Counted as covered even when summarizing failed, so a broken
+                # summarizer cannot grow the backlog without bound
+                state.covered = batch[-1].seq
+                if summary:
+                    state.summary = summary
+                    # Persist under the lock so stored updates keep their order
+                    if self.on_update is not None:
+                        self.on_update(session_id, summary)
+                self._maybe_submit(session_id, state)
+            self._idle.notify_all()
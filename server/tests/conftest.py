@@ -0,0 +1,5 @@
+import os
+
+# Log to the console only; importing app configures logging, and tests
+# must not write to the server's logs/app.log
+os.environ['LOG_FILE'] = ''
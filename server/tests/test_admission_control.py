@@ -0,0 +1,203 @@
+import threading
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+from app import create_app
+from config import Config
+from services.admission_control import (
+    AdmissionController, AdmissionRejected, ConcurrencyLimiter, CostExceedsBurst, TokenBucketLimiter
+)
+from services.bedrock_service import BedrockService
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+class StubBedrock(BedrockService):
+    def __init__(self):
+        with patch('services.bedrock_service.boto3') as mock_boto3:
+            mock_boto3.client.return_value = MagicMock()
+            super().__init__()
+    
+    def generate_from_messages(self, messages, system=None, priority=None, prompt_tokens=None):
+        return "ok"
+
+def tight_controller(client_rps=0, session_rps=0, max_in_flight=0, max_queue=0):
+    return AdmissionController(
+        client_limiter=TokenBucketLimiter(client_rps, 2, 100),
+        session_limiter=TokenBucketLimiter(session_rps, 1, 100),
+        concurrency=ConcurrencyLimiter(max_in_flight, max_queue, 0.05),
+        retry_after=2
+    )
+
+def test_token_bucket_refills_at_rate():
+    """Test that a bucket allows its burst, then reports the wait for the next token"""
+    clock = FakeClock()
+    limiter = TokenBucketLimiter(rate=2, burst=3, max_keys=10, clock=clock)
+    
+    assert [limiter.acquire('a') for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire('a') == pytest.approx(0.5)
+    assert limiter.acquire('b') == 0
+    
+    clock.now = 0.5
+    assert limiter.acquire('a') == 0
+    assert limiter.acquire('a') == pytest.approx(0.5)
+
+def test_token_bucket_evicts_least_recent_key():
+    """Test that the number of tracked keys stays within max_keys"""
+    limiter = TokenBucketLimiter(rate=1, burst=1, max_keys=2, clock=FakeClock())
+    
+    limiter.acquire('a')
+    limiter.acquire('b')
+    limiter.acquire('a')
+    limiter.acquire('c')
+    
+    assert len(limiter) == 2
+    assert limiter.acquire('a') > 0
+    assert limiter.acquire('b') == 0
+
+def test_concurrency_limiter_queues_then_sheds():
+    """Test that requests wait for a slot up to the queue bound and are shed beyond it"""
+    limiter = ConcurrencyLimiter(max_in_flight=1, max_queue=1, queue_timeout=5)
+    assert limiter.acquire()
+    
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(limiter.acquire()))
+    waiter.start()
+    while limiter.queued == 0:
+        pass
+    
+    assert not limiter.acquire()
+    limiter.release()
+    waiter.join()
+    assert results == [True]
+    assert limiter.in_flight == 1
+
+def test_admission_releases_slot_on_error():
+    """Test that the admit block gives its slot back when the turn fails"""
+    admission = tight_controller(max_in_flight=1)
+    
+    with pytest.raises(ValueError):
+        with admission.admit('client', 's1'):
+            raise ValueError()
+    
+    assert admission.stats()['in_flight'] == 0
+    with pytest.raises(AdmissionRejected) as rejected:
+        with admission.admit('client'):
+            admission.acquire_slot()
+    assert rejected.value.reason == 'capacity'
+    assert rejected.value.retry_after == 2
+
+def test_chat_returns_429_with_retry_after():
+    """Test that a session over its rate gets 429 and a Retry-After header"""
+    app = create_app(bedrock_service=StubBedrock(), admission=tight_controller(session_rps=0.25))
+    client = app.test_client()
+    
+    first = client.post('/api/chat', json={'message': 'hi', 'session_id': 's1'})
+    second = client.post('/api/chat', json={'message': 'hi', 'session_id': 's1'})
+    other = client.post('/api/chat', json={'message': 'hi', 'session_id': 's2'})
+    
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert second.headers['Retry-After'] == '4'
+    assert second.get_json()['retry_after'] == 4
+    assert other.status_code == 200
+
+def test_admission_stats_endpoint():
+    """Test that the stats endpoint reports in-flight turns and tracked keys"""
+    app = create_app(bedrock_service=StubBedrock(), admission=tight_controller(client_rps=10, session_rps=10))
+    client = app.test_client()
+    client.post('/api/chat', json={'message': 'hi', 'session_id': 's1'}, headers={'X-API-Key': 'key-1'})
+    
+    stats = client.get('/api/admission/stats').get_json()
+    
+    assert stats['in_flight'] == 0
+    assert stats['tracked_clients'] == 1
+    assert stats['tracked_sessions'] == 1
+
+def test_unknown_api_keys_share_the_address_bucket(monkeypatch):
+    """Test that only configured API keys get a client bucket of their own"""
+    monkeypatch.setattr(Config, 'API_KEYS', frozenset({'known'}))
+    app = create_app(bedrock_service=StubBedrock(), admission=tight_controller(client_rps=0.5))
+    client = app.test_client()
+    
+    def chat(session_id, api_key):
+        return client.post('/api/chat', json={'message': 'hi', 'session_id': session_id},
+                           headers={'X-API-Key': api_key}).status_code
+    
+    assert [chat('s1', 'made-up-1'), chat('s2', 'made-up-2'), chat('s3', 'made-up-3')] == [200, 200, 429]
+    assert chat('s4', 'known') == 200
+
+def test_session_rejection_refunds_client_tokens():
+    """Test that a request refused by its session bucket does not spend the client's tokens"""
+    admission = tight_controller(client_rps=0.5, session_rps=0.5)
+    admission.check_rate('client', 's1')
+    
+    for _ in range(3):
+        with pytest.raises(AdmissionRejected) as rejected:
+            admission.check_rate('client', 's1')
+        assert rejected.value.reason == 'session'
+    admission.check_rate('client', 's2')
+
+def test_cost_above_burst_is_rejected_not_capped():
+    """Test that a cost no bucket can hold is refused outright and charges nothing"""
+    admission = tight_controller(client_rps=1, session_rps=1)
+    
+    with pytest.raises(CostExceedsBurst) as rejected:
+        admission.check_rates('client', 2, {'s1': 2})
+    assert rejected.value.reason == 'session'
+    admission.check_rates('client', 2, {'s1': 1, 's2': 1})
+
+def test_batch_charges_sessions_and_takes_a_slot_per_call():
+    """Test that a batch is charged per session and each Bedrock call takes a concurrency slot"""
+    admission = tight_controller(client_rps=10, session_rps=1, max_in_flight=1)
+    app = create_app(bedrock_service=StubBedrock(), admission=admission)
+    client = app.test_client()
+    
+    too_large = client.post('/api/chat/batch', json={'items': [{'session_id': 's1', 'message': 'hi'}] * 2})
+    first = client.post('/api/chat/batch', json={'items': [{'session_id': 's1', 'message': 'hi'}]})
+    second = client.post('/api/chat/batch', json={'items': [{'session_id': 's1', 'message': 'hi'}]})
+    
+    assert too_large.status_code == 413
+    assert first.status_code == 200
+    assert second.status_code == 429
+    
+    admission.acquire_slot()
+    try:
+        busy = client.post('/api/chat/batch', json={'items': [{'session_id': 's2', 'message': 'hi'}]})
+    finally:
+        admission.release_slot()
+    assert busy.status_code == 200
+    assert busy.get_json()['results'][0]['status'] == 429
+    assert busy.get_json()['results'][0]['retry_after'] == 2
+    assert admission.stats()['in_flight'] == 0
+
+def test_batch_calls_stay_under_the_in_flight_cap():
+    """Test that a batch fanned out over many sessions never exceeds the global in-flight cap"""
+    class SlowBedrock(StubBedrock):
+        lock = threading.Lock()
+        active = max_active = 0
+        
+        def generate_from_messages(self, messages, system=None, priority=None, prompt_tokens=None):
+            with self.lock:
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            time.sleep(0.02)
+            with self.lock:
+                self.active -= 1
+            return "ok"
+    
+    bedrock = SlowBedrock()
+    admission = tight_controller(max_in_flight=2, max_queue=8)
+    admission.concurrency.queue_timeout = 5
+    app = create_app(bedrock_service=bedrock, admission=admission)
+    
+    response = app.test_client().post('/api/chat/batch', json={
+        'items': [{'session_id': f's{index}', 'message': 'hi'} for index in range(8)]
+    })
+    
+    assert response.get_json()['succeeded'] == 8
+    assert bedrock.max_active == 2
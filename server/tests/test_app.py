@@ -1,10 +1,24 @@
 import pytest
 import json
+from unittest.mock import patch
 from app import create_app
+from services.conversation_manager import ConversationManager
 
 @pytest.fixture
-def app():
-    app = create_app()
+def bedrock():
+    """Stubbed Bedrock service used by the app under test"""
+    with patch('app.BedrockService') as mock_service_class:
+        service = mock_service_class.return_value
+        service.generate_from_messages.return_value = 'Hello!'
+        yield service
+
+@pytest.fixture
+def manager():
+    return ConversationManager()
+
+@pytest.fixture
+def app(bedrock, manager):
+    app = create_app(conversation_manager=manager)
     app.config['TESTING'] = True
     return app
 
@@ -68,4 +82,71 @@ def test_get_sessions(client):
     assert response.status_code == 200
     data = json.loads(response.data)
     assert 'sessions' in data
-    assert 'count' in data
\ No newline at end of file
+    assert 'count' in data
+
+def test_chat_stream_endpoint(client, bedrock):
+    """Test streaming chat endpoint with a stubbed Bedrock stream"""
+    bedrock.stream_from_messages.return_value = iter(['Hello', ' there'])
+    
+    response = client.post('/api/chat/stream',
+                           json={'message': 'Hi', 'session_id': 'stream-session'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    
+    body = response.get_data(as_text=True)
+    assert 'event: delta' in body
+    assert 'event: done' in body
+    assert '"message": "Hello there"' in body
+    
+    # The assembled reply is committed once the stream finishes
+    history = client.get('/api/conversation/stream-session').get_json()
+    assert [m['role'] for m in history['messages']] == ['user', 'assistant']
+    assert history['messages'][1]['content'] == 'Hello there'
+
+def test_chat_stream_endpoint_error(client, bedrock):
+    """Test that a failed stream emits an error event and commits no reply"""
+    def failing_stream(messages, system=None, priority=None, prompt_tokens=None):
+        yield 'Partial'
+        raise Exception('Failed to stream AI response: boom')
+    
+    bedrock.stream_from_messages.side_effect = failing_stream
+    
+    response = client.post('/api/chat/stream',
+                           json={'message': 'Hi', 'session_id': 'stream-error'})
+    body = response.get_data(as_text=True)
+    assert 'event: error' in body
+    assert 'event: done' not in body
+    
+    history = client.get('/api/conversation/stream-error').get_json()
+    assert [m['role'] for m in history['messages']] == ['user']
+
+def test_conversation_history_etag_and_delta(client, manager):
+    """Test that unchanged history returns 304 and since returns only new messages"""
+    manager.add_message('etag-session', 'user', 'Hello')
+    manager.add_message('etag-session', 'assistant', 'Hi')
+    
+    response = client.get('/api/conversation/etag-session')
+    etag = response.headers['ETag']
+    data = response.get_json()
+    assert [m['seq'] for m in data['messages']] == [1, 2]
+    assert data['last_seq'] == 2
+    
+    cached = client.get('/api/conversation/etag-session', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.data == b''
+    
+    # The ETag covers the page too, so another page of the same version is not a 304
+    paged = client.get('/api/conversation/etag-session?limit=1', headers={'If-None-Match': etag})
+    assert paged.status_code == 200
+    assert [m['seq'] for m in paged.get_json()['messages']] == [2]
+    assert client.get('/api/conversation/etag-session?limit=1',
+                      headers={'If-None-Match': paged.headers['ETag']}).status_code == 304
+    
+    manager.add_message('etag-session', 'user', 'More')
+    delta = client.get('/api/conversation/etag-session?since=2', headers={'If-None-Match': etag})
+    assert delta.status_code == 200
+    assert delta.headers['ETag'] != etag
+    assert [m['content'] for m in delta.get_json()['messages']] == ['More']
+    
+    assert client.get('/api/conversation/etag-session?since=abc').status_code == 400
+    assert client.get('/api/conversation/etag-session?since=1&before=3').status_code == 400
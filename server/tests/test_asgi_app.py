@@ -0,0 +1,156 @@
+import asyncio
+import json
+from asgi_app import create_asgi_app
+from services.conversation_manager import ConversationManager
+
+class StubAsyncBedrock:
+    """Async Bedrock stand-in that records peak concurrency"""
+    
+    def __init__(self, latency=0.0, reply='Hi there!'):
+        self.latency = latency
+        self.reply = reply
+        self.in_flight = 0
+        self.peak = 0
+    
+    async def generate_from_messages(self, messages, system=None, priority=None, prompt_tokens=None):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            return self.reply
+        finally:
+            self.in_flight -= 1
+    
+    def shutdown(self):
+        pass
+
+async def call(app, method, path, payload=None, content_type=b'application/json'):
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    scope = {'type': 'http', 'method': method, 'path': path,
+             'headers': [(b'content-type', content_type)]}
+    sent = []
+    
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+    
+    async def send(message):
+        sent.append(message)
+    
+    await app(scope, receive, send)
+    data = sent[1]['body']
+    return sent[0]['status'], json.loads(data) if data else None
+
+def make_app(**kwargs):
+    bedrock = kwargs.pop('bedrock', None) or StubAsyncBedrock()
+    return create_asgi_app(bedrock_service=bedrock,
+                           conversation_manager=ConversationManager(), **kwargs), bedrock
+
+def test_health_check():
+    """Test health check endpoint"""
+    app, _ = make_app()
+    status, data = asyncio.run(call(app, 'GET', '/api/health'))
+    assert status == 200
+    assert data['status'] == 'healthy'
+
+def test_chat_records_turn():
+    """Test that a chat request stores both sides of the turn"""
+    app, _ = make_app()
+    
+    async def scenario():
+        status, data = await call(app, 'POST', '/api/chat', {'message': 'Hello', 'session_id': 's1'})
+        assert status == 200
+        assert data['message'] == 'Hi there!'
+        return await call(app, 'GET', '/api/conversation/s1')
+    
+    status, data = asyncio.run(scenario())
+    assert status == 200
+    assert [m['role'] for m in data['messages']] == ['user', 'assistant']
+
+def test_chat_validation_errors():
+    """Test that invalid requests are rejected with 400"""
+    app, _ = make_app()
+    status, data = asyncio.run(call(app, 'POST', '/api/chat', {'message': '   '}))
+    assert status == 400
+    assert 'error' in data
+    
+    status, _ = asyncio.run(call(app, 'POST', '/api/chat', {'message': 'Hi'}, content_type=b'text/plain'))
+    assert status == 400
+
+def test_chat_timeout_returns_504():
+    """Test that a slow Bedrock call is cut off by the request timeout"""
+    app, _ = make_app(bedrock=StubAsyncBedrock(latency=1.0), request_timeout=0.05)
+    status, data = asyncio.run(call(app, 'POST', '/api/chat', {'message': 'Hello'}))
+    assert status == 504
+    assert 'error' in data
+
+def test_timed_out_turn_keeps_its_slot_and_records_the_reply():
+    """Test that a timed out turn holds its concurrency slot until Bedrock answers, then completes"""
+    app, bedrock = make_app(bedrock=StubAsyncBedrock(latency=0.2), request_timeout=0.05, max_concurrency=1)
+    
+    async def scenario():
+        status, data = await call(app, 'POST', '/api/chat', {'message': 'Hello', 'session_id': 's1'})
+        assert status == 504
+        assert data['session_id'] == 's1'
+        assert app.limiter.locked()
+        await asyncio.sleep(0.3)
+        assert not app.limiter.locked()
+        return await call(app, 'GET', '/api/conversation/s1')
+    
+    status, data = asyncio.run(scenario())
+    assert [m['content'] for m in data['messages']] == ['Hello', 'Hi there!']
+
+def test_concurrency_limiter_bounds_in_flight_calls():
+    """Test that the global limiter caps concurrent Bedrock calls"""
+    app, bedrock = make_app(bedrock=StubAsyncBedrock(latency=0.01), max_concurrency=3)
+    
+    async def scenario():
+        return await asyncio.gather(*(
+            call(app, 'POST', '/api/chat', {'message': 'Hello', 'session_id': f's{i}'})
+            for i in range(20)
+        ))
+    
+    results = asyncio.run(scenario())
+    assert all(status == 200 for status, _ in results)
+    assert bedrock.peak == 3
+
+def test_eviction_skips_a_session_with_a_turn_in_flight():
+    """Test that the memory budget cannot drop a session while its Bedrock call runs"""
+    app, _ = make_app(bedrock=StubAsyncBedrock(latency=0.1))
+    manager = app.conversation_manager
+    manager.memory_budget = 1
+    
+    async def scenario():
+        turn = asyncio.ensure_future(call(app, 'POST', '/api/chat', {'message': 'Hello', 'session_id': 's1'}))
+        await asyncio.sleep(0.05)
+        manager.add_message('s2', 'user', 'Evict the others')
+        status, _ = await turn
+        assert status == 200
+        return await call(app, 'GET', '/api/conversation/s1')
+    
+    _, data = asyncio.run(scenario())
+    assert [m['role'] for m in data['messages']] == ['user', 'assistant']
+
+def test_lifespan_shutdown_closes_the_conversation_manager():
+    """Test that server shutdown flushes the session store and stops background work"""
+    app, _ = make_app()
+    closed = []
+    app.conversation_manager.close = lambda: closed.append(True)
+    messages = iter([{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+    sent = []
+    
+    async def receive():
+        return next(messages)
+    
+    async def send(message):
+        sent.append(message['type'])
+    
+    asyncio.run(app({'type': 'lifespan'}, receive, send))
+    
+    assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+    assert closed == [True]
+
+def test_unknown_route_returns_404():
+    """Test that unknown routes return 404"""
+    app, _ = make_app()
+    status, data = asyncio.run(call(app, 'GET', '/api/unknown'))
+    assert status == 404
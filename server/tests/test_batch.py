@@ -0,0 +1,221 @@
+import json
+import threading
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+from app import create_app
+from config import Config
+from services.bedrock_errors import BedrockThrottledError
+from services.batch_processor import BatchError, BatchProcessor
+from services.bedrock_service import BedrockService
+from services.conversation_manager import ConversationManager
+
+class EchoBedrock(BedrockService):
+    """BedrockService whose model echoes the last user message"""
+    
+    def __init__(self):
+        with patch('services.bedrock_service.boto3') as mock_boto3:
+            mock_boto3.client.return_value = MagicMock()
+            super().__init__()
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+    
+    def generate_from_messages(self, messages, system=None, priority=None, prompt_tokens=None):
+        text = json.loads(messages[-1])['content'][0]['text']
+        if text == 'fail':
+            raise BedrockThrottledError("throttled")
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.02)
+        with self.lock:
+            self.active -= 1
+        return f"echo: {text}"
+
+@pytest.fixture
+def bedrock():
+    return EchoBedrock()
+
+@pytest.fixture
+def manager():
+    return ConversationManager()
+
+@pytest.fixture
+def client(bedrock, manager, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'BATCH_DIR', str(tmp_path))
+    monkeypatch.setattr(Config, 'BATCH_WORKERS', 4)
+    app = create_app(bedrock_service=bedrock, conversation_manager=manager)
+    app.config['TESTING'] = True
+    return app.test_client()
+
+def test_batch_runs_items_and_preserves_session_order(client, bedrock, manager):
+    """Test that items fan out concurrently but keep per-session order"""
+    items = []
+    for turn in range(3):
+        for session in range(6):
+            items.append({'session_id': f's{session}', 'message': f'turn {turn}'})
+    
+    response = client.post('/api/chat/batch', json={'items': items})
+    
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['succeeded'] == len(items)
+    assert [result['index'] for result in data['results']] == list(range(len(items)))
+    assert all(result['message'] == f"echo: {item['message']}" for result, item in zip(data['results'], items))
+    assert 1 < bedrock.max_active <= 4
+    
+    history = manager.get_conversation_history('s3')
+    assert [message['content'] for message in history] == [
+        'turn 0', 'echo: turn 0', 'turn 1', 'echo: turn 1', 'turn 2', 'echo: turn 2'
+    ]
+
+def test_batch_reports_per_item_errors(client):
+    """Test that invalid or failing items get their own error results"""
+    items = [
+        {'session_id': 'a', 'message': 'hello'},
+        {'session_id': 'b', 'message': ''},
+        {'session_id': 'c', 'message': 'fail'},
+        'not an object'
+    ]
+    
+    response = client.post('/api/chat/batch', json={'items': items})
+    
+    data = json.loads(response.data)
+    assert response.status_code == 200
+    assert [result['status'] for result in data['results']] == [200, 400, 429, 400]
+    assert data['succeeded'] == 1
+    assert data['failed'] == 3
+
+def test_batch_validates_payload(client, monkeypatch):
+    """Test that malformed batch requests are rejected"""
+    monkeypatch.setattr(Config, 'BATCH_MAX_ITEMS', 2)
+    
+    assert client.post('/api/chat/batch', json={'items': []}).status_code == 400
+    assert client.post('/api/chat/batch', json={'items': [{'message': 'a'}] * 3}).status_code == 400
+    assert client.post('/api/chat/batch', json={'items': [{'message': 'a'}], 'mode': 'later'}).status_code == 400
+
+def test_offline_batch_export_and_ingest(client, manager, tmp_path):
+    """Test the Bedrock batch inference round trip"""
+    manager.add_message('a', 'user', 'earlier')
+    manager.add_message('a', 'assistant', 'earlier reply')
+    items = [
+        {'session_id': 'a', 'message': 'first'},
+        {'session_id': 'b', 'message': 'second'},
+        {'session_id': 'a', 'message': 'too soon'}
+    ]
+    
+    response = client.post('/api/chat/batch', json={'items': items, 'mode': 'offline'})
+    
+    assert response.status_code == 202
+    exported = json.loads(response.data)
+    assert exported['records'] == 2
+    assert [result['status'] for result in exported['results']] == [202, 202, 400]
+    with open(exported['input_path']) as f:
+        records = [json.loads(line) for line in f]
+    texts = [message['content'][0]['text'] for message in records[0]['modelInput']['messages']]
+    assert texts == ['earlier', 'earlier reply', 'first']
+    # Nothing is committed until the output is ingested
+    assert len(manager.get_conversation_history('a')) == 2
+    
+    batch_id = exported['batch_id']
+    assert client.post(f'/api/chat/batch/{batch_id}/ingest').status_code == 404
+    
+    with open(exported['output_path'], 'w') as f:
+        f.write(json.dumps({
+            'recordId': records[0]['recordId'],
+            'modelInput': records[0]['modelInput'],
+            'modelOutput': {'output': {'message': {'role': 'assistant', 'content': [{'text': 'reply a'}]}}}
+        }) + '\n')
+        f.write(json.dumps({
+            'recordId': records[1]['recordId'],
+            'modelInput': records[1]['modelInput'],
+            'error': {'errorCode': 400, 'errorMessage': 'bad input'}
+        }) + '\n')
+    
+    response = client.post(f'/api/chat/batch/{batch_id}/ingest')
+    
+    assert response.status_code == 200
+    ingested = json.loads(response.data)
+    assert ingested['ingested'] == 1
+    assert ingested['failed'] == 1
+    assert [message['content'] for message in manager.get_conversation_history('a')][-2:] == ['first', 'reply a']
+    assert manager.get_conversation_history('b') == []
+    assert client.post(f'/api/chat/batch/{batch_id}/ingest').status_code == 409
+
+def test_export_has_no_side_effects_and_ingest_reports_malformed_lines(client, manager):
+    """Test that exporting leaves the context stats alone and a bad output line fails only itself"""
+    response = client.post('/api/chat/batch', json={'items': [{'session_id': 'a', 'message': 'hi'}], 'mode': 'offline'})
+    exported = json.loads(response.data)
+    assert manager.context_builder.stats()['turns'] == 0
+    
+    with open(exported['input_path']) as f:
+        record = json.loads(f.readline())
+    with open(exported['output_path'], 'w') as f:
+        f.write('{"recordId": "R00000\n')
+        f.write(json.dumps({
+            'recordId': record['recordId'],
+            'modelOutput': {'output': {'message': {'role': 'assistant', 'content': [{'text': 'reply'}]}}}
+        }) + '\n')
+    
+    response = client.post(f"/api/chat/batch/{exported['batch_id']}/ingest")
+    
+    assert response.status_code == 200
+    ingested = json.loads(response.data)
+    assert ingested['ingested'] == 1
+    assert ingested['errors'][0]['line'] == 1
+    assert ingested['errors'][0]['error'].startswith('Malformed output line')
+    assert [message['content'] for message in manager.get_conversation_history('a')] == ['hi', 'reply']
+
+def test_ingest_unknown_batch(client):
+    """Test that unknown or malformed batch ids are not found"""
+    assert client.post('/api/chat/batch/0123456789abcdef0123456789abcdef/ingest').status_code == 404
+    assert client.post('/api/chat/batch/..%2F..%2Fetc/ingest').status_code == 404
+
+def test_batch_null_session_id_uses_default_session(client, manager):
+    """Test that a null session_id in a batch item goes to the default session"""
+    response = client.post('/api/chat/batch', json={'items': [{'session_id': None, 'message': 'hello'}]})
+    
+    assert response.status_code == 200
+    assert json.loads(response.data)['results'][0]['session_id'] == 'default'
+    assert client.post('/api/chat', json={'session_id': 'other', 'message': 'hi'}).status_code == 200
+    assert client.get('/api/sessions').status_code == 200
+    assert [message['content'] for message in manager.get_conversation_history('default')] == [
+        'hello', 'echo: hello'
+    ]
+
+def test_concurrent_ingest_applies_batch_once(bedrock, manager, tmp_path):
+    """Test that two concurrent ingests of one batch cannot both apply it"""
+    processor = BatchProcessor(bedrock, manager, max_workers=1, batch_dir=str(tmp_path))
+    exported = processor.export([{'session_id': 'a', 'message': 'first'}])
+    with open(exported['input_path']) as f:
+        record = json.loads(f.readline())
+    with open(exported['output_path'], 'w') as f:
+        f.write(json.dumps({
+            'recordId': record['recordId'],
+            'modelOutput': {'output': {'message': {'role': 'assistant', 'content': [{'text': 'reply'}]}}}
+        }) + '\n')
+    add_message = manager.add_message
+    
+    def slow_add_message(*args, **kwargs):
+        time.sleep(0.05)
+        return add_message(*args, **kwargs)
+    
+    outcomes = []
+    
+    def ingest():
+        try:
+            outcomes.append(processor.ingest(exported['batch_id'])['ingested'])
+        except BatchError as e:
+            outcomes.append(e.status_code)
+    
+    with patch.object(manager, 'add_message', side_effect=slow_add_message):
+        threads = [threading.Thread(target=ingest) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    processor.shutdown()
+    
+    assert sorted(outcomes) == [1, 409]
+    assert [message['content'] for message in manager.get_conversation_history('a')] == ['first', 'reply']
@@ -0,0 +1,147 @@
+import pytest
+import json
+from unittest.mock import patch, MagicMock
+from services.bedrock_service import BedrockService, default_pool_size
+from config import Config
+
+def _chunk(payload):
+    return {'chunk': {'bytes': json.dumps(payload).encode('utf-8')}}
+
+def _delta(text):
+    return _chunk({'contentBlockDelta': {'delta': {'text': text}, 'contentBlockIndex': 0}})
+
+class EventStream:
+    """Stand-in for botocore's EventStream that records whether it was closed"""
+    
+    def __init__(self, events):
+        self.events = iter(events)
+        self.closed = False
+    
+    def __iter__(self):
+        return self.events
+    
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def service():
+    with patch('services.bedrock_service.boto3') as mock_boto3:
+        mock_boto3.client.return_value = MagicMock()
+        yield BedrockService()
+
+def test_stream_response_yields_deltas(service):
+    """Test that stream_response yields text deltas in order"""
+    events = EventStream([
+        _chunk({'messageStart': {'role': 'assistant'}}),
+        _delta('Hello'),
+        _delta(', world'),
+        _chunk({'messageStop': {'stopReason': 'end_turn'}}),
+        _chunk({'metadata': {'usage': {'inputTokens': 5, 'outputTokens': 3}}})
+    ])
+    service.client.invoke_model_with_response_stream.return_value = {'body': events}
+    
+    deltas = list(service.stream_response('Hi', [{'role': 'user', 'content': 'Hi'}]))
+    
+    assert deltas == ['Hello', ', world']
+    assert events.closed
+    call_kwargs = service.client.invoke_model_with_response_stream.call_args.kwargs
+    assert call_kwargs['modelId'] == service.model_id
+    body = json.loads(call_kwargs['body'])
+    assert body['messages'][-1] == {'role': 'user', 'content': [{'text': 'Hi'}]}
+
+def test_stream_response_error_event(service):
+    """Test that an exception event in the stream is raised"""
+    events = EventStream([
+        _delta('Partial'),
+        {'throttlingException': {'message': 'Too many requests'}}
+    ])
+    service.client.invoke_model_with_response_stream.return_value = {'body': events}
+    
+    stream = service.stream_response('Hi')
+    assert next(stream) == 'Partial'
+    with pytest.raises(Exception) as exc_info:
+        next(stream)
+    assert 'throttlingException' in str(exc_info.value)
+    assert events.closed
+
+def test_stream_closed_early_closes_event_stream(service):
+    """Test that abandoning a stream mid-response closes the Bedrock event stream"""
+    events = EventStream([_delta('Hello'), _delta(', world')])
+    service.client.invoke_model_with_response_stream.return_value = {'body': events}
+    
+    stream = service.stream_response('Hi')
+    assert next(stream) == 'Hello'
+    stream.close()
+    
+    assert events.closed
+
+def test_generate_response_reads_body(service):
+    """Test that generate_response joins the returned content blocks"""
+    body = MagicMock()
+    body.read.return_value = json.dumps({
+        'output': {'message': {'content': [{'text': 'Hi there!'}]}}
+    }).encode('utf-8')
+    service.client.invoke_model.return_value = {'body': body}
+    
+    assert service.generate_response('Hello') == 'Hi there!'
+
+def test_build_request_body_is_valid_json(service):
+    """Test that the assembled body matches the structured payload"""
+    messages = [
+        '{"role": "user", "content": [{"text": "Hello \\"quoted\\""}]}',
+        '{"role": "assistant", "content": [{"text": "Hi"}]}'
+    ]
+    body = json.loads(service.build_request_body(messages))
+    
+    assert body['messages'][0]['content'][0]['text'] == 'Hello "quoted"'
+    assert body['messages'][1]['role'] == 'assistant'
+    assert body['inferenceConfig'] == service.inference_config
+
+def test_generate_response_limits_context(service):
+    """Test that the legacy dict-context path keeps the configured window"""
+    body = MagicMock()
+    body.read.return_value = json.dumps({'output': {'message': {'content': [{'text': 'ok'}]}}}).encode('utf-8')
+    service.client.invoke_model.return_value = {'body': body}
+    context = [{'role': 'user', 'content': f'Message {i}'} for i in range(30)]
+    
+    service.generate_response('Latest', context)
+    
+    sent = json.loads(service.client.invoke_model.call_args.kwargs['body'])
+    assert len(sent['messages']) == Config.BEDROCK_CONTEXT_MESSAGES + 1
+    assert sent['messages'][-1]['content'][0]['text'] == 'Latest'
+
+def test_client_pool_and_timeouts_follow_config(monkeypatch):
+    """Test that the boto3 client gets a pool sized for the app's concurrency and the configured timeouts"""
+    monkeypatch.setattr(Config, 'BEDROCK_MAX_POOL_CONNECTIONS', 0)
+    monkeypatch.setattr(Config, 'ADMISSION_MAX_IN_FLIGHT', 48)
+    monkeypatch.setattr(Config, 'BATCH_WORKERS', 8)
+    monkeypatch.setattr(Config, 'SUMMARIZATION_ENABLED', True)
+    monkeypatch.setattr(Config, 'SUMMARY_WORKERS', 2)
+    monkeypatch.setattr(Config, 'BEDROCK_HEDGE_AFTER', 0)
+    monkeypatch.setattr(Config, 'BEDROCK_CONNECT_TIMEOUT', 2.5)
+    assert default_pool_size() == 50
+    
+    with patch('services.bedrock_service.boto3') as mock_boto3:
+        BedrockService()
+        BedrockService(max_pool_connections=256)
+    
+    first, second = (call.kwargs['config'] for call in mock_boto3.client.call_args_list)
+    assert first.max_pool_connections == 50
+    assert first.connect_timeout == 2.5 and first.read_timeout == Config.BEDROCK_READ_TIMEOUT
+    assert first.retries == {'mode': 'standard', 'max_attempts': 1}
+    assert second.max_pool_connections == 256
+    
+    monkeypatch.setattr(Config, 'BEDROCK_MAX_POOL_CONNECTIONS', 12)
+    assert default_pool_size() == 12
+
+def test_warm_up_sends_one_token_requests(service):
+    """Test that warm-up opens the requested connections and survives failed calls"""
+    service.client.invoke_model.side_effect = [{'body': MagicMock()}, Exception('boom'), {'body': MagicMock()}]
+    
+    elapsed = service.warm_up(connections=3)
+    
+    assert elapsed >= 0
+    assert service.client.invoke_model.call_count == 3
+    body = json.loads(service.client.invoke_model.call_args.kwargs['body'])
+    assert body['inferenceConfig'] == {'maxTokens': 1}
+    assert service.client.invoke_model.call_args.kwargs['modelId'] == service.model_id
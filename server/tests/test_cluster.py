@@ -0,0 +1,176 @@
+import asyncio
+import http.client
+import json
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+from werkzeug.serving import make_server
+from app import create_app
+from cluster import ClusterRouter, WorkerClient
+from config import Config
+from services.admission_control import TokenBucketLimiter
+from services.bedrock_service import BedrockService
+from services.conversation_manager import ConversationManager
+
+class EchoBedrock(BedrockService):
+    """BedrockService whose model echoes the last user message"""
+    
+    def __init__(self):
+        with patch('services.bedrock_service.boto3') as mock_boto3:
+            mock_boto3.client.return_value = MagicMock()
+            super().__init__()
+    
+    def generate_from_messages(self, messages, system=None, priority=None, prompt_tokens=None):
+        return f"echo: {json.loads(messages[-1])['content'][0]['text']}"
+    
+    def stream_from_messages(self, messages, system=None, priority=None, prompt_tokens=None):
+        yield 'echo: '
+        yield json.loads(messages[-1])['content'][0]['text']
+
+@pytest.fixture
+def cluster(monkeypatch):
+    """Two in-process workers behind a router running on its own event loop"""
+    monkeypatch.setattr(Config, 'RATE_LIMIT_CLIENT_RPS', 0)
+    monkeypatch.setattr(Config, 'RATE_LIMIT_SESSION_RPS', 0)
+    managers = {}
+    servers = []
+    for index in range(2):
+        manager = ConversationManager()
+        server = make_server('127.0.0.1', 0, create_app(bedrock_service=EchoBedrock(), conversation_manager=manager),
+                             threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        managers[f'worker-{index}'] = manager
+        servers.append(server)
+    
+    router = ClusterRouter([
+        WorkerClient(f'worker-{index}', '127.0.0.1', server.server_port) for index, server in enumerate(servers)
+    ])
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    port = asyncio.run_coroutine_threadsafe(router.start('127.0.0.1', 0), loop).result(5).sockets[0].getsockname()[1]
+    
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    
+    def call(method, path, payload=None, headers=None):
+        body = json.dumps(payload) if payload is not None else None
+        all_headers = {'Content-Type': 'application/json', **(headers or {})}
+        connection.request(method, path, body=body, headers=all_headers)
+        response = connection.getresponse()
+        data = response.read()
+        return response, json.loads(data) if data else None
+    
+    yield call, router, managers
+    
+    connection.close()
+    asyncio.run_coroutine_threadsafe(router.close(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    for server in servers:
+        server.shutdown()
+
+def test_sessions_stay_on_their_owner(cluster):
+    """Test that every request for a session is served by the worker owning it"""
+    call, router, managers = cluster
+    for i in range(8):
+        session_id = f'session-{i}'
+        response, data = call('POST', '/api/chat', {'message': f'Hello {i}', 'session_id': session_id})
+        assert response.status == 200 and data['message'] == f'echo: Hello {i}'
+        owner = router.owner(session_id).name
+        assert response.getheader('X-Cluster-Worker') == owner
+        
+        response, data = call('GET', f'/api/conversation/{session_id}')
+        assert response.getheader('X-Cluster-Worker') == owner
+        assert [m['content'] for m in data['messages']] == [f'Hello {i}', f'echo: Hello {i}']
+    
+    for name, manager in managers.items():
+        assert all(router.owner(session_id).name == name for session_id in manager.get_active_sessions())
+
+def test_stream_is_relayed_from_the_owner(cluster):
+    """Test that a streamed reply reaches the client intact through the router"""
+    call, router, managers = cluster
+    connection = http.client.HTTPConnection('127.0.0.1', router.server.sockets[0].getsockname()[1], timeout=10)
+    connection.request('POST', '/api/chat/stream', body=json.dumps({'message': 'Hi', 'session_id': 'stream-session'}),
+                       headers={'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    events = response.read().decode('utf-8')
+    connection.close()
+    
+    assert response.getheader('X-Cluster-Worker') == router.owner('stream-session').name
+    assert 'event: delta' in events and 'event: done' in events
+    owner = managers[router.owner('stream-session').name]
+    assert [m['content'] for m in owner.get_conversation_history('stream-session')] == ['Hi', 'echo: Hi']
+
+def test_history_not_modified_passes_through(cluster):
+    """Test that a 304 without a body is relayed and the connection stays usable"""
+    call, router, managers = cluster
+    call('POST', '/api/chat', {'message': 'Hello', 'session_id': 'etag-session'})
+    response, _ = call('GET', '/api/conversation/etag-session')
+    etag = response.getheader('ETag')
+    
+    response, data = call('GET', '/api/conversation/etag-session', headers={'If-None-Match': etag})
+    assert response.status == 304 and data is None
+    response, data = call('GET', '/api/health')
+    assert response.status == 200 and data['status'] == 'healthy'
+
+def test_session_listing_merges_workers(cluster):
+    """Test that session pages span all workers and their cursors chain without gaps"""
+    call, router, managers = cluster
+    session_ids = [f'session-{i:02d}' for i in range(12)]
+    for session_id in session_ids:
+        call('POST', '/api/chat', {'message': 'Hello', 'session_id': session_id})
+    assert all(manager.get_active_sessions() for manager in managers.values())
+    
+    for order, expected in (('id', session_ids), ('activity', session_ids[::-1])):
+        seen = []
+        cursor = None
+        while True:
+            path = f'/api/sessions?order={order}&limit=5' + (f'&cursor={cursor}' if cursor else '')
+            response, data = call('GET', path)
+            assert response.status == 200 and data['count'] == 12
+            seen.extend(data['sessions'])
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        assert seen == expected
+    
+    response, data = call('GET', '/api/sessions?order=sideways')
+    assert response.status == 400
+
+def test_batch_is_split_across_workers(cluster):
+    """Test that batch items run on their sessions' owners and come back in input order"""
+    call, router, managers = cluster
+    items = [{'session_id': f's{i % 4}', 'message': f'turn {i}'} for i in range(8)] + [{'message': ''}]
+    
+    response, data = call('POST', '/api/chat/batch', {'items': items})
+    
+    assert response.status == 200
+    assert [result['index'] for result in data['results']] == list(range(9))
+    assert data['succeeded'] == 8 and data['failed'] == 1
+    assert data['results'][8]['status'] == 400
+    for session in range(4):
+        owner = managers[router.owner(f's{session}').name]
+        assert [m['content'] for m in owner.get_conversation_history(f's{session}')][::2] == [
+            f'turn {session}', f'turn {session + 4}'
+        ]
+    
+    response, data = call('POST', '/api/chat/batch', {'items': items[:2], 'mode': 'offline'})
+    assert response.status == 501
+
+def test_client_rate_limit_is_enforced_once_by_the_router(cluster):
+    """Test that a client's bucket covers all workers rather than being split among them"""
+    call, router, _ = cluster
+    router.client_limiter = TokenBucketLimiter(0.01, 3, 100)
+    
+    statuses = []
+    owners = set()
+    for i in range(4):
+        response, _ = call('POST', '/api/chat', {'message': 'hi', 'session_id': f'client-{i}'})
+        statuses.append(response.status)
+        if response.status == 200:
+            owners.add(response.getheader('X-Cluster-Worker'))
+    
+    assert statuses == [200, 200, 200, 429]
+    assert len(owners) == 2
+    assert int(response.getheader('Retry-After')) >= 1
+    
+    response, data = call('POST', '/api/chat/batch', {'items': [{'message': 'hi'}] * 4})
+    assert response.status == 413
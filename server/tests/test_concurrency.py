@@ -0,0 +1,111 @@
+import pytest
+import threading
+import time
+from datetime import timedelta
+from services.conversation_manager import ConversationManager
+
+THREADS = 16
+TURNS = 25
+
+@pytest.fixture
+def manager():
+    manager = ConversationManager()
+    manager.max_history = THREADS * TURNS * 2
+    return manager
+
+def run_threads(target, count=THREADS):
+    errors = []
+    
+    def wrapper(i):
+        try:
+            target(i)
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=wrapper, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+def test_shared_session_turns_do_not_interleave(manager):
+    """Test that concurrent turns on one session commit in user/assistant pairs"""
+    def worker(i):
+        for n in range(TURNS):
+            with manager.turn('shared'):
+                manager.add_message('shared', 'user', f'{i}-{n}')
+                manager.get_bedrock_messages('shared')
+                time.sleep(0.0001)
+                manager.add_message('shared', 'assistant', f'reply {i}-{n}')
+    
+    run_threads(worker)
+    
+    history = manager.get_conversation_history('shared')
+    assert len(history) == THREADS * TURNS * 2
+    for user, assistant in zip(history[::2], history[1::2]):
+        assert user['role'] == 'user'
+        assert assistant['role'] == 'assistant'
+        assert assistant['content'] == f"reply {user['content']}"
+    assert manager._turn_locks == {}
+
+def test_disjoint_sessions_keep_their_own_messages(manager):
+    """Test that many threads on separate sessions never lose or mix messages"""
+    def worker(i):
+        for n in range(TURNS):
+            manager.add_message(f'session-{i}', 'user', f'{i}-{n}')
+            manager.get_conversation_history(f'session-{i}')
+    
+    run_threads(worker)
+    
+    assert len(manager.get_active_sessions()) == THREADS
+    for i in range(THREADS):
+        history = manager.get_conversation_history(f'session-{i}')
+        assert [m['content'] for m in history] == [f'{i}-{n}' for n in range(TURNS)]
+
+def test_cleanup_races_with_writers_and_readers(manager):
+    """Test that expiry running alongside writers and readers stays consistent"""
+    manager.timeout = timedelta(microseconds=50)
+    stop = threading.Event()
+    
+    def sweeper():
+        while not stop.is_set():
+            manager._cleanup_expired_sessions()
+    
+    sweep_thread = threading.Thread(target=sweeper)
+    sweep_thread.start()
+    try:
+        def worker(i):
+            for n in range(TURNS):
+                session_id = f'session-{(i + n) % 4}'
+                with manager.turn(session_id):
+                    manager.add_message(session_id, 'user', 'Hello')
+                    manager.get_context(session_id)
+                manager.get_active_sessions()
+        
+        run_threads(worker)
+    finally:
+        stop.set()
+        sweep_thread.join()
+    
+    # Every remaining session is tracked by both the data and the expiry index
+    manager.timeout = timedelta(hours=1)
+    assert set(manager.conversations) <= set(manager.session_timestamps)
+
+def test_eviction_races_with_writers_and_readers(manager):
+    """Test that budget eviction running alongside writers on other stripes keeps the LRU map consistent"""
+    manager.memory_budget = 20000
+    
+    def worker(i):
+        for n in range(TURNS):
+            session_id = f'session-{i}-{n % 5}'
+            manager.add_message(session_id, 'user', 'x' * 500)
+            manager.get_context(f'session-{(i + 1) % THREADS}-{n % 5}')
+    
+    run_threads(worker)
+    
+    stats = manager.memory_stats()
+    records = [record for history in list(manager.conversations.values()) for record in history]
+    assert stats['messages'] == len(records)
+    assert stats['bytes'] <= manager.memory_budget
+    assert set(manager.conversations) <= set(manager.session_timestamps)
@@ -0,0 +1,85 @@
+import json
+import time
+from unittest.mock import patch
+from services.context_builder import ContextBuilder
+from services.message import Message
+from utils.tokens import estimate_tokens, MESSAGE_TOKEN_OVERHEAD
+
+def records(*pairs):
+    return [Message(role, content, time.time()) for role, content in pairs]
+
+def texts(window):
+    return [json.loads(m)['content'][0]['text'] for m in window.messages]
+
+def test_estimate_tokens():
+    """Test the local token estimate on short and long words"""
+    assert estimate_tokens('') == 0
+    assert estimate_tokens('Hi there!') == 4
+    assert estimate_tokens('internationalization') == 5
+
+def test_packs_newest_messages_under_budget():
+    """Test that older turns are dropped once the budget is reached"""
+    history = records(('user', 'word ' * 50), ('assistant', 'short'), ('user', 'tiny'))
+    builder = ContextBuilder(token_budget=20, max_messages=10)
+    
+    window = builder.build(history)
+    
+    # The assistant reply would open the window, so it is dropped too
+    assert texts(window) == ['tiny']
+    assert window.tokens == history[2].token_count()
+    assert window.dropped == 2
+
+def test_keeps_unsummarized_turns_past_budget():
+    """Test that turns newer than keep_after stay, opening on their user turn"""
+    history = records(('user', 'word ' * 50), ('assistant', 'word ' * 50), ('user', 'word ' * 50),
+                      ('assistant', 'short'), ('user', 'tiny'))
+    for seq, record in enumerate(history, 1):
+        record.seq = seq
+    builder = ContextBuilder(token_budget=20, max_messages=10)
+    
+    window = builder.build(history, keep_after=3)
+    
+    # seq 4 is unsummarized, so the user turn before it comes along
+    assert texts(window) == ['word ' * 50, 'short', 'tiny']
+    assert window.tokens == sum(record.token_count() for record in history[2:])
+    assert window.dropped == 2
+    assert window.overflow == 2
+
+def test_keeps_many_short_turns():
+    """Test that short turns beyond ten messages still fit a generous budget"""
+    history = records(*[('user' if i % 2 == 0 else 'assistant', f'msg {i}') for i in range(15)])
+    window = ContextBuilder(token_budget=1000, max_messages=20).build(history)
+    
+    assert len(window.messages) == 15
+    assert window.dropped == 0
+
+def test_newest_message_always_included():
+    """Test that an oversized latest message is still sent"""
+    history = records(('user', 'word ' * 500))
+    window = ContextBuilder(token_budget=10, max_messages=10).build(history)
+    
+    assert len(window.messages) == 1
+    assert window.tokens > 10
+
+def test_token_counts_are_memoized():
+    """Test that each message is estimated once across turns"""
+    history = records(('user', 'Hello'), ('assistant', 'Hi'), ('user', 'How are you?'))
+    builder = ContextBuilder(token_budget=1000, max_messages=10)
+    
+    with patch('services.message.estimate_tokens', return_value=1) as mock_estimate:
+        builder.build(history)
+        builder.build(history)
+    
+    assert mock_estimate.call_count == 3
+    assert history[0].token_count() == 1 + MESSAGE_TOKEN_OVERHEAD
+
+def test_stats_report_tokens_per_turn():
+    """Test tokens-sent counters"""
+    builder = ContextBuilder(token_budget=1000, max_messages=10)
+    window = builder.build(records(('user', 'Hello there')))
+    builder.build(records(('user', 'Hello there')))
+    
+    stats = builder.stats()
+    assert stats['turns'] == 2
+    assert stats['tokens_sent'] == 2 * window.tokens
+    assert stats['avg_tokens_per_turn'] == window.tokens
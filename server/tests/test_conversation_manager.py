@@ -1,4 +1,6 @@
 import pytest
+import json
+import time
 from unittest.mock import patch, MagicMock
 from datetime import datetime, timedelta
 from services.conversation_manager import ConversationManager
@@ -164,11 +166,9 @@ def test_cleanup_expired_sessions_with_mixed_sessions(manager):
     """Test cleanup with both expired and active sessions"""
     current_time = datetime.utcnow()
     
-    # Add an active session
+    # Add a session that will expire, then an active one
+    manager.add_message('expired-session', 'user', 'Old message')
     manager.add_message('active-session', 'user', 'Hello')
-    
-    # Add an expired session by manipulating timestamps
-    manager.conversations['expired-session'] = [{'role': 'user', 'content': 'Old message'}]
     manager.session_timestamps['expired-session'] = current_time - timedelta(seconds=manager.timeout.seconds + 100)
     
     # Trigger cleanup
@@ -179,6 +179,45 @@ def test_cleanup_expired_sessions_with_mixed_sessions(manager):
     assert 'expired-session' not in manager.conversations
     assert 'expired-session' not in manager.session_timestamps
 
+def test_session_index_ordered_by_activity(manager):
+    """Test that touching a session moves it to the back of the expiry index"""
+    manager.add_message('session1', 'user', 'Hello')
+    manager.add_message('session2', 'user', 'Hi')
+    manager.add_message('session1', 'user', 'Hello again')
+    
+    assert list(manager.session_timestamps) == ['session2', 'session1']
+
+def test_cleanup_stops_at_first_active_session(manager):
+    """Test that cleanup only inspects sessions at the front of the index"""
+    for i in range(5):
+        manager.add_message(f'session{i}', 'user', 'Hello')
+    
+    old_time = datetime.utcnow() - timedelta(seconds=manager.timeout.seconds + 100)
+    manager.session_timestamps['session0'] = old_time
+    manager.session_timestamps['session1'] = old_time
+    
+    manager._cleanup_expired_sessions()
+    
+    assert list(manager.session_timestamps) == ['session2', 'session3', 'session4']
+    assert set(manager.conversations) == {'session2', 'session3', 'session4'}
+
+def test_background_sweeper_evicts_expired_sessions(manager):
+    """Test that the background sweeper evicts expired sessions"""
+    manager.add_message('test-session', 'user', 'Hello')
+    manager.session_timestamps['test-session'] = datetime.utcnow() - timedelta(seconds=manager.timeout.seconds + 100)
+    
+    manager.start_sweeper(interval=0.01)
+    try:
+        for _ in range(100):
+            if 'test-session' not in manager.conversations:
+                break
+            time.sleep(0.01)
+    finally:
+        manager.stop_sweeper()
+    
+    assert 'test-session' not in manager.conversations
+    assert manager._sweeper is None
+
 def test_clear_conversation_removes_both_dicts(manager):
     """Test that clear_conversation removes from both conversations and session_timestamps"""
     manager.add_message('test-session', 'user', 'Hello')
@@ -236,4 +275,125 @@ def test_context_vs_history_difference(manager):
     
     # Both should have same role and content
     assert history[0]['role'] == context[0]['role']
-    assert history[0]['content'] == context[0]['content']
\ No newline at end of file
+    assert history[0]['content'] == context[0]['content']
+
+def test_ring_buffer_keeps_most_recent_messages(manager):
+    """Test that overflowing the history drops the oldest messages in order"""
+    for i in range(manager.max_history + 5):
+        manager.add_message('test-session', 'user', f'Message {i}')
+    
+    history = manager.get_conversation_history('test-session')
+    assert len(history) == manager.max_history
+    assert history[0]['content'] == 'Message 5'
+    assert history[-1]['content'] == f'Message {manager.max_history + 4}'
+
+def test_messages_stored_as_compact_records(manager):
+    """Test that messages are stored as slotted records with epoch timestamps"""
+    manager.add_message('test-session', 'user', 'Hello')
+    record = manager.conversations['test-session'][0]
+    
+    assert isinstance(record.created_at, float)
+    assert not hasattr(record, '__dict__')
+    assert record.to_dict()['timestamp'] == datetime.utcfromtimestamp(record.created_at).isoformat()
+
+def test_get_bedrock_messages_encodes_each_message_once(manager):
+    """Test that Bedrock fragments are cached on the stored records"""
+    manager.add_message('test-session', 'user', 'Hello')
+    first = manager.get_bedrock_messages('test-session')
+    
+    manager.add_message('test-session', 'assistant', 'Hi there!')
+    manager.add_message('test-session', 'user', 'How are you?')
+    second = manager.get_bedrock_messages('test-session')
+    
+    assert json.loads(second[0]) == {'role': 'user', 'content': [{'text': 'Hello'}]}
+    assert second[0] is first[0]
+    assert len(second) == 3
+
+def test_get_bedrock_messages_window_starts_with_user(manager):
+    """Test that the window is limited and never opens with an assistant turn"""
+    for i in range(3):
+        manager.add_message('test-session', 'user', f'Question {i}')
+        manager.add_message('test-session', 'assistant', f'Answer {i}')
+    manager.add_message('test-session', 'user', 'Last question')
+    
+    window = [json.loads(m) for m in manager.get_bedrock_messages('test-session', limit=4)]
+    
+    assert [m['role'] for m in window] == ['user', 'assistant', 'user']
+    assert window[-1]['content'][0]['text'] == 'Last question'
+
+def test_history_pages_by_sequence_number(manager):
+    """Test backward paging with before and forward delta sync with since"""
+    for i in range(manager.max_history + 5):
+        manager.add_message('test-session', 'user', f'Message {i}')
+    
+    newest = manager.get_history_page('test-session', limit=4)
+    assert [m['seq'] for m in newest.messages] == [22, 23, 24, 25]
+    assert (newest.first_seq, newest.last_seq, newest.message_count) == (6, 25, 20)
+    assert newest.has_more and newest.next_cursor == 22
+    
+    older = manager.get_history_page('test-session', before=newest.next_cursor, limit=4)
+    assert [m['seq'] for m in older.messages] == [18, 19, 20, 21]
+    
+    oldest = manager.get_history_page('test-session', before=8)
+    assert [m['content'] for m in oldest.messages] == ['Message 5', 'Message 6']
+    assert not oldest.has_more and oldest.next_cursor is None
+    
+    delta = manager.get_history_page('test-session', since=23)
+    assert [m['seq'] for m in delta.messages] == [24, 25]
+    assert not delta.has_more and delta.next_cursor == 25
+    
+    caught_up = manager.get_history_page('test-session', since=25)
+    assert caught_up.messages == [] and caught_up.next_cursor == 25
+    
+    # Messages that were evicted are skipped; the gap shows in first_seq
+    behind = manager.get_history_page('test-session', since=2, limit=3)
+    assert [m['seq'] for m in behind.messages] == [6, 7, 8]
+    assert behind.has_more and behind.next_cursor == 8
+
+def test_history_version_and_reset(manager):
+    """Test that the version changes on append and that a restarted session is flagged"""
+    assert manager.get_history_version('test-session') == '0'
+    manager.add_message('test-session', 'user', 'Hello')
+    manager.add_message('test-session', 'assistant', 'Hi')
+    version = manager.get_history_version('test-session')
+    
+    assert manager.get_history_version('test-session') == version
+    assert manager.get_history_page('test-session').version == version
+    
+    manager.clear_conversation('test-session')
+    manager.add_message('test-session', 'user', 'Again')
+    
+    page = manager.get_history_page('test-session', since=2)
+    assert page.reset
+    assert [(m['seq'], m['content']) for m in page.messages] == [(1, 'Again')]
+    assert manager.get_history_version('test-session') != version
+
+def test_memory_totals_track_appends_and_clears(manager):
+    """Test that the running memory totals match the held records"""
+    for i in range(manager.max_history + 5):
+        manager.add_message('session1', 'user', f'Message {i}')
+    manager.add_message('session2', 'user', 'Hello')
+    
+    stats = manager.memory_stats()
+    records = [record for history in manager.conversations.values() for record in history]
+    assert stats['messages'] == len(records) == manager.max_history + 1
+    assert stats['bytes'] == sum(r.record_bytes() for r in records) + 2 * manager._session_overhead
+    
+    manager.clear_conversation('session1')
+    manager.clear_conversation('session2')
+    stats = manager.memory_stats()
+    assert (stats['sessions'], stats['messages'], stats['bytes']) == (0, 0, 0)
+
+def test_memory_budget_drops_least_recent_sessions(manager):
+    """Test that sessions beyond the memory budget are dropped oldest first"""
+    manager.add_message('session0', 'user', 'x' * 1000)
+    manager.memory_budget = manager.memory_stats()['bytes'] * 2 + 500
+    for i in range(1, 4):
+        manager.add_message(f'session{i}', 'user', 'x' * 1000)
+        manager.get_context('session1')  # Keep session1 recently used
+    
+    assert list(manager.conversations) == ['session3', 'session1']
+    assert manager.get_active_sessions() == ['session1', 'session3']
+    assert manager.memory_stats()['dropped_sessions'] == 2
+    assert manager.memory_stats()['bytes'] <= manager.memory_budget
+    assert manager.get_context('session0') == []
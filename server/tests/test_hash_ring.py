@@ -0,0 +1,36 @@
+import pytest
+from collections import Counter
+from utils.hash_ring import HashRing
+
+def test_hash_ring_is_deterministic():
+    """Test that two rings with the same nodes agree on every key, whatever the order"""
+    first = HashRing(['a', 'b', 'c'])
+    second = HashRing(['c', 'a', 'b'])
+    keys = [f'session-{i}' for i in range(1000)]
+    assert [first.node_for(key) for key in keys] == [second.node_for(key) for key in keys]
+
+def test_hash_ring_spreads_keys_evenly():
+    """Test that virtual nodes keep each node's share of keys near 1/n"""
+    ring = HashRing([f'worker-{i}' for i in range(4)])
+    counts = Counter(ring.node_for(f'session-{i}') for i in range(20000))
+    assert set(counts) == set(ring.nodes)
+    assert max(counts.values()) < 1.25 * 20000 / 4
+
+def test_hash_ring_moves_few_keys_when_a_node_joins():
+    """Test that adding a node only moves keys to the new node"""
+    ring = HashRing([f'worker-{i}' for i in range(4)])
+    keys = [f'session-{i}' for i in range(20000)]
+    before = {key: ring.node_for(key) for key in keys}
+    
+    ring.add('worker-4')
+    moved = [key for key in keys if ring.node_for(key) != before[key]]
+    assert all(ring.node_for(key) == 'worker-4' for key in moved)
+    assert len(moved) < 0.3 * len(keys)
+    
+    ring.remove('worker-4')
+    assert all(ring.node_for(key) == before[key] for key in keys)
+
+def test_empty_hash_ring_raises():
+    """Test that looking up a key with no nodes fails clearly"""
+    with pytest.raises(LookupError):
+        HashRing().node_for('session')
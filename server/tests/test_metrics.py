@@ -0,0 +1,106 @@
+import io
+import json
+import threading
+from unittest.mock import patch, MagicMock
+from app import create_app
+from services.bedrock_service import BedrockService, BEDROCK_TOKENS, encode_message
+from services.conversation_manager import ConversationManager
+from services.resilience import ResilientInvoker
+from utils.metrics import SHARDS, MetricsRegistry
+
+def test_counter_sums_thread_shards():
+    """Test that increments from many threads are all counted"""
+    counter = MetricsRegistry().counter('events_total', 'Events', ('kind',))
+    
+    def work():
+        for _ in range(1000):
+            counter.inc(('a',))
+    
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc(('b',), 5)
+    
+    assert counter.value(('a',)) == 8000
+    assert counter.value(('b',)) == 5
+
+def test_short_lived_threads_share_a_fixed_pool_of_shards():
+    """Test that a thread per request does not grow the shard count"""
+    histogram = MetricsRegistry().histogram('latency_seconds', 'Latency', ('route',))
+    
+    for _ in range(100):
+        thread = threading.Thread(target=histogram.observe, args=(0.01, ('/a',)))
+        thread.start()
+        thread.join()
+    
+    assert len(histogram._shards) == SHARDS
+    assert histogram.count(('/a',)) == 100
+
+def test_histogram_render():
+    """Test the text exposition of a histogram"""
+    registry = MetricsRegistry()
+    histogram = registry.histogram('latency_seconds', 'Latency', ('route',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, ('/a',))
+    histogram.observe(0.5, ('/a',))
+    histogram.observe(5.0, ('/a',))
+    
+    text = registry.render()
+    
+    assert '# TYPE latency_seconds histogram' in text
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in text
+    assert 'latency_seconds_sum{route="/a"} 5.55' in text
+    assert 'latency_seconds_count{route="/a"} 3' in text
+    assert histogram.count(('/a',)) == 3
+
+def test_collectors_and_label_escaping():
+    """Test scrape-time collectors and label value escaping"""
+    registry = MetricsRegistry()
+    registry.register_collector('test', lambda: [('queue_depth', 'Depth', 'gauge', [({'name': 'a"b'}, 3)])])
+    
+    assert 'queue_depth{name="a\\"b"} 3' in registry.render()
+
+def test_metrics_endpoint_reports_routes_and_sessions():
+    """Test that /metrics exposes route latency and session gauges"""
+    bedrock = MagicMock()
+    bedrock.generate_from_messages.return_value = 'Hi!'
+    bedrock.response_cache = None
+    bedrock.single_flight = None
+    bedrock.resilience.status.return_value = {'model-a': 'open'}
+    app = create_app(bedrock_service=bedrock, conversation_manager=ConversationManager())
+    client = app.test_client()
+    
+    client.post('/api/chat', json={'message': 'Hello', 'session_id': 'metrics-session'})
+    client.get('/api/conversation/metrics-session')
+    response = client.get('/metrics')
+    
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    text = response.get_data(as_text=True)
+    assert 'http_requests_total{method="POST",route="/api/chat",status="200"}' in text
+    assert 'route="/api/conversation/<session_id>"' in text
+    assert 'metrics-session' not in text
+    assert 'chat_active_sessions 1' in text
+    assert 'chat_session_memory_bytes_per_session' in text
+    assert 'bedrock_circuit_open{model="model-a"} 1' in text
+
+def test_bedrock_usage_counted():
+    """Test that tokens in and out are counted from the response usage"""
+    with patch('services.bedrock_service.boto3') as mock_boto3:
+        mock_boto3.client.return_value = MagicMock()
+        service = BedrockService()
+    service.resilience = ResilientInvoker(fallback_model_id='', max_retries=0, hedge_after=0)
+    service.single_flight = None
+    payload = {'output': {'message': {'content': [{'text': 'Hello!'}]}}, 'usage': {'inputTokens': 12, 'outputTokens': 3}}
+    service.client.invoke_model.return_value = {'body': io.BytesIO(json.dumps(payload).encode('utf-8'))}
+    model_id = service.router.tiers[0]
+    before_in = BEDROCK_TOKENS.value((model_id, 'input'))
+    before_out = BEDROCK_TOKENS.value((model_id, 'output'))
+    
+    service.generate_from_messages([encode_message('user', 'Hi')])
+    
+    assert BEDROCK_TOKENS.value((model_id, 'input')) - before_in == 12
+    assert BEDROCK_TOKENS.value((model_id, 'output')) - before_out == 3
@@ -0,0 +1,139 @@
+import io
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+from botocore.exceptions import ClientError
+from services.bedrock_errors import BedrockRequestError
+from services.bedrock_service import BedrockService
+from services.model_router import ModelRouter
+from services.response_cache import ResponseCache
+from services.resilience import ResilientInvoker
+
+TIERS = ['small', 'medium', 'large']
+
+def _router(**kwargs):
+    kwargs.setdefault('tiers', TIERS)
+    kwargs.setdefault('tier_max_tokens', [100, 1000])
+    kwargs.setdefault('max_error_rate', 0.5)
+    kwargs.setdefault('max_latency', 0)
+    return ModelRouter(**kwargs)
+
+def _client_error(code):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'InvokeModel')
+
+def _ok_response(text='Hello!'):
+    payload = {'output': {'message': {'content': [{'text': text}]}}}
+    return {'body': io.BytesIO(json.dumps(payload).encode('utf-8'))}
+
+@pytest.fixture
+def service():
+    with patch('services.bedrock_service.boto3') as mock_boto3:
+        mock_boto3.client.return_value = MagicMock()
+        service = BedrockService()
+    service.resilience = ResilientInvoker(fallback_model_id='', max_retries=2, hedge_after=0, sleep=lambda delay: None)
+    service.router = _router(available=service.resilience.available)
+    return service
+
+def test_routes_by_prompt_size():
+    """Test that short prompts go to the smallest tier and long ones to larger tiers"""
+    router = _router()
+    
+    assert router.route(50)[0] == 'small'
+    assert router.route(500)[0] == 'medium'
+    assert router.route(5000)[0] == 'large'
+    assert router.route(50) == ['small', 'medium', 'large']
+    assert router.route(500) == ['medium', 'large', 'small']
+
+def test_high_priority_bumps_tier():
+    """Test that high-priority sessions are routed one tier up"""
+    router = _router()
+    
+    assert router.route(50, 'high')[0] == 'medium'
+    assert router.route(5000, 'high')[0] == 'large'
+    assert router.route(50, 'low')[0] == 'small'
+
+def test_single_model_default():
+    """Test that without tiers every request goes to BEDROCK_MODEL_ID"""
+    router = ModelRouter(tiers=None)
+    
+    assert router.route(10) == router.route(10**6) == [router.tiers[0]]
+
+def test_unhealthy_models_moved_last():
+    """Test that models with a high error rate or open circuit are demoted"""
+    router = _router()
+    for _ in range(5):
+        router.record_failure('small', 0.1)
+    
+    assert router.route(50) == ['medium', 'large', 'small']
+    
+    router = _router(available=lambda model_id: model_id != 'medium')
+    assert router.route(500) == ['large', 'small', 'medium']
+
+def test_slow_models_moved_last():
+    """Test that models over the latency limit are demoted"""
+    router = _router(max_latency=1.0)
+    for _ in range(10):
+        router.record_success('small', 5.0)
+    
+    assert router.route(50)[0] == 'medium'
+
+def test_stats_count_routing_decisions():
+    """Test that routing decisions and spillovers are counted per model"""
+    router = _router()
+    router.route(50)
+    router.route(50)
+    router.route(5000)
+    router.record_spillover('small', 'medium', Exception('throttled'))
+    
+    stats = router.stats()
+    assert stats['tiers'] == TIERS
+    assert stats['models']['small']['routed'] == 2
+    assert stats['models']['small']['spillovers'] == 1
+    assert stats['models']['large']['routed'] == 1
+
+def test_service_spills_over_when_throttled(service):
+    """Test that a throttled model spills over to the next tier without retrying"""
+    service.client.invoke_model.side_effect = [_client_error('ThrottlingException'), _ok_response()]
+    
+    assert service.generate_from_messages(['{"role":"user","content":[{"text":"Hi"}]}'], prompt_tokens=10) == 'Hello!'
+    
+    models = [call.kwargs['modelId'] for call in service.client.invoke_model.call_args_list]
+    assert models == ['small', 'medium']
+    assert service.router.stats()['models']['small']['spillovers'] == 1
+
+def test_service_does_not_spill_rejected_requests(service):
+    """Test that invalid requests fail without trying other tiers"""
+    service.client.invoke_model.side_effect = _client_error('ValidationException')
+    
+    with pytest.raises(BedrockRequestError):
+        service.generate_from_messages(['{"role":"user","content":[{"text":"Hi"}]}'], prompt_tokens=10)
+    assert service.client.invoke_model.call_count == 1
+
+def test_service_retries_on_last_tier(service):
+    """Test that the last candidate still gets the configured retries"""
+    service.client.invoke_model.side_effect = [
+        _client_error('ThrottlingException'),
+        _client_error('ThrottlingException'),
+        _client_error('ThrottlingException'),
+        _client_error('ThrottlingException'),
+        _ok_response()
+    ]
+    
+    assert service.generate_from_messages(['{"role":"user","content":[{"text":"Hi"}]}'], prompt_tokens=10) == 'Hello!'
+    
+    models = [call.kwargs['modelId'] for call in service.client.invoke_model.call_args_list]
+    assert models == ['small', 'medium', 'large', 'large', 'large']
+
+def test_cached_replies_are_kept_per_routed_model(service):
+    """Test that a high-priority turn is not served a reply cached from a smaller tier"""
+    service.response_cache = ResponseCache(max_entries=10, ttl=60, near_duplicates=False)
+    service.client.invoke_model.side_effect = [_ok_response('small reply'), _ok_response('medium reply')]
+    messages = ['{"role":"user","content":[{"text":"Hi"}]}']
+    
+    assert service.generate_from_messages(messages, prompt_tokens=10) == 'small reply'
+    assert service.generate_from_messages(messages, prompt_tokens=10, priority='high') == 'medium reply'
+    assert service.generate_from_messages(messages, prompt_tokens=10, priority='high') == 'medium reply'
+    assert service.generate_from_messages(messages, prompt_tokens=10) == 'small reply'
+    
+    models = [call.kwargs['modelId'] for call in service.client.invoke_model.call_args_list]
+    assert models == ['small', 'medium']
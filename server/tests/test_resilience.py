@@ -0,0 +1,182 @@
+import json
+import threading
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+from botocore.exceptions import ClientError, NoCredentialsError
+from services.bedrock_errors import (
+    BedrockConfigurationError, BedrockRequestError, BedrockThrottledError, BedrockUnavailableError,
+    CircuitOpenError, classify_code, classify_exception
+)
+from services.bedrock_service import BedrockService
+from services.resilience import CircuitBreaker, ResilientInvoker
+from utils.error_handler import classify_error
+from utils.tracing import Tracer, current_trace_id
+
+def _client_error(code):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'InvokeModel')
+
+class FlakyCall:
+    """Fails with the queued errors, then succeeds; records the model of each attempt"""
+    
+    def __init__(self, *errors, result='ok'):
+        self.errors = list(errors)
+        self.result = result
+        self.models = []
+    
+    def __call__(self, model_id):
+        self.models.append(model_id)
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.result
+
+def _invoker(**kwargs):
+    kwargs.setdefault('fallback_model_id', '')
+    kwargs.setdefault('max_retries', 3)
+    kwargs.setdefault('base_delay', 0.01)
+    kwargs.setdefault('hedge_after', 0)
+    kwargs.setdefault('sleep', lambda delay: None)
+    return ResilientInvoker(**kwargs)
+
+def test_classify_codes():
+    """Test that error codes and stream event names map to error classes"""
+    assert isinstance(classify_code('ThrottlingException', ''), BedrockThrottledError)
+    assert isinstance(classify_code('throttlingException', ''), BedrockThrottledError)
+    assert isinstance(classify_code('serviceUnavailableException', ''), BedrockUnavailableError)
+    assert isinstance(classify_code('ValidationException', ''), BedrockRequestError)
+    assert isinstance(classify_exception(NoCredentialsError()), BedrockConfigurationError)
+
+def test_retries_throttling_then_succeeds():
+    """Test that throttled calls are retried with backoff"""
+    delays = []
+    invoker = _invoker(sleep=delays.append)
+    call = FlakyCall(_client_error('ThrottlingException'), _client_error('ThrottlingException'))
+    
+    assert invoker.invoke(call, 'primary') == 'ok'
+    assert len(call.models) == 3
+    assert len(delays) == 2
+    assert all(0 <= delay <= invoker.max_delay for delay in delays)
+
+def test_does_not_retry_validation_errors():
+    """Test that rejected requests fail immediately"""
+    invoker = _invoker()
+    call = FlakyCall(_client_error('ValidationException'))
+    
+    with pytest.raises(BedrockRequestError):
+        invoker.invoke(call, 'primary')
+    assert len(call.models) == 1
+    assert invoker.status() == {'primary': CircuitBreaker.CLOSED}
+
+def test_gives_up_after_max_retries():
+    """Test that retries are bounded"""
+    invoker = _invoker(max_retries=2)
+    call = FlakyCall(*[_client_error('ThrottlingException')] * 5)
+    
+    with pytest.raises(BedrockThrottledError):
+        invoker.invoke(call, 'primary')
+    assert len(call.models) == 3
+
+def test_circuit_opens_and_recovers():
+    """Test that repeated faults open the circuit until a half-open trial succeeds"""
+    breaker = CircuitBreaker('primary', failure_threshold=2, reset_timeout=0.05)
+    invoker = _invoker(max_retries=0)
+    invoker.breakers['primary'] = breaker
+    
+    for _ in range(2):
+        with pytest.raises(BedrockUnavailableError):
+            invoker.invoke(FlakyCall(_client_error('ServiceUnavailableException')), 'primary')
+    assert breaker.state == CircuitBreaker.OPEN
+    
+    call = FlakyCall()
+    with pytest.raises(CircuitOpenError):
+        invoker.invoke(call, 'primary')
+    assert call.models == []
+    
+    time.sleep(0.06)
+    assert invoker.invoke(call, 'primary') == 'ok'
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_half_open_failure_reopens():
+    """Test that a failed half-open trial reopens the circuit"""
+    breaker = CircuitBreaker('primary', failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_falls_back_to_secondary_model():
+    """Test that service faults on the primary model fall back to the secondary"""
+    invoker = _invoker(fallback_model_id='fallback', max_retries=1)
+    call = FlakyCall(_client_error('ServiceUnavailableException'), _client_error('ServiceUnavailableException'))
+    
+    assert invoker.invoke(call, 'primary') == 'ok'
+    assert call.models == ['primary', 'primary', 'fallback']
+
+def test_hedges_slow_primary():
+    """Test that a slow primary call is hedged with the fallback model"""
+    invoker = _invoker(fallback_model_id='fallback', hedge_after=0.02)
+    release = threading.Event()
+    
+    def call(model_id):
+        if model_id == 'primary':
+            release.wait(1)
+            return 'primary'
+        return 'fallback'
+    
+    try:
+        assert invoker.invoke(call, 'primary') == 'fallback'
+    finally:
+        release.set()
+
+def test_hedged_attempts_keep_the_trace_context():
+    """Test that primary and hedge attempts on executor threads see the caller's trace"""
+    invoker = _invoker(fallback_model_id='fallback', hedge_after=0.02)
+    release = threading.Event()
+    seen = {}
+    
+    def call(model_id):
+        seen[model_id] = current_trace_id()
+        if model_id == 'primary':
+            release.wait(1)
+        return model_id
+    
+    tracer = Tracer(sample_rate=1.0)
+    root = tracer.start_trace('test')
+    try:
+        assert invoker.invoke(call, 'primary') == 'fallback'
+    finally:
+        release.set()
+        tracer.finish_trace(root)
+    
+    assert seen == {'primary': root.trace_id, 'fallback': root.trace_id}
+
+def test_service_maps_errors_to_status_codes():
+    """Test that BedrockService surfaces classified errors to the error handler"""
+    with patch('services.bedrock_service.boto3') as mock_boto3:
+        mock_boto3.client.return_value = MagicMock()
+        service = BedrockService()
+    service.resilience = _invoker(max_retries=1)
+    service.client.invoke_model.side_effect = _client_error('ThrottlingException')
+    
+    with pytest.raises(BedrockThrottledError) as exc:
+        service.generate_from_messages(['{"role":"user","content":[{"text":"Hi"}]}'])
+    assert service.client.invoke_model.call_count == 2
+    assert classify_error(exc.value)[0] == 429
+
+def test_service_retries_then_returns_response():
+    """Test that a transient failure is invisible to callers once a retry succeeds"""
+    with patch('services.bedrock_service.boto3') as mock_boto3:
+        mock_boto3.client.return_value = MagicMock()
+        service = BedrockService()
+    service.resilience = _invoker()
+    payload = {'output': {'message': {'content': [{'text': 'Hello!'}]}}}
+    body = MagicMock()
+    body.read.return_value = json.dumps(payload).encode('utf-8')
+    service.client.invoke_model.side_effect = [_client_error('InternalServerException'), {'body': body}]
+    
+    assert service.generate_from_messages(['{"role":"user","content":[{"text":"Hi"}]}']) == 'Hello!'
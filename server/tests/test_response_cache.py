@@ -0,0 +1,105 @@
+import pytest
+import json
+from unittest.mock import patch, MagicMock
+from services.bedrock_service import BedrockService, encode_message
+from services.response_cache import ResponseCache, normalize_text
+
+MODEL = 'test-model'
+
+def window(*texts):
+    return [encode_message('user', text) for text in texts]
+
+def lookup(cache, messages, system=None):
+    return cache.get(MODEL, messages, ','.join(messages), system)
+
+def store(cache, messages, response, system=None):
+    cache.put(MODEL, messages, ','.join(messages), response, system)
+
+def test_normalize_text():
+    """Test that normalization ignores case, punctuation and spacing"""
+    assert normalize_text('  Hello,   WORLD!! ') == 'hello world'
+
+def test_exact_hit_and_miss_counters():
+    """Test exact-match hits and miss accounting"""
+    cache = ResponseCache(max_entries=10, ttl=60, near_duplicates=False)
+    messages = window('What is Bedrock?')
+    
+    assert lookup(cache, messages) is None
+    store(cache, messages, 'A managed service.')
+    assert lookup(cache, messages) == 'A managed service.'
+    assert cache.get('other-model', messages, ','.join(messages)) is None
+    
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 2
+    assert stats['hit_rate'] == pytest.approx(1 / 3)
+
+def test_ttl_expiry():
+    """Test that entries expire after the TTL"""
+    cache = ResponseCache(max_entries=10, ttl=5, near_duplicates=False)
+    messages = window('Hello')
+    
+    with patch('services.response_cache.time') as mock_time:
+        mock_time.monotonic.return_value = 100.0
+        store(cache, messages, 'Hi!')
+        mock_time.monotonic.return_value = 104.0
+        assert lookup(cache, messages) == 'Hi!'
+        mock_time.monotonic.return_value = 106.0
+        assert lookup(cache, messages) is None
+    
+    assert cache.stats()['entries'] == 0
+
+def test_lru_eviction():
+    """Test that the least recently used entry is evicted first"""
+    cache = ResponseCache(max_entries=2, ttl=60, near_duplicates=False)
+    store(cache, window('one'), '1')
+    store(cache, window('two'), '2')
+    lookup(cache, window('one'))
+    store(cache, window('three'), '3')
+    
+    assert lookup(cache, window('one')) == '1'
+    assert lookup(cache, window('two')) is None
+    assert cache.stats()['evictions'] == 1
+
+def test_near_duplicate_mode():
+    """Test that near-duplicate prompts with the same context share a response"""
+    cache = ResponseCache(max_entries=10, ttl=60, near_duplicates=True, similarity_threshold=0.8)
+    store(cache, window('How do I reset my password?'), 'Use the reset link.')
+    
+    assert lookup(cache, window('how do I reset my password')) == 'Use the reset link.'
+    assert lookup(cache, window('How do I delete my account?')) is None
+    # Same question after different context is not a near duplicate
+    assert lookup(cache, window('Earlier question', 'How do I reset my password?')) is None
+    assert cache.stats()['near_hits'] == 1
+
+def test_system_prompt_is_part_of_the_context():
+    """Test that the same window under another running summary misses in both modes"""
+    for near_duplicates in (False, True):
+        cache = ResponseCache(max_entries=10, ttl=60, near_duplicates=near_duplicates, similarity_threshold=0.8)
+        store(cache, window('Where do I live?'), 'In Paris.', system='The user lives in Paris.')
+        
+        assert lookup(cache, window('Where do I live?'), system='The user lives in Paris.') == 'In Paris.'
+        assert lookup(cache, window('Where do I live?'), system='The user lives in Rome.') is None
+        assert lookup(cache, window('where do I live'), system='The user lives in Rome.') is None
+        assert lookup(cache, window('Where do I live?')) is None
+
+def test_bedrock_service_serves_repeats_from_cache():
+    """Test that repeated requests make one upstream call with a stubbed client"""
+    with patch('services.bedrock_service.boto3') as mock_boto3:
+        client = MagicMock()
+        mock_boto3.client.return_value = client
+        service = BedrockService(response_cache=ResponseCache(max_entries=10, ttl=60, near_duplicates=False))
+    
+    def respond(**kwargs):
+        body = MagicMock()
+        body.read.return_value = json.dumps({'output': {'message': {'content': [{'text': 'Hi!'}]}}}).encode('utf-8')
+        return {'body': body}
+    client.invoke_model.side_effect = respond
+    
+    assert service.generate_from_messages(window('Hello')) == 'Hi!'
+    assert service.generate_from_messages(window('Hello')) == 'Hi!'
+    assert list(service.stream_from_messages(window('Hello'))) == ['Hi!']
+    
+    assert client.invoke_model.call_count == 1
+    client.invoke_model_with_response_stream.assert_not_called()
+    assert service.response_cache.stats()['hits'] == 2
@@ -0,0 +1,106 @@
+import random
+import pytest
+from unittest.mock import patch
+from app import create_app
+from services.conversation_manager import ConversationManager
+from services.session_catalog import SessionCatalog, SortedKeys
+
+@pytest.fixture
+def catalog():
+    catalog = SessionCatalog()
+    for index, session_id in enumerate(['user-b', 'user-a', 'admin-1', 'user-c', 'admin-2']):
+        catalog.record(session_id, 1000.0 + index, 1, 100)
+    return catalog
+
+def test_sorted_keys_matches_sorted_list(monkeypatch):
+    """Test that adds, discards and ranged iteration agree with a plain sorted list"""
+    monkeypatch.setattr(SortedKeys, 'BLOCK_SIZE', 4)
+    keys = SortedKeys()
+    expected = set()
+    rng = random.Random(7)
+    for _ in range(2000):
+        key = rng.randrange(300)
+        if rng.random() < 0.6:
+            if key not in expected:
+                keys.add(key)
+                expected.add(key)
+        else:
+            keys.discard(key)
+            expected.discard(key)
+    
+    ordered = sorted(expected)
+    assert len(keys) == len(ordered)
+    assert list(keys.iter_from()) == ordered
+    assert list(keys.iter_before()) == ordered[::-1]
+    for pivot in (-1, 0, 150, 299, 400):
+        assert list(keys.iter_from(pivot)) == [key for key in ordered if key >= pivot]
+        assert list(keys.iter_from(pivot, inclusive=False)) == [key for key in ordered if key > pivot]
+        assert list(keys.iter_before(pivot)) == [key for key in ordered if key < pivot][::-1]
+
+def test_catalog_pages_by_activity(catalog):
+    """Test newest-first paging with cursors and an O(1) count"""
+    first, cursor = catalog.page(limit=2)
+    second, cursor = catalog.page(cursor=cursor, limit=2)
+    third, last_cursor = catalog.page(cursor=cursor, limit=2)
+    
+    assert [info.session_id for info in first + second + third] == ['admin-2', 'user-c', 'admin-1', 'user-a', 'user-b']
+    assert last_cursor is None
+    assert len(catalog) == 5
+    
+    # New activity moves a session to the front
+    catalog.record('user-b', 2000.0, 1, 50)
+    assert catalog.page(limit=1)[0][0].session_id == 'user-b'
+    assert (catalog.get('user-b').message_count, catalog.get('user-b').bytes) == (2, 150)
+
+def test_catalog_prefix_filter(catalog):
+    """Test prefix filtering in id order and in activity order"""
+    page, cursor = catalog.page(order='id', prefix='user-', limit=2)
+    assert [info.session_id for info in page] == ['user-a', 'user-b']
+    page, cursor = catalog.page(order='id', prefix='user-', cursor=cursor, limit=2)
+    assert [info.session_id for info in page] == ['user-c']
+    assert cursor is None
+    
+    page, _ = catalog.page(prefix='admin-')
+    assert [info.session_id for info in page] == ['admin-2', 'admin-1']
+    
+    catalog.remove('admin-2')
+    assert [info.session_id for info in catalog.page(order='id', prefix='admin')[0]] == ['admin-1']
+    assert len(catalog) == 4
+
+def test_manager_maintains_session_metadata():
+    """Test that message counts and bytes follow appends, ring buffer eviction and clears"""
+    manager = ConversationManager()
+    for i in range(manager.max_history + 3):
+        manager.add_message('session1', 'user', f'Message {i}')
+    
+    info = manager.catalog.get('session1')
+    records = list(manager.conversations['session1'])
+    assert info.message_count == manager.max_history
+    assert info.bytes == sum(record.record_bytes() for record in records)
+    assert info.last_activity == records[-1].created_at
+    
+    manager.clear_conversation('session1')
+    assert manager.catalog.get('session1') is None
+    assert len(manager.catalog) == 0
+
+def test_sessions_endpoint_paginates():
+    """Test that /api/sessions returns a page, the total count and metadata on request"""
+    manager = ConversationManager()
+    with patch('app.BedrockService'):
+        client = create_app(conversation_manager=manager).test_client()
+    for session_id in ('s1', 's2', 's3'):
+        manager.add_message(session_id, 'user', 'Hello')
+    
+    data = client.get('/api/sessions?limit=2').get_json()
+    assert data['sessions'] == ['s3', 's2']
+    assert data['count'] == 3
+    rest = client.get(f"/api/sessions?limit=2&cursor={data['next_cursor']}").get_json()
+    assert rest['sessions'] == ['s1'] and rest['next_cursor'] is None
+    
+    details = client.get('/api/sessions?order=id&prefix=s2&details=true').get_json()
+    assert details['sessions'][0]['session_id'] == 's2'
+    assert details['sessions'][0]['message_count'] == 1
+    assert client.get('/api/sessions/s1').get_json()['message_count'] == 1
+    assert client.get('/api/sessions/missing').status_code == 404
+    assert client.get('/api/sessions?order=size').status_code == 400
+    assert client.get('/api/sessions?cursor=abc').status_code == 400
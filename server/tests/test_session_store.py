@@ -0,0 +1,156 @@
+import pytest
+import time
+from services.conversation_manager import ConversationManager
+from services.message import Message
+from services.session_store import MemorySessionStore, SessionStore, SQLiteSessionStore, create_session_store
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteSessionStore(path=str(tmp_path / 'sessions.db'))
+    yield store
+    store.close()
+
+def test_create_session_store_backends(tmp_path):
+    """Test that the factory builds the configured backend"""
+    assert isinstance(create_session_store('memory'), MemorySessionStore)
+    with pytest.raises(ValueError):
+        create_session_store('unknown')
+    with pytest.raises(TypeError):
+        SessionStore()
+
+def test_sqlite_store_round_trip(store):
+    """Test that appended messages load back in order, limited to the newest"""
+    for i in range(5):
+        store.append('session1', Message('user', f'Message {i}', time.time()))
+    
+    records = store.load('session1', limit=3)
+    assert [r.content for r in records] == ['Message 2', 'Message 3', 'Message 4']
+    assert store.load('missing', limit=3) is None
+
+def test_sqlite_store_keeps_only_max_history_rows(tmp_path):
+    """Test that committed sessions are trimmed to their newest max_history messages"""
+    store = SQLiteSessionStore(path=str(tmp_path / 'sessions.db'), max_history=3)
+    try:
+        for i in range(10):
+            store.append('session1', Message('user', f'Message {i}', time.time(), i + 1))
+        store.append('session2', Message('user', 'Other', time.time(), 1))
+        store.flush()
+        
+        rows = store._reader().execute("SELECT session_id, seq FROM messages ORDER BY id").fetchall()
+        assert rows == [('session1', 8), ('session1', 9), ('session1', 10), ('session2', 1)]
+    finally:
+        store.close()
+
+def test_sqlite_store_delete_preserves_operation_order(store):
+    """Test that a delete only removes messages queued before it"""
+    store.append('session1', Message('user', 'Old', time.time()))
+    store.delete('session1')
+    store.append('session1', Message('user', 'New', time.time()))
+    
+    assert [r.content for r in store.load('session1', limit=10)] == ['New']
+
+def test_sqlite_store_reads_pending_writes_without_draining_the_queue(tmp_path):
+    """Test that a load sees queued writes without waiting for the writer to commit them"""
+    store = SQLiteSessionStore(path=str(tmp_path / 'sessions.db'), batch_size=1)
+    write_batch = store._write_batch
+    
+    def slow_write_batch(conn, batch):
+        time.sleep(0.01)
+        write_batch(conn, batch)
+    
+    store._write_batch = slow_write_batch
+    try:
+        for i in range(100):
+            store.append('busy', Message('user', f'Busy {i}', time.time(), i + 1))
+        store.append('session1', Message('user', 'Old', time.time(), 1))
+        store.save_summary('session1', 'old summary')
+        store.delete('session1')
+        store.append('session1', Message('user', 'New', time.time(), 1))
+        store.save_summary('session1', 'new summary')
+        
+        started = time.perf_counter()
+        records = store.load('session1', limit=10)
+        summary = store.load_summary('session1')
+        elapsed = time.perf_counter() - started
+        
+        assert [r.content for r in records] == ['New']
+        assert summary == 'new summary'
+        assert [r.content for r in store.load('busy', limit=3)] == ['Busy 97', 'Busy 98', 'Busy 99']
+        assert elapsed < 0.5
+    finally:
+        store.close()
+    assert store._pending == {}
+
+def test_manager_restores_sessions_after_restart(tmp_path):
+    """Test that a new manager sees sessions persisted by a previous one"""
+    path = str(tmp_path / 'sessions.db')
+    first = ConversationManager(store=SQLiteSessionStore(path=path))
+    first.add_message('session1', 'user', 'Hello')
+    first.add_message('session1', 'assistant', 'Hi there!')
+    first.close()
+    
+    second = ConversationManager(store=SQLiteSessionStore(path=path))
+    try:
+        history = second.get_conversation_history('session1')
+        assert [m['content'] for m in history] == ['Hello', 'Hi there!']
+        assert 'session1' in second.get_active_sessions()
+        
+        # Sequence numbers continue where the previous process stopped
+        second.add_message('session1', 'user', 'Back again')
+        page = second.get_history_page('session1', since=1)
+        assert [(m['seq'], m['content']) for m in page.messages] == [(2, 'Hi there!'), (3, 'Back again')]
+    finally:
+        second.close()
+
+def test_manager_reloads_sessions_evicted_from_cache(store):
+    """Test that sessions evicted from the hot cache are reloaded from disk"""
+    manager = ConversationManager(store=store)
+    manager.cache_size = 2
+    for i in range(4):
+        manager.add_message(f'session{i}', 'user', f'Hello {i}')
+    
+    assert list(manager.conversations) == ['session2', 'session3']
+    assert manager.get_context('session0') == [{'role': 'user', 'content': 'Hello 0'}]
+    assert 'session0' in manager.conversations
+
+def test_reloaded_session_keeps_expiry_order(store):
+    """Test that a session reloaded from the store is stamped as active now, at the back of the expiry index"""
+    store.append('reloaded', Message('user', 'Earlier', time.time() - 600, 1))
+    manager = ConversationManager(store=store)
+    manager.add_message('fresh', 'user', 'Hello')
+    
+    assert manager.get_conversation_history('reloaded')[0]['content'] == 'Earlier'
+    
+    timestamps = list(manager.session_timestamps.values())
+    assert list(manager.session_timestamps) == ['fresh', 'reloaded']
+    assert timestamps == sorted(timestamps)
+
+def test_manager_drops_expired_sessions_on_load(store):
+    """Test that a persisted but expired session is not restored"""
+    stale = time.time() - ConversationManager().timeout.total_seconds() - 100
+    store.append('stale-session', Message('user', 'Old', stale))
+    
+    manager = ConversationManager(store=store)
+    assert manager.get_conversation_history('stale-session') == []
+    assert store.load('stale-session', limit=10) is None
+
+def test_memory_budget_spills_and_reloads_sessions(tmp_path, monkeypatch):
+    """Test that sessions evicted from the memory store come back from the spill file intact"""
+    monkeypatch.setattr('config.Config.MEMORY_SPILL_PATH', str(tmp_path / 'spill.db'))
+    manager = ConversationManager()
+    try:
+        manager.add_message('session0', 'user', 'Hello 0')
+        manager.add_message('session0', 'assistant', 'Hi 0')
+        manager.memory_budget = manager.memory_stats()['bytes'] + 1
+        manager.add_message('session1', 'user', 'Hello 1')
+        
+        assert list(manager.conversations) == ['session1']
+        assert manager.memory_stats()['spilled_sessions'] == 1
+        assert 'session0' in manager.get_active_sessions()
+        
+        page = manager.get_history_page('session0')
+        assert [(m['seq'], m['content']) for m in page.messages] == [(1, 'Hello 0'), (2, 'Hi 0')]
+        assert list(manager.conversations) == ['session0']
+        assert manager.spill.load('session0', limit=10) is None
+    finally:
+        manager.close()
@@ -0,0 +1,146 @@
+import io
+import json
+import threading
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+from services.bedrock_errors import BedrockUnavailableError
+from services.bedrock_service import BedrockService, encode_message
+from services.resilience import ResilientInvoker
+from services.single_flight import SingleFlight
+
+CALLERS = 8
+
+def _chunk(payload):
+    return {'chunk': {'bytes': json.dumps(payload).encode('utf-8')}}
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+def _run_concurrently(target, count=CALLERS):
+    results = [None] * count
+    errors = [None] * count
+    
+    def run(index):
+        try:
+            results[index] = target()
+        except Exception as e:
+            errors[index] = e
+    
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+class GatedClient:
+    """Bedrock client stub whose calls block until released"""
+    
+    def __init__(self, reply='Hello there!'):
+        self.reply = reply
+        self.release = threading.Event()
+        self.calls = 0
+        self.lock = threading.Lock()
+    
+    def invoke_model(self, modelId, body, accept=None, contentType=None):
+        with self.lock:
+            self.calls += 1
+        self.release.wait(2)
+        payload = {'output': {'message': {'content': [{'text': self.reply}]}}}
+        return {'body': io.BytesIO(json.dumps(payload).encode('utf-8'))}
+    
+    def invoke_model_with_response_stream(self, modelId, body, accept=None, contentType=None):
+        with self.lock:
+            self.calls += 1
+        return {'body': self._events()}
+    
+    def _events(self):
+        yield _chunk({'contentBlockDelta': {'delta': {'text': 'Hello'}}})
+        self.release.wait(2)
+        yield _chunk({'contentBlockDelta': {'delta': {'text': ' there!'}}})
+
+@pytest.fixture
+def service():
+    with patch('services.bedrock_service.boto3') as mock_boto3:
+        mock_boto3.client.return_value = MagicMock()
+        service = BedrockService()
+    service.client = GatedClient()
+    service.resilience = ResilientInvoker(fallback_model_id='', max_retries=0, hedge_after=0)
+    service.single_flight = SingleFlight()
+    return service
+
+def test_concurrent_identical_requests_make_one_upstream_call(service):
+    """Test that concurrent identical prompts share exactly one invoke_model call"""
+    messages = [encode_message('user', 'Hello')]
+    threads, results, errors = _run_concurrently(lambda: service.generate_from_messages(messages))
+    
+    _wait_for(lambda: service.single_flight.coalesced == CALLERS - 1)
+    service.client.release.set()
+    for thread in threads:
+        thread.join()
+    
+    assert errors == [None] * CALLERS
+    assert results == ['Hello there!'] * CALLERS
+    assert service.client.calls == 1
+    assert service.single_flight.stats() == {'leaders': 1, 'coalesced': CALLERS - 1, 'in_flight': 0}
+
+def test_different_prompts_are_not_coalesced(service):
+    """Test that only identical payloads share a call"""
+    service.client.release.set()
+    
+    service.generate_from_messages([encode_message('user', 'Hello')])
+    service.generate_from_messages([encode_message('user', 'Goodbye')])
+    
+    assert service.client.calls == 2
+
+def test_concurrent_identical_streams_fan_out(service):
+    """Test that concurrent identical streams share one upstream stream"""
+    messages = [encode_message('user', 'Hello')]
+    threads, results, errors = _run_concurrently(lambda: list(service.stream_from_messages(messages)))
+    
+    _wait_for(lambda: service.single_flight.coalesced == CALLERS - 1)
+    service.client.release.set()
+    for thread in threads:
+        thread.join()
+    
+    assert errors == [None] * CALLERS
+    assert results == [['Hello', ' there!']] * CALLERS
+    assert service.client.calls == 1
+
+def test_errors_are_shared():
+    """Test that followers receive the leader's exception"""
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    
+    def failing():
+        calls.append(1)
+        release.wait(2)
+        raise BedrockUnavailableError("down")
+    
+    threads, results, errors = _run_concurrently(lambda: flight.do('key', failing))
+    _wait_for(lambda: flight.coalesced == CALLERS - 1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    
+    assert len(calls) == 1
+    assert all(isinstance(error, BedrockUnavailableError) for error in errors)
+    assert flight.stats()['in_flight'] == 0
+
+def test_leader_disconnect_finishes_stream_for_followers():
+    """Test that followers still get the full stream when the leading client goes away"""
+    flight = SingleFlight()
+    
+    def upstream():
+        yield from ['a', 'b', 'c']
+    
+    leader = flight.stream('key', upstream)
+    assert next(leader) == 'a'
+    follower = flight.stream('key', upstream)
+    leader.close()
+    
+    assert list(follower) == ['a', 'b', 'c']
+    assert flight.stats()['in_flight'] == 0
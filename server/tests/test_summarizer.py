@@ -0,0 +1,157 @@
+import pytest
+import json
+import threading
+from unittest.mock import patch, MagicMock
+from services.bedrock_service import BedrockService
+from services.context_builder import ContextBuilder
+from services.conversation_manager import ConversationManager
+from services.session_store import SQLiteSessionStore
+from services.summarizer import ConversationSummarizer
+
+class FakeSummarizer:
+    """Records calls and folds messages into a plain-text summary"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def __call__(self, previous, messages):
+        self.calls.append((previous, [m['content'] for m in messages]))
+        parts = [previous] if previous else []
+        parts.extend(m['content'] for m in messages)
+        return ' | '.join(parts)
+
+@pytest.fixture
+def fake():
+    return FakeSummarizer()
+
+def make_manager(fake, store=None, batch_size=2):
+    manager = ConversationManager(store=store, summarizer=ConversationSummarizer(fake, batch_size=batch_size))
+    manager.max_history = 4
+    return manager
+
+def test_evicted_turns_fold_into_summary(fake):
+    """Test that messages evicted from history end up in the running summary"""
+    manager = make_manager(fake)
+    for i in range(8):
+        manager.add_message('session1', 'user' if i % 2 == 0 else 'assistant', f'm{i}')
+    manager.summarizer.flush(timeout=5)
+    
+    assert fake.calls == [(None, ['m0', 'm1']), ('m0 | m1', ['m2', 'm3'])]
+    assert manager.summarizer.get('session1') == 'm0 | m1 | m2 | m3'
+    
+    context = manager.build_context('session1')
+    assert context.system == 'm0 | m1 | m2 | m3'
+    assert [json.loads(m)['content'][0]['text'] for m in context.messages] == ['m4', 'm5', 'm6', 'm7']
+
+def window_texts(context):
+    return [json.loads(m)['content'][0]['text'] for m in context.messages]
+
+def test_turns_past_the_budget_stay_until_summarized(fake):
+    """Test that turns dropped by the token budget are summarized before they leave the window"""
+    manager = make_manager(fake)
+    manager.max_history = 20
+    manager.context_builder = ContextBuilder(token_budget=1)
+    for i in range(5):
+        manager.add_message('session1', 'user' if i % 2 == 0 else 'assistant', f'm{i}')
+    
+    first = manager.build_context('session1')
+    assert window_texts(first) == ['m0', 'm1', 'm2', 'm3', 'm4']
+    assert first.overflow == 4
+    
+    manager.summarizer.flush(timeout=5)
+    second = manager.build_context('session1')
+    assert second.system == 'm0 | m1 | m2 | m3'
+    assert window_texts(second) == ['m4']
+
+def test_pending_evictions_reach_the_model(fake):
+    """Test that evicted turns waiting for a full batch are still sent as turns"""
+    manager = make_manager(fake, batch_size=4)
+    for i in range(6):
+        manager.add_message('session1', 'user' if i % 2 == 0 else 'assistant', f'm{i}')
+    manager.summarizer.flush(timeout=5)
+    
+    context = manager.build_context('session1')
+    assert fake.calls == []
+    assert context.system is None
+    assert window_texts(context) == ['m0', 'm1', 'm2', 'm3', 'm4', 'm5']
+
+def test_no_summary_before_history_overflows(fake):
+    """Test that short sessions never call the summarizer"""
+    manager = make_manager(fake)
+    manager.add_message('session1', 'user', 'Hello')
+    manager.summarizer.flush(timeout=5)
+    
+    assert fake.calls == []
+    assert manager.build_context('session1').system is None
+
+def test_jobs_for_a_session_run_one_at_a_time(fake):
+    """Test that a second batch waits for the in-flight summary"""
+    release = threading.Event()
+    
+    def slow(previous, messages):
+        release.wait(5)
+        return fake(previous, messages)
+    
+    manager = make_manager(slow)
+    for i in range(8):
+        manager.add_message('session1', 'user', f'm{i}')
+    
+    assert len(fake.calls) == 0
+    release.set()
+    manager.summarizer.flush(timeout=5)
+    assert [previous for previous, _ in fake.calls] == [None, 'm0 | m1']
+
+def test_clear_discards_summary(fake):
+    """Test that clearing a session drops its summary and in-flight results"""
+    manager = make_manager(fake)
+    for i in range(6):
+        manager.add_message('session1', 'user', f'm{i}')
+    manager.clear_conversation('session1')
+    manager.summarizer.flush(timeout=5)
+    
+    assert manager.summarizer.get('session1') is None
+
+def test_summarizer_errors_are_logged(fake):
+    """Test that a failing summarizer leaves the chat path unaffected"""
+    def failing(previous, messages):
+        raise Exception('Bedrock unavailable')
+    
+    manager = make_manager(failing)
+    for i in range(6):
+        manager.add_message('session1', 'user', f'm{i}')
+    manager.summarizer.flush(timeout=5)
+    
+    assert manager.summarizer.get('session1') is None
+    assert len(manager.get_conversation_history('session1')) == 4
+
+def test_summary_persists_with_session(fake, tmp_path):
+    """Test that the summary is stored and restored with a persisted session"""
+    path = str(tmp_path / 'sessions.db')
+    first = make_manager(fake, store=SQLiteSessionStore(path=path))
+    for i in range(6):
+        first.add_message('session1', 'user', f'm{i}')
+    first.summarizer.flush(timeout=5)
+    first.close()
+    
+    second = make_manager(fake, store=SQLiteSessionStore(path=path))
+    try:
+        assert second.build_context('session1').system == 'm0 | m1'
+    finally:
+        second.close()
+
+def test_bedrock_summarize_sends_system_prompt():
+    """Test that summarize folds turns through a system-prompted request"""
+    with patch('services.bedrock_service.boto3') as mock_boto3:
+        mock_boto3.client.return_value = MagicMock()
+        service = BedrockService(response_cache=None)
+    body = MagicMock()
+    body.read.return_value = json.dumps({'output': {'message': {'content': [{'text': 'New summary'}]}}}).encode('utf-8')
+    service.client.invoke_model.return_value = {'body': body}
+    
+    summary = service.summarize('Old summary', [{'role': 'user', 'content': 'I live in Paris'}])
+    
+    sent = json.loads(service.client.invoke_model.call_args.kwargs['body'])
+    assert summary == 'New summary'
+    assert 'system' in sent
+    assert 'Old summary' in sent['messages'][0]['content'][0]['text']
+    assert 'User: I live in Paris' in sent['messages'][0]['content'][0]['text']
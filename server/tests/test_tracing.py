@@ -0,0 +1,125 @@
+import io
+import json
+import logging
+import os
+import pytest
+from unittest.mock import MagicMock, patch
+from app import create_app
+from services.bedrock_service import BedrockService, encode_message
+from services.conversation_manager import ConversationManager
+from services.resilience import ResilientInvoker
+from utils.tracing import NOOP_SPAN, TraceExporter, TraceIdFilter, Tracer, current_trace_id, tracer
+
+@pytest.fixture
+def exporter(tmp_path):
+    return TraceExporter(path=str(tmp_path / 'traces.jsonl'))
+
+def read_spans(exporter):
+    exporter.flush()
+    with open(exporter.path) as f:
+        traces = [json.loads(line) for line in f]
+    return [span for trace in traces for span in trace['resourceSpans'][0]['scopeSpans'][0]['spans']]
+
+def test_unsampled_trace_records_nothing(exporter):
+    """Test that spans of an unsampled trace are no-ops but the trace id is still set"""
+    local = Tracer(sample_rate=0, exporter=exporter)
+    root = local.start_trace('GET /')
+    
+    with local.span('work') as span:
+        assert span is NOOP_SPAN
+        assert current_trace_id() == root.trace_id
+    local.finish_trace(root)
+    
+    assert current_trace_id() is None
+    exporter.flush()
+    assert not os.path.exists(exporter.path)
+
+def test_sampled_trace_exported_as_otlp(exporter):
+    """Test that nested spans are exported with parent links, attributes and error status"""
+    local = Tracer(sample_rate=1.0, exporter=exporter)
+    root = local.start_trace('POST /api/chat')
+    with local.span('outer', size=3) as outer:
+        with local.span('inner'):
+            pass
+    with pytest.raises(ValueError):
+        with local.span('failing'):
+            raise ValueError('boom')
+    local.finish_trace(root)
+    
+    spans = {span['name']: span for span in read_spans(exporter)}
+    
+    assert set(spans) == {'POST /api/chat', 'outer', 'inner', 'failing'}
+    assert {span['traceId'] for span in spans.values()} == {root.trace_id}
+    assert spans['inner']['parentSpanId'] == outer.span_id
+    assert spans['outer']['parentSpanId'] == root.span_id
+    assert spans['outer']['attributes'] == [{'key': 'size', 'value': {'intValue': '3'}}]
+    assert spans['failing']['status'] == {'code': 2, 'message': 'boom'}
+    assert int(spans['inner']['endTimeUnixNano']) >= int(spans['inner']['startTimeUnixNano'])
+
+def test_traceparent_continues_caller_trace():
+    """Test that an incoming traceparent sets the trace id, parent and sampling decision"""
+    local = Tracer(sample_rate=0)
+    header = '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'
+    
+    root = local.start_trace('GET /', header)
+    local.finish_trace(root)
+    
+    assert root.trace_id == '0af7651916cd43dd8448eb211c80319c'
+    assert root.parent_id == 'b7ad6b7169203331'
+    assert root.sampled
+    assert root.traceparent().endswith('-01')
+
+def test_log_records_carry_trace_id():
+    """Test that the logging filter stamps records with the current trace id"""
+    local = Tracer(sample_rate=0)
+    record = logging.LogRecord('test', logging.INFO, __file__, 1, 'hello', None, None)
+    
+    TraceIdFilter().filter(record)
+    assert record.trace_id == '-'
+    
+    root = local.start_trace('GET /')
+    TraceIdFilter().filter(record)
+    local.finish_trace(root)
+    assert record.trace_id == root.trace_id
+
+def test_chat_endpoint_traces_each_stage(exporter, monkeypatch):
+    """Test that /api/chat returns trace headers and exports a span per stage"""
+    monkeypatch.setattr(tracer, 'sample_rate', 1.0)
+    monkeypatch.setattr(tracer, 'exporter', exporter)
+    bedrock = MagicMock()
+    bedrock.generate_from_messages.return_value = 'Hi!'
+    app = create_app(bedrock_service=bedrock, conversation_manager=ConversationManager())
+    
+    response = app.test_client().post('/api/chat', json={'message': 'Hello', 'session_id': 'traced'})
+    
+    assert response.status_code == 200
+    trace_id = response.headers['X-Trace-Id']
+    assert response.headers['traceparent'].startswith(f'00-{trace_id}-')
+    spans = read_spans(exporter)
+    names = [span['name'] for span in spans]
+    assert names[0] == 'POST /api/chat'
+    for stage in ('validate', 'session.add_message', 'context.build', 'response.encode'):
+        assert stage in names
+    assert names.count('session.add_message') == 2
+    assert {span['traceId'] for span in spans} == {trace_id}
+
+def test_bedrock_service_spans(exporter):
+    """Test that the Bedrock call is split into encode, invoke and decode spans"""
+    with patch('services.bedrock_service.boto3') as mock_boto3:
+        mock_boto3.client.return_value = MagicMock()
+        service = BedrockService()
+    service.resilience = ResilientInvoker(fallback_model_id='', max_retries=0, hedge_after=0)
+    payload = {'output': {'message': {'content': [{'text': 'Hello!'}]}}}
+    service.client.invoke_model.return_value = {'body': io.BytesIO(json.dumps(payload).encode('utf-8'))}
+    local = Tracer(sample_rate=1.0, exporter=exporter)
+    
+    with patch('services.bedrock_service.tracer', local):
+        root = local.start_trace('test')
+        service.generate_from_messages([encode_message('user', 'Hi')])
+        local.finish_trace(root)
+    
+    spans = {span['name']: span for span in read_spans(exporter)}
+    assert spans['bedrock.generate']['parentSpanId'] == root.span_id
+    for stage in ('bedrock.encode_request', 'bedrock.invoke', 'bedrock.decode_response'):
+        assert spans[stage]['parentSpanId'] == spans['bedrock.generate']['spanId']
+    assert {'key': 'model', 'value': {'stringValue': service.router.tiers[0]}} in spans['bedrock.invoke']['attributes']
@@ -0,0 +1,57 @@
+import json
+from datetime import datetime
+import pytest
+from flask import Flask, request
+from utils import json_codec
+from utils.validators import CHAT_REQUEST, ChatRequest, parse_chat_request
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    json_codec.install(app)
+    return app
+
+def test_chat_schema_builds_typed_request():
+    """Test that a valid body becomes a ChatRequest with defaults and a stripped message"""
+    chat_request, error = CHAT_REQUEST.parse({'message': '  Hello  ', 'priority': 'high', 'extra': 1})
+    
+    assert error is None
+    assert chat_request == ChatRequest(message='Hello', session_id='default', priority='high')
+
+@pytest.mark.parametrize('data, error', [
+    (None, 'Request body cannot be empty'),
+    ([1, 2], 'Request body must be a JSON object'),
+    ({'message': '   '}, 'Message cannot be empty'),
+    ({'session_id': 's1'}, 'Message cannot be empty'),
+    ({'message': 42}, 'Message must be a string'),
+    ({'message': 'x' * 5000}, 'Message too long. Maximum length is 4000 characters'),
+    ({'message': 'hi', 'session_id': 's' * 101}, 'Session ID too long'),
+    ({'message': 'hi', 'session_id': ['s1']}, 'Session ID must be a string'),
+    ({'message': 'hi', 'priority': 'urgent'}, 'Priority must be one of: low, normal, high'),
+])
+def test_chat_schema_errors(data, error):
+    """Test that each invalid body is rejected with its message"""
+    assert CHAT_REQUEST.parse(data) == (None, error)
+
+def test_parse_chat_request_decodes_body_once(app):
+    """Test that the request body is decoded and validated without get_json"""
+    with app.test_request_context('/', method='POST', data=b'{"message": "hi", "session_id": "s1"}',
+                                  content_type='application/json'):
+        assert parse_chat_request(request) == (ChatRequest('hi', 's1'), None)
+    
+    with app.test_request_context('/', method='POST', data=b'{"message": ', content_type='application/json'):
+        assert parse_chat_request(request) == (None, 'Request body must be valid JSON')
+    
+    with app.test_request_context('/', method='POST', data=b'{}', content_type='text/plain'):
+        assert parse_chat_request(request) == (None, 'Request must be JSON')
+
+def test_json_provider_round_trip(app):
+    """Test that jsonify output matches the stdlib encoding, including dates"""
+    payload = {'message': 'héllo', 'count': 3, 'items': [1.5, None, True], 'when': datetime(2024, 1, 2, 3, 4, 5)}
+    
+    with app.app_context():
+        response = app.json.response(payload)
+    
+    assert response.mimetype == 'application/json'
+    assert json.loads(response.get_data()) == {**payload, 'when': 'Tue, 02 Jan 2024 03:04:05 GMT'}
+    assert json_codec.loads(json_codec.dumps_bytes({'a': [1, 'b']})) == {'a': [1, 'b']}
@@ -1,32 +1,42 @@
 import logging
 from flask import jsonify
 from datetime import datetime
+from typing import Tuple
+from services.bedrock_errors import BedrockError
 
 logger = logging.getLogger(__name__)
 
-def handle_error(error: Exception):
-    """Centralized error handling"""
-    error_message = str(error)
+def classify_error(error: Exception) -> Tuple[int, str]:
+    """Map an exception to an HTTP status code and user-facing message"""
+    if isinstance(error, BedrockError):
+        return error.status_code, error.user_message
     
-    # Log the error
-    logger.error(f"Application error: {error_message}")
+    error_message = str(error)
     
-    # Determine appropriate HTTP status code and response
     if "AWS" in error_message or "Bedrock" in error_message:
-        status_code = 503
-        user_message = "AI service is temporarily unavailable. Please try again later."
+        return 503, "AI service is temporarily unavailable. Please try again later."
     elif "validation" in error_message.lower():
-        status_code = 400
-        user_message = error_message
+        return 400, error_message
     elif "not found" in error_message.lower():
-        status_code = 404
-        user_message = "Requested resource not found."
+        return 404, "Requested resource not found."
     else:
-        status_code = 500
-        user_message = "An internal error occurred. Please try again later."
+        return 500, "An internal error occurred. Please try again later."
+
+def error_payload(error: Exception) -> Tuple[dict, int]:
+    """Build the JSON error body and status code for an exception"""
+    # Log the error
+    logger.error(f"Application error: {str(error)}")
+    
+    # Determine appropriate HTTP status code and response
+    status_code, user_message = classify_error(error)
     
-    return jsonify({
+    return {
         'error': user_message,
         'timestamp': datetime.utcnow().isoformat(),
         'status': status_code
-    }), status_code
\ No newline at end of file
+    }, status_code
+
+def handle_error(error: Exception):
+    """Centralized error handling"""
+    payload, status_code = error_payload(error)
+    return jsonify(payload), status_code
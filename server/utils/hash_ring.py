@@ -0,0 +1,56 @@
+import hashlib
+from bisect import bisect, insort
+from typing import Dict, Iterable, List
+
+def _hash(key: str) -> int:
+    # Stable across processes, unlike hash() with PYTHONHASHSEED randomization
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+class HashRing:
+    """Consistent hash ring mapping keys, such as session ids, to nodes
+    
+    Each node is placed on the ring at many virtual points so keys spread
+    evenly. Adding or removing a node only moves the keys between its
+    points and their predecessors, about 1/n of them, so most sessions keep
+    their owner when a worker joins or leaves.
+    """
+    
+    def __init__(self, nodes: Iterable[str] = (), virtual_nodes: int = 160):
+        self.virtual_nodes = virtual_nodes
+        self._points: List[int] = []
+        self._owners: Dict[int, str] = {}
+        self._nodes: List[str] = []
+        for node in nodes:
+            self.add(node)
+    
+    def __len__(self) -> int:
+        return len(self._nodes)
+    
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+    
+    def add(self, node: str):
+        if node in self._nodes:
+            return
+        self._nodes.append(node)
+        for replica in range(self.virtual_nodes):
+            point = _hash(f'{node}#{replica}')
+            # On a (vanishingly rare) 64-bit collision the node added first keeps the point
+            if point not in self._owners:
+                self._owners[point] = node
+                insort(self._points, point)
+    
+    def remove(self, node: str):
+        if node not in self._nodes:
+            return
+        self._nodes.remove(node)
+        self._points = [point for point in self._points if self._owners[point] != node]
+        self._owners = {point: self._owners[point] for point in self._points}
+    
+    def node_for(self, key: str) -> str:
+        """The node owning key: the first point clockwise from the key's hash"""
+        if not self._points:
+            raise LookupError("Hash ring has no nodes")
+        index = bisect(self._points, _hash(key))
+        return self._owners[self._points[index % len(self._points)]]
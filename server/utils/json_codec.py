@@ -0,0 +1,73 @@
+"""JSON encoding and decoding with an optional faster backend.
+
+orjson is used when it is installed, unless JSON_BACKEND is 'stdlib'; the
+standard library json module is the fallback. Both backends produce the same
+documents. Request bodies are decoded straight from bytes, and the Flask
+provider writes responses as bytes, so the orjson path never builds an
+intermediate str.
+"""
+import json
+from typing import Any
+from flask.json.provider import DefaultJSONProvider
+from config import Config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+USE_ORJSON = orjson is not None and Config.JSON_BACKEND != 'stdlib'
+BACKEND = 'orjson' if USE_ORJSON else 'stdlib'
+
+if USE_ORJSON:
+    # Dates go through the provider's default hook so they match Flask's format
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    
+    def loads(data: Any) -> Any:
+        return orjson.loads(data)
+    
+    def dumps(obj: Any) -> str:
+        return orjson.dumps(obj, option=_OPTIONS).decode('utf-8')
+    
+    def dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=_OPTIONS)
+else:
+    def loads(data: Any) -> Any:
+        return json.loads(data)
+    
+    def dumps(obj: Any) -> str:
+        return json.dumps(obj, separators=(',', ':'))
+    
+    def dumps_bytes(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes and decodes with orjson
+    
+    Calls with stdlib-only keyword arguments, such as sort_keys, fall back
+    to the default provider.
+    """
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=_OPTIONS).decode('utf-8')
+    
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+    
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = _OPTIONS | orjson.OPT_APPEND_NEWLINE
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option), mimetype=self.mimetype
+        )
+
+def install(app):
+    """Make jsonify and request.get_json use the fast backend when it is enabled"""
+    if USE_ORJSON:
+        app.json = OrjsonProvider(app)
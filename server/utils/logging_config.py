@@ -0,0 +1,206 @@
+"""Non-blocking structured logging.
+
+Request threads only stamp the trace id, apply sampling and put the record
+on a bounded queue. A listener thread formats the record (as JSON or text),
+redacts PII and does the file and console I/O, so a request never waits
+on disk. Log calls on the hot path use %-style arguments and ``preview()``
+so content is only rendered for records that are actually written.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, TextIO
+from config import Config
+from utils.tracing import TraceIdFilter
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s'
+
+_EMAIL = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+_AWS_KEY = re.compile(r'\b(?:AKIA|ASIA)[0-9A-Z]{16}\b')
+# Nine or more digits, optionally grouped, so IP addresses and version
+# numbers are left alone; 13 or more digits is taken to be a card number
+_NUMBER = re.compile(r'(?<![\w.-])\+?\(?\d(?:[ ()-]{0,2}\d){8,18}\b')
+
+# Attributes every LogRecord has; anything else was passed with extra=
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'trace_id', '_structured'}
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+def _mask_number(match: re.Match) -> str:
+    digits = sum(char.isdigit() for char in match.group())
+    return '<card>' if digits >= 13 else '<phone>'
+
+def redact(text: str) -> str:
+    """Mask email addresses, card and phone numbers and AWS access keys"""
+    # Substring checks are far cheaper than a regex scan of every record
+    if '@' in text:
+        text = _EMAIL.sub('<email>', text)
+    if 'AKIA' in text or 'ASIA' in text:
+        text = _AWS_KEY.sub('<aws-key>', text)
+    return _NUMBER.sub(_mask_number, text)
+
+class Preview:
+    """User or model content passed as a log argument, rendered only if the record is written"""
+    
+    __slots__ = ('text', 'length')
+    
+    # Replace content with its length in logs when set
+    redact_content = Config.LOG_REDACT_CONTENT
+    
+    def __init__(self, text: str, length: int):
+        self.text = text
+        self.length = length
+    
+    def __str__(self) -> str:
+        if Preview.redact_content:
+            return f"<{len(self.text)} chars>"
+        if len(self.text) > self.length:
+            return self.text[:self.length] + '...'
+        return self.text
+
+def preview(text: str, length: int = 100) -> Preview:
+    return Preview(text, length)
+
+class StructuredFormatter(logging.Formatter):
+    """Formats records as JSON lines or the classic text format, with PII redaction"""
+    
+    def __init__(self, json_output: bool = True, redact_pii: bool = True):
+        super().__init__(TEXT_FORMAT)
+        self.json_output = json_output
+        self.redact_pii = redact_pii
+    
+    def format(self, record: logging.LogRecord) -> str:
+        # The file and console handlers share this formatter; format each record once
+        cached = record.__dict__.get('_structured')
+        if cached is not None and cached[0] is self:
+            return cached[1]
+        line = self._format(record)
+        record._structured = (self, line)
+        return line
+    
+    def _format(self, record: logging.LogRecord) -> str:
+        record.message = record.getMessage()
+        record.trace_id = getattr(record, 'trace_id', '-')
+        exception = self.formatException(record.exc_info) if record.exc_info else None
+        if self.redact_pii:
+            record.message = redact(record.message)
+            exception = redact(exception) if exception else None
+        
+        if not self.json_output:
+            record.asctime = self.formatTime(record, self.datefmt)
+            text = self.formatMessage(record)
+            return f"{text}\n{exception}" if exception else text
+        
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'trace_id': record.trace_id,
+            'message': record.message
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if exception:
+            entry['exception'] = exception
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class InfoSampler(logging.Filter):
+    """Keeps a share of INFO and DEBUG records; warnings and errors always pass
+    
+    The decision is keyed on the trace id when there is one, so all lines of
+    a request are kept or dropped together.
+    """
+    
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1:
+            return True
+        trace_id = getattr(record, 'trace_id', '-')
+        if trace_id != '-':
+            return int(trace_id[:8], 16) < self.rate * 0x100000000
+        return random.random() < self.rate
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the listener thread without formatting them or ever blocking"""
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener formats the record; arguments must not be mutated after logging
+        return record
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Shed log lines rather than stall a request behind the disk
+            self.dropped += 1
+
+def configure_logging(level: str = None, log_file: str = None, json_output: bool = None,
+                      sample_rate: float = None, redact_pii: bool = None, stream: TextIO = None,
+                      queue_size: int = None) -> QueueListener:
+    """Route the root logger through a queue to file and console handlers on a listener thread
+    
+    An empty log_file (or LOG_FILE) logs to the console only. Calling it
+    again replaces the previous pipeline.
+    """
+    global _listener, _queue_handler
+    
+    formatter = StructuredFormatter(
+        json_output=Config.LOG_FORMAT == 'json' if json_output is None else json_output,
+        redact_pii=Config.LOG_REDACT_PII if redact_pii is None else redact_pii
+    )
+    handlers = [logging.StreamHandler(stream or sys.stderr)]
+    log_file = Config.LOG_FILE if log_file is None else log_file
+    if log_file:
+        os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+        handlers.insert(0, logging.FileHandler(log_file))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.Queue(maxsize=queue_size or Config.LOG_QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    # Filters run on the logging thread, where the trace context is still current
+    queue_handler.addFilter(TraceIdFilter())
+    queue_handler.addFilter(InfoSampler(Config.LOG_INFO_SAMPLE_RATE if sample_rate is None else sample_rate))
+    
+    # Neither format shows caller or process details, so skip collecting them per record
+    logging._srcfile = None
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+    
+    shutdown_logging()
+    root = logging.getLogger()
+    root.addHandler(queue_handler)
+    root.setLevel(level or Config.LOG_LEVEL)
+    
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    _queue_handler = queue_handler
+    return _listener
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = _queue_handler = None
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,193 @@
+"""Lightweight Prometheus-style metrics.
+
+Counters and histograms are split over a fixed pool of lock-striped shards.
+Each thread is assigned a shard round-robin on first use, so concurrent
+updates rarely share a lock, and the number of shards stays bounded however
+many short-lived threads (one per request under Werkzeug) come and go. A
+scrape sums the shards. Gauges and other
+derived values come from collectors that run only at scrape time, so they
+cost nothing on the request path.
+"""
+import bisect
+import itertools
+import threading
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+SHARDS = 16
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (labels, value) pairs reported for one metric
+Samples = List[Tuple[Dict[str, str], float]]
+# (name, help, type, samples) reported by a collector
+Family = Tuple[str, str, str, Samples]
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+class _Shard:
+    __slots__ = ('lock', 'cells')
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cells: dict = {}
+
+class _Sharded:
+    """Base for metrics whose state is split over a fixed pool of locked shards"""
+    
+    kind = 'untyped'
+    
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), shards: int = SHARDS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[_Shard] = [_Shard() for _ in range(shards)]
+        self._next_shard = itertools.count()
+    
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            # next() on itertools.count is atomic under the GIL
+            shard = self._local.shard = self._shards[next(self._next_shard) % len(self._shards)]
+        return shard
+    
+    def _snapshots(self) -> List[dict]:
+        snapshots = []
+        for shard in self._shards:
+            with shard.lock:
+                snapshots.append({labels: list(value) if isinstance(value, list) else value
+                                  for labels, value in shard.cells.items()})
+        return snapshots
+    
+    def _labels(self, values: tuple) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+class Counter(_Sharded):
+    """Monotonic counter; label values are passed positionally as a tuple"""
+    
+    kind = 'counter'
+    
+    def inc(self, labels: tuple = (), amount: float = 1):
+        shard = self._shard()
+        with shard.lock:
+            shard.cells[labels] = shard.cells.get(labels, 0) + amount
+    
+    def value(self, labels: tuple = ()) -> float:
+        return sum(shard.get(labels, 0) for shard in self._snapshots())
+    
+    def collect(self) -> Iterable[Family]:
+        totals: Dict[tuple, float] = {}
+        for shard in self._snapshots():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0) + value
+        yield self.name, self.help, self.kind, [(self._labels(labels), value) for labels, value in sorted(totals.items())]
+
+class Histogram(_Sharded):
+    """Bucketed distribution with per-thread bucket counts"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value: float, labels: tuple = ()):
+        index = bisect.bisect_left(self.buckets, value)
+        shard = self._shard()
+        with shard.lock:
+            cells = shard.cells.get(labels)
+            if cells is None:
+                # One cell per bucket, one for +Inf, then the running sum
+                cells = shard.cells[labels] = [0] * (len(self.buckets) + 2)
+            cells[index] += 1
+            cells[-1] += value
+    
+    def count(self, labels: tuple = ()) -> int:
+        return sum(sum(shard[labels][:-1]) for shard in self._snapshots() if labels in shard)
+    
+    def collect(self) -> Iterable[Family]:
+        totals: Dict[tuple, list] = {}
+        for shard in self._snapshots():
+            for labels, cells in shard.items():
+                merged = totals.setdefault(labels, [0] * len(cells))
+                for index, value in enumerate(cells):
+                    merged[index] += value
+        
+        samples: Samples = []
+        bounds = self.buckets + (float('inf'),)
+        for labels, cells in sorted(totals.items()):
+            base = self._labels(labels)
+            cumulative = 0
+            for bound, count in zip(bounds, cells):
+                cumulative += count
+                samples.append(({**base, 'le': _format_value(float(bound))}, cumulative))
+            samples.append(({**base, '__suffix': '_sum'}, cells[-1]))
+            samples.append(({**base, '__suffix': '_count'}, cumulative))
+        yield self.name, self.help, self.kind, samples
+
+class MetricsRegistry:
+    """Holds metrics and scrape-time collectors and renders the text exposition format"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Sharded] = {}
+        self._collectors: Dict[str, Callable[[], Iterable[Family]]] = {}
+        self._lock = threading.Lock()
+    
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, help_text, labelnames)
+    
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help_text, labelnames, buckets=buckets)
+    
+    def register_collector(self, key: str, collector: Callable[[], Iterable[Family]]):
+        """Add (or replace) a callable that reports metric families at scrape time"""
+        with self._lock:
+            self._collectors[key] = collector
+    
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text format"""
+        with self._lock:
+            sources = [metric.collect for metric in self._metrics.values()] + list(self._collectors.values())
+        
+        lines = []
+        for source in sources:
+            for name, help_text, kind, samples in source():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    suffix = labels.pop('__suffix', '_bucket' if 'le' in labels else '')
+                    lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+    
+    def _register(self, cls, name: str, help_text: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            return metric
+
+# Process-wide registry served on /metrics
+registry = MetricsRegistry()
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+HTTP_REQUESTS = registry.counter('http_requests_total', 'HTTP requests by route and status', ('method', 'route', 'status'))
+HTTP_LATENCY = registry.histogram(
+    'http_request_duration_seconds',
+    'Time to produce the HTTP response (time to first byte for streams)',
+    ('method', 'route')
+)
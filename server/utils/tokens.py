@@ -0,0 +1,11 @@
+import re
+
+# Words and individual punctuation marks, roughly how BPE tokenizers split text
+_PIECES = re.compile(r"\w+|[^\w\s]")
+
+# Role markers and message framing added by the model's chat template
+MESSAGE_TOKEN_OVERHEAD = 4
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate: long words count as several tokens"""
+    return sum((len(piece) + 3) // 4 for piece in _PIECES.findall(text))
@@ -0,0 +1,245 @@
+"""Lightweight request tracing.
+
+A trace is started per HTTP request and spans are opened around each stage
+with ``tracer.span(name)``. The current span lives in a context variable,
+so nested spans, log records and executor jobs started with a copied
+context all see the active trace. Every request gets a trace id, but only
+sampled traces record spans; for unsampled requests ``span()`` returns a
+shared no-op span. Finished sampled traces are exported as OTLP/JSON,
+one line per trace, to a file and/or an OTLP HTTP collector.
+"""
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+
+class Span:
+    """A timed operation within a trace"""
+    
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'kind', 'start_ns', 'end_ns', 'attributes', 'error')
+    
+    def __init__(self, trace: '_Trace', name: str, parent_id: Optional[str], kind: int = 1):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+    
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+    
+    @property
+    def sampled(self) -> bool:
+        return self.trace.sampled
+    
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+    
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+    
+    def traceparent(self) -> str:
+        """W3C traceparent header value for this span"""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+class _NoopSpan:
+    """Returned by span() when the request is not sampled"""
+    
+    __slots__ = ()
+    sampled = False
+    
+    def set(self, key: str, value: Any):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+class _Trace:
+    __slots__ = ('trace_id', 'sampled', 'spans', 'lock')
+    
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans: List[Span] = []
+        self.lock = threading.Lock()
+
+class TraceExporter:
+    """Writes finished traces as OTLP/JSON from a background thread"""
+    
+    def __init__(self, path: str = None, endpoint: str = None, service_name: str = 'bedrock-chat', max_queue: int = 1000):
+        self.path = path
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+        self._thread.start()
+    
+    def export(self, spans: List[Span]):
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            # Never block a request on tracing
+            self.dropped += 1
+    
+    def flush(self):
+        self._queue.join()
+    
+    def to_otlp(self, spans: List[Span]) -> Dict[str, Any]:
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [_attribute('service.name', self.service_name)]},
+                'scopeSpans': [{
+                    'scope': {'name': 'chat-server'},
+                    'spans': [_otlp_span(span) for span in spans]
+                }]
+            }]
+        }
+    
+    def _run(self):
+        while True:
+            spans = self._queue.get()
+            try:
+                payload = json.dumps(self.to_otlp(spans))
+                if self.path:
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(payload + '\n')
+                if self.endpoint:
+                    post = urllib.request.Request(
+                        self.endpoint, data=payload.encode('utf-8'),
+                        headers={'Content-Type': 'application/json'}, method='POST'
+                    )
+                    urllib.request.urlopen(post, timeout=5).close()
+            except Exception as e:
+                logger.warning(f"Failed to export trace: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+class Tracer:
+    """Creates traces and spans and hands sampled traces to the exporter"""
+    
+    def __init__(self, sample_rate: float = None, exporter: TraceExporter = None):
+        self.sample_rate = Config.TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.exporter = exporter
+    
+    def start_trace(self, name: str, traceparent: str = None, attributes: Dict[str, Any] = None) -> Span:
+        """Start a root span for a request and make it current
+        
+        An incoming W3C traceparent header continues the caller's trace and
+        its sampling decision.
+        """
+        match = _TRACEPARENT.match(traceparent or '')
+        if match:
+            trace_id, parent_id, flags = match.groups()
+            sampled = bool(int(flags, 16) & 1)
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+            sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        
+        root = Span(_Trace(trace_id, sampled), name, parent_id, kind=2)
+        if attributes:
+            root.attributes.update(attributes)
+        root.trace.spans.append(root)
+        _current_span.set(root)
+        return root
+    
+    def finish_trace(self, root: Span):
+        """End a root span, clear the current span and export the trace if sampled"""
+        if root.end_ns is not None:
+            return
+        root.end()
+        _current_span.set(None)
+        if root.sampled and self.exporter is not None:
+            with root.trace.lock:
+                spans = list(root.trace.spans)
+            self.exporter.export(spans)
+    
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Any]:
+        """Time a stage of the current request; a no-op unless the trace is sampled"""
+        parent = _current_span.get()
+        if parent is None or not parent.sampled:
+            yield NOOP_SPAN
+            return
+        
+        span = Span(parent.trace, name, parent.span_id)
+        span.attributes.update(attributes)
+        with parent.trace.lock:
+            parent.trace.spans.append(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = str(e) or type(e).__name__
+            raise
+        finally:
+            span.end()
+            _current_span.reset(token)
+
+def current_span() -> Optional[Span]:
+    """The active span of this context, if any"""
+    return _current_span.get()
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span is not None else None
+
+class TraceIdFilter(logging.Filter):
+    """Adds the current trace id to log records as %(trace_id)s"""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = current_trace_id() or '-'
+        return True
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    if isinstance(value, float):
+        return {'key': key, 'value': {'doubleValue': value}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    data = {
+        'traceId': span.trace_id,
+        'spanId': span.span_id,
+        'name': span.name,
+        'kind': span.kind,
+        'startTimeUnixNano': str(span.start_ns),
+        'endTimeUnixNano': str(span.end_ns or time.time_ns()),
+        'attributes': [_attribute(key, value) for key, value in span.attributes.items()],
+        'status': {'code': 2, 'message': span.error} if span.error else {'code': 0}
+    }
+    if span.parent_id:
+        data['parentSpanId'] = span.parent_id
+    return data
+
+def _create_tracer() -> Tracer:
+    exporter = None
+    if Config.TRACE_SAMPLE_RATE > 0 and (Config.TRACE_EXPORT_PATH or Config.TRACE_OTLP_ENDPOINT):
+        exporter = TraceExporter(path=Config.TRACE_EXPORT_PATH or None, endpoint=Config.TRACE_OTLP_ENDPOINT or None)
+    return Tracer(exporter=exporter)
+
+# Process-wide tracer used by the apps and services
+tracer = _create_tracer()
@@ -1,28 +1,171 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
 from flask import Request
-from config import Config
+from config import Config, PRIORITIES, SESSION_ORDERS
+from utils import json_codec
 
-def validate_message_request(request: Request) -> str:
-    """Validate incoming message request"""
+@dataclass(frozen=True)
+class ChatRequest:
+    """A validated chat request body"""
+    
+    message: str
+    session_id: str = 'default'
+    priority: Optional[str] = None
+
+class Field:
+    """Rules for one string field of a JSON object body"""
+    
+    def __init__(self, name: str, label: str, default: Optional[str] = None, strip: bool = False,
+                 required: bool = False, max_length: int = 0, too_long: str = None, choices: Tuple[str, ...] = ()):
+        self.name = name
+        self.label = label
+        self.default = default
+        self.strip = strip
+        self.required = required
+        self.max_length = max_length
+        self.too_long = too_long or f"{label} too long"
+        self.choices = choices
+
+class Schema:
+    """Single-pass validator and decoder for a JSON object body
+    
+    The field rules are compiled into plain tuples when the schema is built,
+    so parsing is one lookup and a few comparisons per field, and produces
+    the typed request directly instead of handing the dict on to be read
+    again.
+    """
+    
+    def __init__(self, factory: Callable[..., Any], *fields: Field):
+        self.factory = factory
+        self._checks = tuple(
+            (
+                field.name, field.default, field.strip, field.required, field.max_length,
+                frozenset(field.choices) or None,
+                f"{field.label} cannot be empty",
+                f"{field.label} must be a string",
+                field.too_long,
+                f"{field.label} must be one of: {', '.join(field.choices)}"
+            )
+            for field in fields
+        )
+    
+    def parse(self, data: Any) -> Tuple[Any, Optional[str]]:
+        """Return (typed request, None), or (None, error message)"""
+        if not data:
+            return None, "Request body cannot be empty"
+        if not isinstance(data, dict):
+            return None, "Request body must be a JSON object"
+        
+        values = []
+        for name, default, strip, required, max_length, choices, empty, not_string, too_long, not_choice in self._checks:
+            value = data.get(name)
+            if value is None:
+                if required:
+                    return None, empty
+                values.append(default)
+                continue
+            if not isinstance(value, str):
+                return None, not_string
+            if strip:
+                value = value.strip()
+            if required and not value:
+                return None, empty
+            if max_length and len(value) > max_length:
+                return None, too_long
+            if choices is not None and value not in choices:
+                return None, not_choice
+            values.append(value)
+        return self.factory(*values), None
+
+CHAT_REQUEST = Schema(
+    ChatRequest,
+    Field('message', 'Message', strip=True, required=True, max_length=Config.MAX_MESSAGE_LENGTH,
+          too_long=f"Message too long. Maximum length is {Config.MAX_MESSAGE_LENGTH} characters"),
+    Field('session_id', 'Session ID', default='default', max_length=100),
+    Field('priority', 'Priority', choices=PRIORITIES)
+)
+
+def decode_json_body(request: Request) -> Tuple[Any, Optional[str]]:
+    """Decode a JSON request body once, from bytes; returns (data, None) or (None, error)"""
     
     if not request.is_json:
-        return "Request must be JSON"
+        return None, "Request must be JSON"
+    
+    body = request.get_data(cache=False)
+    if not body:
+        return None, "Request body cannot be empty"
+    try:
+        return json_codec.loads(body), None
+    except ValueError:
+        return None, "Request body must be valid JSON"
+
+def parse_chat_request(request: Request) -> Tuple[Optional[ChatRequest], Optional[str]]:
+    """Decode and validate a chat request in one pass"""
     
-    data = request.get_json()
+    data, error = decode_json_body(request)
+    if error:
+        return None, error
+    return CHAT_REQUEST.parse(data)
+
+def parse_history_query(args: Mapping[str, str]) -> Tuple[Optional[Dict[str, int]], Optional[str]]:
+    """Read the since, before and limit parameters of a history request"""
+    
+    query = {}
+    for name in ('since', 'before', 'limit'):
+        value = args.get(name)
+        if value is None:
+            continue
+        if not value.isdigit():
+            return None, f"{name} must be a non-negative integer"
+        query[name] = int(value)
+    
+    if 'since' in query and 'before' in query:
+        return None, "Use either since or before, not both"
+    
+    if query.get('limit') == 0:
+        return None, "limit must be at least 1"
+    
+    return query, None
+
+def parse_sessions_query(args: Mapping[str, str]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Read the order, prefix, cursor and limit parameters of a session listing"""
+    
+    order = args.get('order', 'activity')
+    if order not in SESSION_ORDERS:
+        return None, f"order must be one of: {', '.join(SESSION_ORDERS)}"
+    
+    limit = args.get('limit', str(Config.SESSIONS_PAGE_SIZE))
+    if not limit.isdigit() or int(limit) == 0:
+        return None, "limit must be a positive integer"
+    
+    cursor = args.get('cursor') or None
+    if cursor is not None and order == 'activity' and not cursor.partition(':')[0].isdigit():
+        return None, "Invalid cursor"
+    
+    return {
+        'order': order,
+        'prefix': args.get('prefix', ''),
+        'cursor': cursor,
+        'limit': min(int(limit), Config.SESSIONS_MAX_PAGE_SIZE)
+    }, None
+
+def validate_batch_payload(data: dict) -> str:
+    """Validate a decoded batch chat payload; items are validated one by one"""
     
     if not data:
         return "Request body cannot be empty"
     
-    message = data.get('message', '').strip()
+    if not isinstance(data, dict):
+        return "Request body must be a JSON object"
     
-    if not message:
-        return "Message cannot be empty"
+    if data.get('mode', 'online') not in ('online', 'offline'):
+        return "Mode must be 'online' or 'offline'"
     
-    if len(message) > Config.MAX_MESSAGE_LENGTH:
-        return f"Message too long. Maximum length is {Config.MAX_MESSAGE_LENGTH} characters"
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return "Items must be a non-empty list"
     
-    # Check for session_id if provided
-    session_id = data.get('session_id', '')
-    if session_id and len(session_id) > 100:
-        return "Session ID too long"
+    if len(items) > Config.BATCH_MAX_ITEMS:
+        return f"Too many items. Maximum is {Config.BATCH_MAX_ITEMS} per batch"
     
-    return None 
\ No newline at end of file
+    return None